@@ -1,40 +1,100 @@
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
+from flask_socketio import SocketIO
+from sqlalchemy import inspect
 from config import config
+from app.storage import configure_storage, install_pragmas
 from app.routes.profile import profile_bp
+from app.services.model_registry import model_registry
+from app.services.scoring_engine import scoring_engine
+from app.services.prediction_cache import prediction_cache
+from app.services.flow_features import flow_streams
+from app.services.micro_batcher import micro_batcher
 
 db = SQLAlchemy()
 login_manager = LoginManager()
+socketio = SocketIO()
 
 def create_app(config_name='development'):
     app = Flask(__name__)
     app.config.from_object(config[config_name])
 
     # Initialize extensions
+    configure_storage(app)
     db.init_app(app)
+    with app.app_context():
+        install_pragmas(app, db.engine)
     login_manager.init_app(app)
     login_manager.login_view = 'auth.login'
     login_manager.login_message = 'Please log in to access this page.'
+    model_registry.init_app(app)
+    scoring_engine.init_app(app)
+    prediction_cache.init_app(app)
+    flow_streams.init_app(app)
+    micro_batcher.init_app(app)
+
+    from app.services.detection_writer import detection_writer
+    from app.services.incidents import incident_aggregator
+    detection_writer.init_app(app)
+    incident_aggregator.init_app(app)
+    from app.services.api_tokens import token_cache
+    token_cache.init_app(app)
+    from app.services.user_cache import user_cache
+    user_cache.init_app(app)
 
     # Register blueprints
     from app.routes.auth import auth_bp
     from app.routes.main import main_bp
     from app.routes.admin import admin_bp
     from app.routes.detection import detection_bp
+    from app.routes.metrics import metrics_bp
+    from app.routes.health import health_bp
 
     app.register_blueprint(auth_bp)
     app.register_blueprint(main_bp)
     app.register_blueprint(admin_bp, url_prefix='/admin')
     app.register_blueprint(detection_bp, url_prefix='/detection')
     app.register_blueprint(profile_bp)
+    app.register_blueprint(metrics_bp)
+    app.register_blueprint(health_bp)
+
+    # Live detection push channel
+    from app.routes import live
+    from app.services.live_stream import live_stream
+    socketio.init_app(app, async_mode=app.config.get('SOCKETIO_ASYNC_MODE'),
+                      message_queue=app.config.get('SOCKETIO_MESSAGE_QUEUE'))
+    live_stream.init_app(app, socketio)
+
+    from app.commands import register_commands
+    register_commands(app)
 
     # Create database tables
+    if app.config.get('DB_BOOTSTRAP_ON_STARTUP', True):
+        bootstrap_database(app)
+
+    return app
+
+def bootstrap_database(app):
+    """Create tables, apply migrations and make sure the default admin exists"""
     with app.app_context():
         from app.models.user import User
         from app.models.detection import Detection
+        from app.models.detection_rollup import DetectionRollup
+        from app.models.background_job import BackgroundJob
+        from app.models.api_token import ApiToken
+        from app.models.incident import Incident
+        needs_rollups = not inspect(db.engine).has_table(DetectionRollup.__tablename__)
         db.create_all()
 
+        from app.migrations import upgrade
+        upgrade(db.engine)
+
+        # Existing databases get their rollups built once
+        if needs_rollups and (Detection.query.first() is not None or Incident.query.first() is not None):
+            from app.services.rollups import rebuild_rollups
+            rebuild_rollups(app.config.get('ROLLUP_BUCKETS'))
+
         # Create default SuperAdmin if not exists
         admin = User.query.filter_by(username='admin').first()
         if not admin:
@@ -46,5 +106,3 @@ def create_app(config_name='development'):
             admin.set_password('admin123')
             db.session.add(admin)
             db.session.commit()
-
-    return app
\ No newline at end of file
@@ -0,0 +1,233 @@
+"""ASGI detection service for sensors.
+
+A small raw ASGI application exposing the detection API without the web UI:
+
+* ``POST /api/predict`` - same request and response JSON as ``/detection/api/predict``
+* ``GET /healthz``, ``GET /readyz`` and ``GET /metrics``
+
+Callers authenticate with ``Authorization: Bearer <token>`` (see
+``flask create-api-token``) instead of a session cookie. Parsing, auth-cache
+hits and serialization run on the event loop. Encoding and inference run on a
+bounded thread pool of ``SERVICE_INFERENCE_THREADS``, through the micro-batcher
+when it is enabled. Detections go to the write-behind queue, so a slow commit
+never holds a request. At most ``SERVICE_MAX_PENDING`` predictions are in flight
+per process; beyond that callers get 503 with ``Retry-After``.
+
+Run it with ``service.py`` or ``uvicorn service:app``.
+"""
+import asyncio
+import hmac
+import json
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from app import create_app
+from app.services import metrics
+from app.services.api_tokens import lookup_token, token_cache
+from app.services.detection_writer import detection_writer, make_detection_row, WriterQueueFull
+from app.services.metrics import StageTimer, count_predictions, DB_ERRORS, MODEL_LOAD_ERRORS, REQUEST_ERRORS
+from app.services.micro_batcher import micro_batcher
+from app.services.model_registry import model_registry
+
+ENDPOINT = 'service_predict'
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message, headers=None):
+        super().__init__(message)
+        self.status = status
+        self.headers = headers or {}
+
+
+class DetectionService:
+    """The ASGI callable; wraps a Flask app for configuration, database and model"""
+
+    def __init__(self, flask_app):
+        self.flask_app = flask_app
+        config = flask_app.config
+        self.max_body = config.get('SERVICE_MAX_BODY_BYTES', 64 * 1024)
+        self.max_pending = config.get('SERVICE_MAX_PENDING', 256)
+        self.executor = ThreadPoolExecutor(max_workers=config.get('SERVICE_INFERENCE_THREADS', 4),
+                                           thread_name_prefix='service-inference')
+        self.pending = 0
+        self.routes = {
+            ('POST', '/api/predict'): self.predict,
+            ('GET', '/healthz'): self.healthz,
+            ('GET', '/readyz'): self.readyz,
+            ('GET', '/metrics'): self.metrics,
+        }
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+            return
+        if scope['type'] != 'http':
+            return
+
+        handler = self.routes.get((scope['method'], scope['path']))
+        try:
+            if handler is None:
+                known_path = any(path == scope['path'] for _, path in self.routes)
+                raise HTTPError(405 if known_path else 404, 'Method not allowed' if known_path else 'Not found')
+            status, body, headers = await handler(scope, receive)
+        except HTTPError as e:
+            status, body, headers = e.status, {'error': str(e)}, e.headers
+        await self.respond(send, status, body, headers)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                try:
+                    await self.run(model_registry.warm_up)
+                except Exception:
+                    # Keep serving; /readyz reports 503 and predictions retry the load
+                    self.flask_app.logger.exception('Model warm-up failed')
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.executor.shutdown(wait=True)
+                micro_batcher.stop()
+                detection_writer.stop()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    # Plumbing
+
+    def _in_context(self, function, *args):
+        with self.flask_app.app_context():
+            return function(*args)
+
+    async def run(self, function, *args):
+        """Run ``function`` on the inference pool inside an app context"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, self._in_context, function, *args)
+
+    async def read_body(self, receive):
+        chunks = []
+        size = 0
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                raise HTTPError(400, 'Client disconnected')
+            chunk = message.get('body', b'')
+            size += len(chunk)
+            if size > self.max_body:
+                raise HTTPError(413, f'Request body larger than {self.max_body} bytes')
+            chunks.append(chunk)
+            if not message.get('more_body'):
+                return b''.join(chunks)
+
+    @staticmethod
+    def header(scope, name):
+        for key, value in scope['headers']:
+            if key == name:
+                return value.decode('latin-1')
+        return None
+
+    async def respond(self, send, status, body, headers=None):
+        payload = body if isinstance(body, bytes) else json.dumps(body).encode()
+        headers = {'Content-Type': 'application/json', **(headers or {}), 'Content-Length': len(payload)}
+        raw_headers = [(key.lower().encode(), str(value).encode()) for key, value in headers.items()]
+        await send({'type': 'http.response.start', 'status': status, 'headers': raw_headers})
+        await send({'type': 'http.response.body', 'body': payload})
+
+    async def authenticate(self, scope):
+        authorization = self.header(scope, b'authorization') or ''
+        scheme, _, token = authorization.partition(' ')
+        token = token.strip()
+        if scheme.lower() != 'bearer' or not token:
+            raise HTTPError(401, 'Missing bearer token', {'WWW-Authenticate': 'Bearer'})
+        found, identity = token_cache.get(token)
+        if not found:
+            identity = await self.run(lookup_token, token)
+            token_cache.put(token, identity)
+        if identity is None:
+            raise HTTPError(401, 'Invalid or revoked token', {'WWW-Authenticate': 'Bearer'})
+        return identity
+
+    # Handlers
+
+    async def predict(self, scope, receive):
+        identity = await self.authenticate(scope)
+        try:
+            data = json.loads(await self.read_body(receive))
+        except ValueError:
+            REQUEST_ERRORS.inc(endpoint=ENDPOINT, status=400)
+            raise HTTPError(400, 'Request body must be a JSON object')
+        if not isinstance(data, dict):
+            REQUEST_ERRORS.inc(endpoint=ENDPOINT, status=400)
+            raise HTTPError(400, 'Request body must be a JSON object')
+
+        if self.pending >= self.max_pending:
+            REQUEST_ERRORS.inc(endpoint=ENDPOINT, status=503)
+            raise HTTPError(503, 'Too many predictions in flight', {'Retry-After': '1'})
+        self.pending += 1
+        try:
+            return 200, await self.run(self._predict, identity.user_id, data), None
+        except WriterQueueFull as e:
+            REQUEST_ERRORS.inc(endpoint=ENDPOINT, status=503)
+            raise HTTPError(503, str(e), {'Retry-After': '1'})
+        except HTTPError:
+            raise
+        except Exception as e:
+            REQUEST_ERRORS.inc(endpoint=ENDPOINT, status=500)
+            self.flask_app.logger.exception('Prediction failed')
+            raise HTTPError(500, str(e))
+        finally:
+            self.pending -= 1
+
+    def _predict(self, user_id, data):
+        timer = StageTimer(ENDPOINT)
+        try:
+            loaded_model = model_registry.get()
+        except Exception:
+            MODEL_LOAD_ERRORS.inc()
+            REQUEST_ERRORS.inc(endpoint=ENDPOINT, status=500)
+            raise HTTPError(500, 'Model not available')
+
+        with timer.stage('encode'):
+            features = loaded_model.encoder.encode_one(data)
+        with timer.stage('inference'):
+            predictions, confidences, probabilities = micro_batcher.score(loaded_model, features)
+        prediction = str(predictions[0])
+        confidence = float(confidences[0])
+        count_predictions(predictions)
+
+        timestamp = datetime.utcnow()
+        try:
+            with timer.stage('db'):
+                detection_writer.submit([make_detection_row(user_id, data, prediction, confidence, timestamp)])
+        except Exception as e:
+            if not isinstance(e, WriterQueueFull):
+                DB_ERRORS.inc(source=ENDPOINT)
+            raise
+
+        return {
+            'prediction': prediction,
+            'confidence': confidence,
+            'probabilities': {cls: float(prob) for cls, prob in zip(loaded_model.attack_classes, probabilities[0])},
+            'timestamp': timestamp.isoformat(),
+            'is_attack': prediction != 'normal',
+            'model_version': loaded_model.version
+        }
+
+    async def healthz(self, scope, receive):
+        return 200, {'status': 'ok'}, None
+
+    async def readyz(self, scope, receive):
+        ready = model_registry.ready
+        return (200 if ready else 503), {'ready': ready, 'model_version': model_registry.info().get('version')}, None
+
+    async def metrics(self, scope, receive):
+        # There are no sessions here, so the endpoint needs METRICS_TOKEN
+        token = self.flask_app.config.get('METRICS_TOKEN')
+        if not token:
+            raise HTTPError(403, 'Set METRICS_TOKEN to enable /metrics')
+        supplied = (self.header(scope, b'authorization') or '').removeprefix('Bearer ').strip()
+        if not hmac.compare_digest(supplied.encode(), token.encode()):
+            raise HTTPError(401, 'Unauthorized')
+        return 200, metrics.registry.render().encode(), {'Content-Type': 'text/plain; version=0.0.4'}
+
+
+def create_service(config_name='production'):
+    return DetectionService(create_app(config_name))
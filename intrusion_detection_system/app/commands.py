@@ -0,0 +1,126 @@
+import click
+
+
+def register_commands(app):
+    """Maintenance commands, run with ``flask --app run.py <command>``"""
+
+    @app.cli.command('init-db')
+    def init_db_command():
+        """Create tables, apply migrations and create the default admin."""
+        from app import bootstrap_database
+        bootstrap_database(app)
+        click.echo('Database is ready.')
+
+    @app.cli.command('export-model')
+    @click.option('--source', type=click.Path(exists=True, dir_okay=False), default=None,
+                  help='Pickled model (MODEL_PATH when it is a .pkl file).')
+    @click.option('--output', type=click.Path(file_okay=False), default=None,
+                  help='Artifact directory (next to the pickle by default).')
+    @click.option('--verify/--no-verify', default=True, help='Compare predictions on nsl_kdd_sample.csv.')
+    def export_model_command(source, output, verify):
+        """Convert the pickled model into a memory-mappable artifact."""
+        import hashlib
+        import os
+        import joblib
+        from app.services.model_artifact import default_artifact_path, export_artifact, load_artifact
+
+        source = source or app.config['MODEL_PATH']
+        if os.path.isdir(source):
+            raise click.UsageError(f'{source} is already an artifact, pass --source with a .pkl file')
+        output = output or default_artifact_path(source)
+        with open(source, 'rb') as f:
+            sha256 = hashlib.sha256(f.read()).hexdigest()
+        data = joblib.load(source)
+        manifest = export_artifact(data, output, source_sha256=sha256)
+        size = sum(os.path.getsize(os.path.join(output, spec['file'])) for spec in manifest['arrays'].values())
+        click.echo(f"Wrote {output} ({manifest['n_trees']} trees, {size / 2 ** 20:.1f} MiB).")
+
+        if verify:
+            import pandas as pd
+            from app.services.feature_encoder import FeatureEncoder
+            from app.services.flat_forest import check_parity
+            sample = os.path.join(os.path.dirname(app.root_path), 'nsl_kdd_sample.csv')
+            exported = load_artifact(output)
+            features = FeatureEncoder.from_model_data(exported).encode_frame(pd.read_csv(sample))
+            difference = check_parity(data['model'], exported['model'], features)
+            click.echo(f'Verified on {len(features)} rows, max probability difference {difference:g}.')
+        click.echo(f'Serve it with MODEL_PATH={output}')
+
+    @app.cli.command('db-upgrade')
+    def db_upgrade_command():
+        """Apply pending schema migrations."""
+        from app import db
+        from app.migrations import upgrade
+        applied = upgrade(db.engine)
+        click.echo(f"Applied: {', '.join(applied)}" if applied else 'Database is up to date.')
+
+    @app.cli.command('rebuild-rollups')
+    def rebuild_rollups_command():
+        """Rebuild the detection_rollup counters from the Detection table."""
+        from app.services.rollups import rebuild_rollups
+        rows = rebuild_rollups(app.config.get('ROLLUP_BUCKETS'))
+        click.echo(f'Rebuilt rollups from {rows} detections.')
+
+    @app.cli.command('replay-detections')
+    def replay_detections_command():
+        """Insert detection batches the write-behind queue spilled to disk."""
+        from app.services.detection_writer import replay_spilled
+        click.echo(f'Replayed {replay_spilled()} detections.')
+
+    @app.cli.command('archive-detections')
+    @click.option('--days', type=int, default=None, help='Keep this many days in the table (RETENTION_DAYS).')
+    @click.option('--format', 'fmt', type=click.Choice(['auto', 'csv', 'parquet']), default=None)
+    @click.option('--dry-run', is_flag=True, help='Only report what would be archived.')
+    def archive_detections_command(days, fmt, dry_run):
+        """Move old detections into per-day archive files."""
+        from app.services.archive import archive_detections
+        summary = archive_detections(retention_days=days, fmt=fmt, dry_run=dry_run)
+        verb = 'Would archive' if dry_run else 'Archived'
+        click.echo(f"{verb} {summary['rows']} detections from {summary['days']} days "
+                   f"before {summary['cutoff']} ({summary['format']}).")
+
+    @app.cli.command('compact-archive')
+    @click.option('--format', 'fmt', type=click.Choice(['auto', 'csv', 'parquet']), default=None)
+    def compact_archive_command(fmt):
+        """Merge each day's archive parts into one file."""
+        from app.services.archive import compact_archive
+        click.echo(f'Compacted {compact_archive(fmt)} days.')
+
+    @app.cli.command('create-api-token')
+    @click.argument('username')
+    @click.option('--name', default='sensor', help='Label shown in token listings.')
+    def create_api_token_command(username, name):
+        """Create a bearer token for the detection service."""
+        from app.models.user import User
+        from app.services.api_tokens import create_api_token
+        user = User.query.filter_by(username=username).first()
+        if user is None or not user.active:
+            raise click.UsageError(f'No active user named {username}')
+        api_token, token = create_api_token(user, name)
+        click.echo(f'Created token {api_token.id} ({api_token.name}) for {username}. It is shown only once:')
+        click.echo(token)
+
+    @app.cli.command('list-api-tokens')
+    def list_api_tokens_command():
+        """List API tokens without revealing them."""
+        from app.models.api_token import ApiToken
+        for api_token in ApiToken.query.order_by(ApiToken.id):
+            state = f'revoked {api_token.revoked_at:%Y-%m-%d}' if api_token.revoked_at else 'active'
+            click.echo(f'{api_token.id}\t{api_token.user.username}\t{api_token.name}\t{api_token.prefix}...\t{state}')
+
+    @app.cli.command('revoke-api-token')
+    @click.argument('token_id', type=int)
+    def revoke_api_token_command(token_id):
+        """Revoke an API token; running services drop it within API_TOKEN_CACHE_TTL."""
+        from app.services.api_tokens import revoke_api_token
+        if revoke_api_token(token_id) is None:
+            raise click.UsageError(f'No API token with id {token_id}')
+        click.echo(f'Revoked token {token_id}.')
+
+    @app.cli.command('db-info')
+    def db_info_command():
+        """Show the database backend, pool status and SQLite pragmas."""
+        from app import db
+        from app.storage import storage_info
+        for key, value in storage_info(db.engine).items():
+            click.echo(f'{key}: {value}')
@@ -0,0 +1,53 @@
+"""Schema changes for databases created before a model gained them.
+
+``db.create_all()`` only creates missing tables, so anything added to an
+existing table (indexes, columns) is applied here. Each migration runs once and
+is recorded in the ``schema_migrations`` table.
+"""
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, MetaData, String, Table, inspect, select, text
+
+metadata = MetaData()
+schema_migrations = Table(
+    'schema_migrations', metadata,
+    Column('name', String(100), primary_key=True),
+    Column('applied_at', DateTime, nullable=False)
+)
+
+
+def _detection_indexes(connection):
+    from app.models.detection import Detection
+    for index in Detection.__table__.indexes:
+        index.create(connection, checkfirst=True)
+
+
+def _user_version(connection):
+    from app.models.user import User
+    table = User.__tablename__
+    if 'version' in {column['name'] for column in inspect(connection).get_columns(table)}:
+        return
+    quoted = connection.dialect.identifier_preparer.quote(table)
+    connection.execute(text(f'ALTER TABLE {quoted} ADD COLUMN version INTEGER NOT NULL DEFAULT 1'))
+
+
+MIGRATIONS = [
+    ('0001_detection_indexes', _detection_indexes),
+    ('0002_user_version', _user_version),
+    ('0003_detection_timestamp_index', _detection_indexes),
+]
+
+
+def upgrade(engine):
+    """Apply pending migrations in order, returning the names applied"""
+    metadata.create_all(engine)
+    applied = []
+    with engine.begin() as connection:
+        done = set(connection.execute(select(schema_migrations.c.name)).scalars())
+        for name, migrate in MIGRATIONS:
+            if name in done:
+                continue
+            migrate(connection)
+            connection.execute(schema_migrations.insert().values(name=name, applied_at=datetime.utcnow()))
+            applied.append(name)
+    return applied
@@ -0,0 +1,38 @@
+from app import db
+from datetime import datetime
+
+class ApiToken(db.Model):
+    """Bearer token for sensors calling the detection service.
+
+    Only the SHA-256 of the token is stored; the token itself is shown once
+    when it is created. ``prefix`` keeps the first characters so a token can
+    be recognised in listings.
+    """
+    __tablename__ = 'api_token'
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    name = db.Column(db.String(80), nullable=False)
+    prefix = db.Column(db.String(16), nullable=False)
+    token_hash = db.Column(db.String(64), unique=True, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    revoked_at = db.Column(db.DateTime)
+
+    user = db.relationship('User', backref=db.backref('api_tokens', lazy='dynamic'))
+
+    @property
+    def active(self):
+        return self.revoked_at is None
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'user_id': self.user_id,
+            'name': self.name,
+            'prefix': self.prefix,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'revoked_at': self.revoked_at.isoformat() if self.revoked_at else None
+        }
+
+    def __repr__(self):
+        return f'<ApiToken {self.name} {self.prefix}>'
@@ -0,0 +1,42 @@
+from app import db
+from datetime import datetime
+
+class BackgroundJob(db.Model):
+    """Progress of a long-running admin task, shared by every server worker"""
+    __tablename__ = 'background_job'
+
+    id = db.Column(db.String(32), primary_key=True)
+    kind = db.Column(db.String(40), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='pending')
+    description = db.Column(db.String(200))
+    total = db.Column(db.Integer, default=0)
+    done = db.Column(db.Integer, default=0)
+    error = db.Column(db.Text)
+    created_by = db.Column(db.Integer)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime)
+
+    STATUSES = ['pending', 'running', 'finished', 'failed']
+
+    @property
+    def progress(self):
+        if not self.total:
+            return 1.0 if self.status == 'finished' else 0.0
+        return min(self.done / self.total, 1.0)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'status': self.status,
+            'description': self.description,
+            'total': self.total,
+            'done': self.done,
+            'progress': round(self.progress, 4),
+            'error': self.error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
+
+    def __repr__(self):
+        return f'<BackgroundJob {self.kind} {self.status}>'
@@ -14,5 +14,12 @@ class Detection(db.Model):
 
     user = db.relationship('User', backref=db.backref('detections', lazy=True))
 
+    __table_args__ = (
+        db.Index('ix_detection_user_timestamp', 'user_id', 'timestamp'),
+        db.Index('ix_detection_prediction_timestamp', 'prediction', 'timestamp'),
+        # Admin dashboard's latest detections across users, and archive cutoffs
+        db.Index('ix_detection_timestamp', 'timestamp'),
+    )
+
     def __repr__(self):
         return f'<Detection {self.prediction} - {self.confidence}>'
@@ -0,0 +1,24 @@
+from app import db
+from datetime import datetime
+
+# user_id used for the system-wide counters
+GLOBAL_SCOPE = 0
+# bucket_start used for the all-time counters
+ALL_TIME = datetime(1970, 1, 1)
+
+class DetectionRollup(db.Model):
+    __tablename__ = 'detection_rollup'
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, nullable=False)
+    bucket = db.Column(db.String(10), nullable=False)
+    bucket_start = db.Column(db.DateTime, nullable=False)
+    prediction = db.Column(db.String(20), nullable=False)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'bucket', 'bucket_start', 'prediction', name='uq_detection_rollup_key'),
+    )
+
+    def __repr__(self):
+        return f'<DetectionRollup {self.user_id} {self.bucket} {self.bucket_start} {self.prediction}={self.count}>'
@@ -0,0 +1,48 @@
+from app import db
+from datetime import datetime
+
+class Incident(db.Model):
+    """Consecutive attack detections from one source, consolidated.
+
+    Attacks with the same user, source IP, predicted class and protocol extend
+    the same incident while they arrive within ``INCIDENT_WINDOW_SECONDS`` of
+    its last one (see app/services/incidents.py).
+    """
+    __tablename__ = 'incident'
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    ip_address = db.Column(db.String(45))
+    prediction = db.Column(db.String(20), nullable=False)
+    protocol = db.Column(db.String(10))
+    first_seen = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    last_seen = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    count = db.Column(db.Integer, nullable=False, default=0)
+    src_bytes = db.Column(db.BigInteger, nullable=False, default=0)
+    dst_bytes = db.Column(db.BigInteger, nullable=False, default=0)
+    max_confidence = db.Column(db.Float, nullable=False, default=0.0)
+
+    user = db.relationship('User', backref=db.backref('incidents', lazy='dynamic'))
+
+    __table_args__ = (
+        db.Index('ix_incident_user_last_seen', 'user_id', 'last_seen'),
+        db.Index('ix_incident_key_last_seen', 'user_id', 'ip_address', 'prediction', 'protocol', 'last_seen'),
+        db.Index('ix_incident_last_seen', 'last_seen'),
+    )
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'ip_address': self.ip_address,
+            'prediction': self.prediction,
+            'protocol': self.protocol,
+            'first_seen': self.first_seen.isoformat(),
+            'last_seen': self.last_seen.isoformat(),
+            'count': self.count,
+            'src_bytes': self.src_bytes,
+            'dst_bytes': self.dst_bytes,
+            'max_confidence': self.max_confidence
+        }
+
+    def __repr__(self):
+        return f'<Incident {self.prediction} {self.ip_address} x{self.count}>'
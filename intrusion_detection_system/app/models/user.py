@@ -1,11 +1,15 @@
 from app import db, login_manager
 from flask_login import UserMixin
+from sqlalchemy import event
+from sqlalchemy.orm import object_session
 from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime
 
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    # Served from a per-process cache; deactivated accounts lose their sessions too
+    from app.services.user_cache import user_cache
+    return user_cache.load(int(user_id))
 
 class User(UserMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -15,6 +19,8 @@ class User(UserMixin, db.Model):
     role = db.Column(db.String(20), nullable=False, default='User')
     active = db.Column(db.Boolean, default=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Bumped on every update so cached copies in other workers can be revalidated
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
 
     # Role hierarchy: SuperAdmin > Admin > User
     ROLES = ['User', 'Admin', 'SuperAdmin']
@@ -32,4 +38,10 @@ class User(UserMixin, db.Model):
         return self.role == 'SuperAdmin'
 
     def __repr__(self):
-        return f'<User {self.username}>'
\ No newline at end of file
+        return f'<User {self.username}>'
+
+@event.listens_for(User, 'before_update')
+def bump_version(mapper, connection, target):
+    # Incremented in SQL, so concurrent updates from two workers never reuse a version
+    if object_session(target).is_modified(target, include_collections=False):
+        target.version = User.version + 1
@@ -1,8 +1,13 @@
-from flask import Blueprint, render_template, redirect, url_for, flash, request
+from flask import Blueprint, render_template, redirect, url_for, flash, request, current_app, jsonify, abort
 from flask_login import login_required, current_user
 from app import db
 from app.models.user import User
 from app.models.detection import Detection
+from app.services.rollups import get_summary, remove_user
+from app.services.jobs import start_job, get_job
+from app.services.user_deletion import count_detections, has_archive, purge_user
+from app.services.user_cache import user_cache
+from app.services.incidents import page_incidents
 from functools import wraps
 
 admin_bp = Blueprint('admin', __name__)
@@ -34,17 +39,14 @@ def dashboard():
     else:
         total_users = User.query.filter_by(role='User').count()
 
-    total_detections = Detection.query.count()
     recent_detections = Detection.query.order_by(Detection.timestamp.desc()).limit(10).all()
+    recent_incidents, _ = page_incidents(limit=10)
 
-    stats = {
-        'total_users': total_users,
-        'total_detections': total_detections,
-        'normal_count': Detection.query.filter_by(prediction='normal').count(),
-        'attack_count': Detection.query.filter(Detection.prediction != 'normal').count()
-    }
+    stats = {'total_users': total_users}
+    stats.update(get_summary())
 
-    return render_template('admin/dashboard.html', stats=stats, recent_detections=recent_detections)
+    return render_template('admin/dashboard.html', stats=stats, recent_detections=recent_detections,
+                           recent_incidents=recent_incidents)
 
 @admin_bp.route('/users')
 @login_required
@@ -143,6 +145,7 @@ def edit_user(user_id):
             user.role = role
 
         db.session.commit()
+        user_cache.invalidate(user_id)
         flash('User updated successfully.')
         return redirect(url_for('admin.users'))
 
@@ -166,12 +169,34 @@ def delete_user(user_id):
         flash('Only SuperAdmin can delete Admin users.')
         return redirect(url_for('admin.users'))
 
-    detections = Detection.query.filter_by(user_id=user.id).all()
-    for detection in detections:
-        db.session.delete(detection)
+    username = user.username
+    sync_max = current_app.config.get('USER_DELETE_SYNC_MAX', 10000)
+    # Purging archived rows rewrites archive files, so that always runs in the background
+    if not has_archive() and count_detections(user.id, limit=sync_max + 1) <= sync_max:
+        purge_user(user.id)
+        user_cache.invalidate(user_id)
+        flash(f'User {username} and their detection records deleted successfully.')
+        return redirect(url_for('admin.users'))
 
-    db.session.delete(user)
+    # Too many detections for one request: lock the account and its counters
+    # out right away and delete the rows in chunks in the background
+    user.active = False
+    remove_user(user.id)
     db.session.commit()
-
-    flash(f'User {user.username} and their detection records deleted successfully.')
-    return redirect(url_for('admin.users'))
\ No newline at end of file
+    user_cache.invalidate(user_id)
+    job = start_job('delete_user', f'Delete user {username}', purge_user, user.id,
+                    chunk_size=current_app.config.get('USER_DELETE_CHUNK_SIZE', 5000),
+                    created_by=current_user.id)
+    flash(f'User {username} deactivated. Their detection records are being deleted in the background.')
+    return redirect(url_for('admin.job_status', job_id=job.id))
+
+@admin_bp.route('/jobs/<job_id>')
+@login_required
+@admin_required
+def job_status(job_id):
+    job = get_job(job_id)
+    if job is None:
+        abort(404)
+    if request.args.get('format') == 'json' or request.accept_mimetypes.best == 'application/json':
+        return jsonify(job.to_dict())
+    return render_template('admin/job_status.html', job=job)
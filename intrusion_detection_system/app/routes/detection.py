@@ -1,158 +1,414 @@
-from flask import Blueprint, render_template, request, jsonify, flash
+from flask import Blueprint, render_template, request, jsonify, flash, current_app
 from flask_login import login_required, current_user
 from app import db
 from app.models.detection import Detection
-import joblib
-import pandas as pd
+from app.services.model_registry import model_registry
+from app.services.prediction_cache import prediction_cache
+from app.services.scoring import score_matrix
+from app.services.micro_batcher import micro_batcher
+from app.services.rollups import get_counts, get_series
+from app.services.traffic_simulator import simulate_samples, resolve_mix
+from app.services.flow_features import flow_streams
+from app.services.history import page_detections, parse_filters, detection_to_dict, encode_cursor, decode_cursor
+from app.services.archive import read_archive
+from app.services.incidents import page_incidents
+from app.services.detection_writer import detection_writer, make_detection_row, WriterQueueFull
+from app.services.metrics import (StageTimer, count_predictions, DB_ERRORS, MODEL_LOAD_ERRORS,
+                                  REQUEST_ERRORS)
+from app.services.profiling import profiled
 import numpy as np
-import os
 import json
+import time
+from itertools import islice
 from datetime import datetime
 
 detection_bp = Blueprint('detection', __name__)
 
+NDJSON_MIMETYPES = ('application/x-ndjson', 'application/ndjson', 'application/jsonl')
+# JSON values a record field may hold; objects and arrays are rejected
+SCALAR_TYPES = frozenset((str, int, float, bool, type(None)))
+# Fields stored as text on the Detection row
+TEXT_FIELDS = ('src_ip', 'protocol_type')
+
 def load_ml_model():
-    """Load the trained Random Forest model"""
+    """Return the trained Random Forest model from the process-wide registry"""
     try:
-        model_path = os.path.join(os.path.dirname(__file__), '..', 'static', 'models', 'intrusion_detection_model.pkl')
-        if not os.path.exists(model_path):
-            # Try alternate path
-            model_path = 'intrusion_detection_model.pkl'
-
-        model_data = joblib.load(model_path)
-        return model_data
-    except Exception as e:
-        print(f"Error loading model: {e}")
+        return model_registry.get()
+    except Exception:
+        MODEL_LOAD_ERRORS.inc()
+        current_app.logger.exception('Error loading model')
         return None
 
 @detection_bp.route('/live')
 @login_required
 def live_detection():
-    return render_template('detection/live_detection.html')
+    # Long-polling needs every request of a session on the same worker, which
+    # a multi-worker setup (one with a message queue) cannot promise
+    websocket_only = bool(current_app.config.get('SOCKETIO_MESSAGE_QUEUE'))
+    return render_template('detection/live_detection.html', websocket_only=websocket_only)
 
 @detection_bp.route('/results')
 @login_required
 def results():
-    user_detections = Detection.query.filter_by(user_id=current_user.id).order_by(Detection.timestamp.desc()).all()
-    return render_template('detection/results.html', detections=user_detections)
+    try:
+        filters = parse_filters(request.args)
+        user_detections, next_cursor = page_detections(
+            current_user.id, filters, request.args.get('cursor'),
+            limit=current_app.config.get('RESULTS_PAGE_SIZE', 50))
+    except ValueError as e:
+        flash(str(e))
+        user_detections, next_cursor = page_detections(current_user.id)
+    return render_template('detection/results.html', detections=user_detections,
+                           next_cursor=next_cursor, filters=request.args)
+
+@detection_bp.route('/api/detections', methods=['GET'])
+@login_required
+def list_detections():
+    """Keyset-paginated detection history as JSON"""
+    limit = min(request.args.get('limit', 100, type=int), current_app.config.get('API_MAX_PAGE_SIZE', 1000))
+    try:
+        filters = parse_filters(request.args)
+        detections, next_cursor = page_detections(current_user.id, filters, request.args.get('cursor'), max(limit, 1))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({
+        'detections': [detection_to_dict(d) for d in detections],
+        'next_cursor': next_cursor
+    })
+
+@detection_bp.route('/api/archive', methods=['GET'])
+@login_required
+def list_archived_detections():
+    """Archived detections, oldest first, streamed from the partitions in range"""
+    limit = max(min(request.args.get('limit', 100, type=int), current_app.config.get('API_MAX_PAGE_SIZE', 1000)), 1)
+    try:
+        filters = parse_filters(request.args)
+        cursor = request.args.get('cursor')
+        rows = read_archive(filters.get('since'), filters.get('until'), user_id=current_user.id,
+                            prediction=filters.get('prediction'), protocol=filters.get('protocol'),
+                            after=decode_cursor(cursor) if cursor else None)
+        page = list(islice(rows, limit + 1))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    next_cursor = encode_cursor(page[limit - 1]) if len(page) > limit else None
+    return jsonify({
+        'detections': [detection_to_dict(d) for d in page[:limit]],
+        'next_cursor': next_cursor
+    })
+
+@detection_bp.route('/api/incidents', methods=['GET'])
+@login_required
+def list_incidents():
+    """Keyset-paginated incidents (consolidated attacks) as JSON"""
+    limit = min(request.args.get('limit', 100, type=int), current_app.config.get('API_MAX_PAGE_SIZE', 1000))
+    try:
+        filters = parse_filters(request.args)
+        if request.args.get('ip'):
+            filters['ip'] = request.args.get('ip')
+        incidents, next_cursor = page_incidents(current_user.id, filters, request.args.get('cursor'), max(limit, 1))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({
+        'incidents': [incident.to_dict() for incident in incidents],
+        'next_cursor': next_cursor
+    })
 
 @detection_bp.route('/api/predict', methods=['POST'])
 @login_required
+@profiled
 def predict():
+    timer = StageTimer('predict')
     try:
-        data = request.get_json()
+        with timer.stage('parse'):
+            data = request.get_json()
 
-        # Load the model
-        model_data = load_ml_model()
-        if not model_data:
+        # Get the shared model
+        loaded_model = load_ml_model()
+        if not loaded_model:
+            REQUEST_ERRORS.inc(endpoint='predict', status=500)
             return jsonify({'error': 'Model not available'}), 500
 
-        model = model_data['model']
-        encoders = model_data['label_encoders']
-        feature_names = model_data['feature_names']
-
-        # Prepare sample data
-        sample_df = pd.DataFrame([data])
-
-        # Encode categorical variables
-        for feature in encoders:
-            if feature in sample_df.columns:
-                try:
-                    sample_df[feature] = encoders[feature].transform(sample_df[feature])
-                except ValueError:
-                    # Handle unknown categories
-                    sample_df[feature] = 0
-
-        # Ensure all features are present
-        sample_array = np.zeros(len(feature_names))
-        for i, feature in enumerate(feature_names):
-            if feature in sample_df.columns:
-                sample_array[i] = sample_df[feature].iloc[0]
-
-        # Make prediction
-        prediction = model.predict([sample_array])[0]
-        probability = model.predict_proba([sample_array])[0]
-        confidence = max(probability)
-
-        # Save detection to database
-        detection = Detection(
-            user_id=current_user.id,
-            prediction=prediction,
-            confidence=confidence,
-            ip_address=data.get('src_ip', 'Unknown'),
-            protocol=data.get('protocol_type', 'Unknown'),
-            src_bytes=int(data.get('src_bytes', 0)),
-            dst_bytes=int(data.get('dst_bytes', 0))
-        )
-        db.session.add(detection)
-        db.session.commit()
+        # Encode and score the sample
+        with timer.stage('encode'):
+            features = loaded_model.encoder.encode_one(data)
+        with timer.stage('inference'):
+            predictions, confidences, probabilities = micro_batcher.score(loaded_model, features)
+        prediction = str(predictions[0])
+        confidence = float(confidences[0])
+        probability = probabilities[0]
+        count_predictions(predictions)
+
+        # Queue the detection for persistence
+        timestamp = datetime.utcnow()
+        with timer.stage('db'):
+            detection_writer.submit([make_detection_row(current_user.id, data, prediction, confidence, timestamp)])
 
+        with timer.stage('serialize'):
+            return jsonify({
+                'prediction': prediction,
+                'confidence': float(confidence),
+                'probabilities': {cls: float(prob) for cls, prob in zip(loaded_model.attack_classes, probability)},
+                'timestamp': timestamp.isoformat(),
+                'is_attack': prediction != 'normal',
+                'model_version': loaded_model.version
+            })
+
+    except WriterQueueFull as e:
+        REQUEST_ERRORS.inc(endpoint='predict', status=503)
+        return jsonify({'error': str(e)}), 503, {'Retry-After': '1'}
+    except Exception as e:
+        db.session.rollback()
+        if 'db' in timer.durations:
+            DB_ERRORS.inc(source='predict')
+        REQUEST_ERRORS.inc(endpoint='predict', status=500)
+        current_app.logger.exception('Prediction failed')
+        return jsonify({'error': str(e)}), 500
+
+def parse_batch_records():
+    """Read a list of records from a JSON array, {"records": [...]} or NDJSON body"""
+    if request.mimetype in NDJSON_MIMETYPES:
+        lines = request.get_data(as_text=True).splitlines()
+        records = [json.loads(line) for line in lines if line.strip()]
+    else:
+        payload = request.get_json()
+        records = payload.get('records') if isinstance(payload, dict) else payload
+
+    if not isinstance(records, list) or not all(isinstance(r, dict) for r in records):
+        raise ValueError('Expected an array of record objects')
+    for index, record in enumerate(records):
+        check_record(index, record)
+    return records
+
+def check_record(index, record):
+    """Reject a record whose fields cannot be scored and stored, before any of the batch is"""
+    if not {type(value) for value in record.values()} <= SCALAR_TYPES:
+        name = next(name for name, value in record.items() if type(value) not in SCALAR_TYPES)
+        raise ValueError(f'Record {index}: {name} must be a string, number or null')
+    for name in TEXT_FIELDS:
+        value = record.get(name)
+        if value is not None and not isinstance(value, str):
+            raise ValueError(f'Record {index}: {name} must be a string')
+
+def score_batch(loaded_model, records, timer):
+    """Score ``records``, queue their detections and build the batch response"""
+    # Encode and score the whole batch at once
+    with timer.stage('encode'):
+        features = loaded_model.encoder.encode(records)
+    with timer.stage('inference'):
+        predictions, confidences, probabilities = score_matrix(loaded_model, features)
+    count_predictions(predictions)
+
+    # Queue the detections for a bulk insert
+    timestamp = datetime.utcnow()
+    with timer.stage('db'):
+        rows = [make_detection_row(current_user.id, record, prediction, confidence, timestamp)
+                for record, prediction, confidence in zip(records, predictions, confidences)]
+        detection_writer.submit(rows)
+
+    with timer.stage('serialize'):
+        results = [{
+            'prediction': row['prediction'],
+            'confidence': row['confidence'],
+            'is_attack': row['prediction'] != 'normal'
+        } for row in rows]
+        if request.args.get('probabilities', type=int):
+            classes = list(loaded_model.attack_classes)
+            for result, probability in zip(results, probabilities.tolist()):
+                result['probabilities'] = dict(zip(classes, probability))
+
+        labels, counts = np.unique(predictions, return_counts=True)
         return jsonify({
-            'prediction': prediction,
-            'confidence': float(confidence),
-            'probabilities': {cls: float(prob) for cls, prob in zip(model_data['attack_classes'], probability)},
-            'timestamp': detection.timestamp.isoformat(),
-            'is_attack': prediction != 'normal'
+            'count': len(results),
+            'results': results,
+            'summary': {str(label): int(count) for label, count in zip(labels, counts)},
+            'timestamp': timestamp.isoformat(),
+            'model_version': loaded_model.version
         })
 
+@detection_bp.route('/api/predict_batch', methods=['POST'])
+@login_required
+@profiled
+def predict_batch():
+    timer = StageTimer('predict_batch')
+    try:
+        try:
+            with timer.stage('parse'):
+                records = parse_batch_records()
+        except ValueError as e:
+            REQUEST_ERRORS.inc(endpoint='predict_batch', status=400)
+            return jsonify({'error': str(e)}), 400
+
+        max_records = current_app.config.get('PREDICT_BATCH_MAX_RECORDS', 10000)
+        if len(records) > max_records:
+            REQUEST_ERRORS.inc(endpoint='predict_batch', status=413)
+            return jsonify({'error': f'Batch too large, at most {max_records} records per call'}), 413
+        if not records:
+            return jsonify({'count': 0, 'results': [], 'summary': {}})
+
+        loaded_model = load_ml_model()
+        if not loaded_model:
+            REQUEST_ERRORS.inc(endpoint='predict_batch', status=500)
+            return jsonify({'error': 'Model not available'}), 500
+
+        return score_batch(loaded_model, records, timer)
+
+    except WriterQueueFull as e:
+        REQUEST_ERRORS.inc(endpoint='predict_batch', status=503)
+        return jsonify({'error': str(e)}), 503, {'Retry-After': '1'}
     except Exception as e:
+        db.session.rollback()
+        if 'db' in timer.durations:
+            DB_ERRORS.inc(source='predict_batch')
+        REQUEST_ERRORS.inc(endpoint='predict_batch', status=500)
+        current_app.logger.exception('Batch prediction failed')
         return jsonify({'error': str(e)}), 500
 
+@detection_bp.route('/api/predict_flows', methods=['POST'])
+@login_required
+@profiled
+def predict_flows():
+    """Score raw connection events, deriving the window features server-side"""
+    timer = StageTimer('predict_flows')
+    try:
+        try:
+            with timer.stage('parse'):
+                events = parse_batch_records()
+        except ValueError as e:
+            REQUEST_ERRORS.inc(endpoint='predict_flows', status=400)
+            return jsonify({'error': str(e)}), 400
+
+        max_records = current_app.config.get('PREDICT_BATCH_MAX_RECORDS', 10000)
+        if len(events) > max_records:
+            REQUEST_ERRORS.inc(endpoint='predict_flows', status=413)
+            return jsonify({'error': f'Batch too large, at most {max_records} events per call'}), 413
+        if not events:
+            return jsonify({'count': 0, 'results': [], 'summary': {}})
+
+        loaded_model = load_ml_model()
+        if not loaded_model:
+            REQUEST_ERRORS.inc(endpoint='predict_flows', status=500)
+            return jsonify({'error': 'Model not available'}), 500
+
+        # Events without a timestamp happened when the call arrived
+        received = time.time()
+        for event in events:
+            if isinstance(event, dict) and event.get('timestamp') is None:
+                event['timestamp'] = received
+
+        # Events continue this user's windows from their previous calls
+        try:
+            with timer.stage('extract'):
+                records = flow_streams.records(current_user.id, events, loaded_model.feature_names)
+        except (TypeError, ValueError) as e:
+            REQUEST_ERRORS.inc(endpoint='predict_flows', status=400)
+            return jsonify({'error': f'Invalid connection event: {e}'}), 400
+        return score_batch(loaded_model, records, timer)
+
+    except WriterQueueFull as e:
+        REQUEST_ERRORS.inc(endpoint='predict_flows', status=503)
+        return jsonify({'error': str(e)}), 503, {'Retry-After': '1'}
+    except Exception as e:
+        db.session.rollback()
+        if 'db' in timer.durations:
+            DB_ERRORS.inc(source='predict_flows')
+        REQUEST_ERRORS.inc(endpoint='predict_flows', status=500)
+        current_app.logger.exception('Flow prediction failed')
+        return jsonify({'error': str(e)}), 500
+
+def score_uploaded_csv():
+    """Stream the uploaded CSV through the model and store the detections"""
+    # pandas is only needed here, keep it out of app startup
+    from app.services.csv_ingest import ingest_csv
+
+    upload = request.files.get('file')
+    if not upload or not upload.filename:
+        raise ValueError('No CSV file uploaded')
+
+    loaded_model = load_ml_model()
+    if not loaded_model:
+        raise RuntimeError('Model not available')
+
+    return ingest_csv(upload.stream, loaded_model,
+                      chunk_size=current_app.config.get('CSV_CHUNK_SIZE', 10000),
+                      user_id=current_user.id, writer=detection_writer)
+
+@detection_bp.route('/upload', methods=['GET', 'POST'])
+@login_required
+def upload_csv():
+    report = None
+    if request.method == 'POST':
+        try:
+            report = score_uploaded_csv()
+            flash(f"Scored {report['rows']} rows at {report['rows_per_sec']:.0f} rows/sec.")
+        except Exception as e:
+            flash(f'Could not score file: {e}')
+    return render_template('detection/upload.html', report=report)
+
+@detection_bp.route('/api/score_csv', methods=['POST'])
+@login_required
+@profiled
+def score_csv():
+    try:
+        return jsonify(score_uploaded_csv())
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@detection_bp.route('/api/stats', methods=['GET'])
+@login_required
+def detection_stats():
+    """Detection counts by class, optionally as a series of time buckets"""
+    bucket = request.args.get('bucket')
+    since = request.args.get('since')
+    try:
+        since = datetime.fromisoformat(since) if since else None
+        result = {'counts': get_counts(current_user.id)}
+        if bucket:
+            result['series'] = get_series(bucket, since, current_user.id)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(result)
+
+@detection_bp.route('/api/model', methods=['GET'])
+@login_required
+def model_info():
+    """Report the version and hash of the loaded model"""
+    if not load_ml_model():
+        return jsonify({'error': 'Model not available'}), 500
+    return jsonify(model_registry.info())
+
+@detection_bp.route('/api/cache', methods=['GET'])
+@login_required
+def cache_stats():
+    """Hit, miss and eviction counters of the prediction cache"""
+    return jsonify(prediction_cache.stats())
+
 @detection_bp.route('/api/simulate', methods=['POST'])
 @login_required
+@profiled
 def simulate_traffic():
     """Simulate network traffic for demonstration"""
     try:
+        options = request.get_json(silent=True) or {}
+        try:
+            count = int(request.args.get('count', options.get('count', 5)))
+            seed = request.args.get('seed', options.get('seed'))
+            seed = int(seed) if seed is not None else None
+        except (TypeError, ValueError):
+            return jsonify({'error': 'count and seed must be integers'}), 400
+        profile = request.args.get('profile', options.get('profile'))
+
+        max_count = current_app.config.get('SIMULATE_MAX_COUNT', 10000)
+        if not 1 <= count <= max_count:
+            return jsonify({'error': f'count must be between 1 and {max_count}'}), 400
+        try:
+            resolve_mix(profile)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
         # Generate random network traffic samples
-        samples = []
-        attack_types = ['normal', 'dos', 'probe', 'r2l', 'u2r']
-
-        for _ in range(5):
-            sample = {
-                'duration': np.random.exponential(50),
-                'protocol_type': np.random.choice(['tcp', 'udp', 'icmp']),
-                'service': np.random.choice(['http', 'smtp', 'ftp', 'ssh', 'telnet']),
-                'flag': np.random.choice(['SF', 'S0', 'REJ', 'RSTR']),
-                'src_bytes': int(np.random.exponential(1000)),
-                'dst_bytes': int(np.random.exponential(500)),
-                'land': int(np.random.choice([0, 1], p=[0.99, 0.01])),
-                'wrong_fragment': int(np.random.poisson(0.1)),
-                'urgent': int(np.random.poisson(0.01)),
-                'hot': int(np.random.poisson(0.5)),
-                'num_failed_logins': int(np.random.poisson(0.1)),
-                'logged_in': int(np.random.choice([0, 1], p=[0.3, 0.7])),
-                'num_compromised': int(np.random.poisson(0.1)),
-                'root_shell': int(np.random.poisson(0.05)),
-                'su_attempted': int(np.random.poisson(0.01)),
-                'num_root': int(np.random.poisson(0.1)),
-                'num_file_creations': int(np.random.poisson(0.1)),
-                'num_shells': int(np.random.poisson(0.05)),
-                'num_access_files': int(np.random.poisson(0.1)),
-                'num_outbound_cmds': int(np.random.poisson(0.01)),
-                'is_host_login': int(np.random.choice([0, 1], p=[0.95, 0.05])),
-                'is_guest_login': int(np.random.choice([0, 1], p=[0.95, 0.05])),
-                'count': int(np.random.poisson(10)),
-                'srv_count': int(np.random.poisson(8)),
-                'serror_rate': float(np.random.uniform(0, 1)),
-                'srv_serror_rate': float(np.random.uniform(0, 1)),
-                'rerror_rate': float(np.random.uniform(0, 1)),
-                'srv_rerror_rate': float(np.random.uniform(0, 1)),
-                'same_srv_rate': float(np.random.uniform(0, 1)),
-                'diff_srv_rate': float(np.random.uniform(0, 1)),
-                'srv_diff_host_rate': float(np.random.uniform(0, 1)),
-                'dst_host_count': int(np.random.poisson(50)),
-                'dst_host_srv_count': int(np.random.poisson(30)),
-                'dst_host_same_srv_rate': float(np.random.uniform(0, 1)),
-                'dst_host_diff_srv_rate': float(np.random.uniform(0, 1)),
-                'dst_host_same_src_port_rate': float(np.random.uniform(0, 1)),
-                'dst_host_srv_diff_host_rate': float(np.random.uniform(0, 1)),
-                'dst_host_serror_rate': float(np.random.uniform(0, 1)),
-                'dst_host_srv_serror_rate': float(np.random.uniform(0, 1)),
-                'dst_host_rerror_rate': float(np.random.uniform(0, 1)),
-                'dst_host_srv_rerror_rate': float(np.random.uniform(0, 1)),
-                'src_ip': f"192.168.1.{np.random.randint(1, 255)}"
-            }
-            samples.append(sample)
+        samples = simulate_samples(count, seed=seed, profile=profile)
 
         return jsonify({'samples': samples})
 
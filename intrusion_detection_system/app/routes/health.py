@@ -0,0 +1,25 @@
+from flask import Blueprint, jsonify
+
+from app.services.model_registry import model_registry
+
+health_bp = Blueprint('health', __name__)
+
+
+@health_bp.route('/healthz')
+def healthz():
+    """Liveness: the process is serving requests"""
+    return jsonify({'status': 'ok'})
+
+
+@health_bp.route('/readyz')
+def readyz():
+    """Readiness: 200 once the model is loaded and has served a prediction"""
+    info = model_registry.info()
+    ready = model_registry.ready
+    body = {
+        'ready': ready,
+        'model_loaded': info['loaded'],
+        'model_warm': ready,
+        'model_version': info.get('version')
+    }
+    return jsonify(body), 200 if ready else 503
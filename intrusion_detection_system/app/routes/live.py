@@ -0,0 +1,23 @@
+from flask import request
+from flask_login import current_user
+from app import socketio
+from app.services.live_stream import live_stream, NAMESPACE
+
+@socketio.on('connect', namespace=NAMESPACE)
+def connect():
+    if not current_user.is_authenticated:
+        return False
+
+@socketio.on('subscribe', namespace=NAMESPACE)
+def subscribe():
+    live_stream.subscribe(request.sid, current_user.id)
+    return {'subscribed': True, 'interval': live_stream.interval}
+
+@socketio.on('unsubscribe', namespace=NAMESPACE)
+def unsubscribe():
+    live_stream.unsubscribe(request.sid)
+    return {'subscribed': False}
+
+@socketio.on('disconnect', namespace=NAMESPACE)
+def disconnect():
+    live_stream.unsubscribe(request.sid)
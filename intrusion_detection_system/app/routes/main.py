@@ -3,6 +3,8 @@ from flask_login import login_required, current_user
 from app.models.user import User
 from app.models.detection import Detection
 from app import db
+from app.services.rollups import get_summary
+from app.services.incidents import page_incidents
 
 main_bp = Blueprint('main', __name__)
 
@@ -16,15 +18,9 @@ def dashboard():
     # Get user's detection history
     user_detections = Detection.query.filter_by(user_id=current_user.id).order_by(Detection.timestamp.desc()).limit(10).all()
 
-    # Get statistics
-    total_detections = Detection.query.filter_by(user_id=current_user.id).count()
-    normal_count = Detection.query.filter_by(user_id=current_user.id, prediction='normal').count()
-    attack_count = total_detections - normal_count
+    # Get statistics from the pre-aggregated counters
+    stats = get_summary(current_user.id)
 
-    stats = {
-        'total_detections': total_detections,
-        'normal_count': normal_count,
-        'attack_count': attack_count
-    }
+    incidents, _ = page_incidents(current_user.id, limit=10)
 
-    return render_template('main/dashboard.html', detections=user_detections, stats=stats)
\ No newline at end of file
+    return render_template('main/dashboard.html', detections=user_detections, stats=stats, incidents=incidents)
\ No newline at end of file
@@ -0,0 +1,56 @@
+import hmac
+
+from flask import Blueprint, Response, current_app, request
+from flask_login import current_user
+
+from app.services import metrics
+from app.services.detection_writer import detection_writer
+from app.services.micro_batcher import micro_batcher
+from app.services.prediction_cache import prediction_cache
+from app.services.user_cache import user_cache
+from app.services.incidents import incident_aggregator
+
+metrics_bp = Blueprint('metrics', __name__)
+
+metrics.registry.callback('ids_detection_queue_pending', 'Detections waiting for the write-behind worker',
+                          detection_writer.pending)
+metrics.registry.callback('ids_detection_rows_failed_total', 'Detection rows dropped after a failed write',
+                          lambda: detection_writer.failed, kind='counter')
+metrics.registry.callback('ids_prediction_cache_hits_total', 'Prediction cache hits',
+                          lambda: prediction_cache.hits, kind='counter')
+metrics.registry.callback('ids_prediction_cache_misses_total', 'Prediction cache misses',
+                          lambda: prediction_cache.misses, kind='counter')
+metrics.registry.callback('ids_micro_batch_pending', 'Predict rows waiting for the micro-batcher',
+                          lambda: micro_batcher.stats()['pending'])
+metrics.registry.callback('ids_prediction_cache_entries', 'Rows held in the prediction cache',
+                          lambda: prediction_cache.stats()['entries'])
+
+metrics.registry.callback('ids_user_cache_hits_total', 'User loads served from the cache',
+                          lambda: user_cache.hits, kind='counter')
+metrics.registry.callback('ids_user_cache_revalidations_total', 'Expired user cache entries kept after a version check',
+                          lambda: user_cache.revalidations, kind='counter')
+metrics.registry.callback('ids_user_cache_misses_total', 'User loads that read the full row',
+                          lambda: user_cache.misses, kind='counter')
+metrics.registry.callback('ids_user_cache_hit_ratio', 'Share of user loads served without a full row read',
+                          lambda: user_cache.stats()['hit_ratio'])
+metrics.registry.callback('ids_incidents_open', 'Incidents this process can still extend',
+                          incident_aggregator.open_incidents)
+
+
+@metrics_bp.route('/metrics')
+def export_metrics():
+    """Counters and stage latencies in the Prometheus text format.
+
+    Scrapers authenticate with the ``METRICS_TOKEN`` bearer token; without one
+    configured, only logged-in admins can read it.
+    """
+    token = current_app.config.get('METRICS_TOKEN')
+    if token:
+        supplied = request.headers.get('Authorization', '').removeprefix('Bearer ').strip()
+        if not hmac.compare_digest(supplied.encode(), token.encode()):
+            return Response('Unauthorized\n', status=401, mimetype='text/plain')
+    elif not current_user.is_authenticated:
+        return Response('Unauthorized\n', status=401, mimetype='text/plain')
+    elif not current_user.can_manage_users():
+        return Response('Forbidden\n', status=403, mimetype='text/plain')
+    return Response(metrics.registry.render(), mimetype='text/plain; version=0.0.4')
@@ -8,6 +8,7 @@ profile_bp = Blueprint('profile', __name__)
 def profile():
     from app import db               # Import inside the route function
     from app.models.user import User
+    from app.services.user_cache import user_cache
 
     user = current_user
 
@@ -22,9 +23,11 @@ def profile():
             flash('Username or email already taken by another user.')
             return redirect(url_for('profile.profile'))
 
+        user_id = user.id
         user.username = username
         user.email = email
         db.session.commit()
+        user_cache.invalidate(user_id)
         flash('Profile updated successfully.')
         return redirect(url_for('profile.profile'))
 
@@ -35,6 +38,7 @@ def profile():
 @login_required
 def change_password():
     from app import db
+    from app.services.user_cache import user_cache
 
     if request.method == 'POST':
         old_password = request.form.get('old_password')
@@ -49,8 +53,10 @@ def change_password():
             flash('New password and confirmation do not match.')
             return redirect(url_for('profile.change_password'))
 
+        user_id = current_user.id
         current_user.set_password(new_password)
         db.session.commit()
+        user_cache.invalidate(user_id)
         flash('Password updated successfully.')
         return redirect(url_for('profile.profile'))
 
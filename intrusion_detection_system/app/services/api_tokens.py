@@ -0,0 +1,95 @@
+"""API tokens for the detection service.
+
+Tokens are 32 random bytes, URL-safe encoded with an ``ids_`` prefix. They
+carry enough entropy that a plain SHA-256 is a safe lookup key; no salt or
+slow hash is needed. Resolved tokens are cached for ``API_TOKEN_CACHE_TTL``
+seconds, so a sensor's steady stream of calls costs no database reads. A
+revoked token or deactivated user stops working once the entry expires.
+"""
+import hashlib
+import secrets
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime
+
+from sqlalchemy import select
+
+from app import db
+from app.models.api_token import ApiToken
+from app.models.user import User
+
+TOKEN_PREFIX = 'ids_'
+
+TokenIdentity = namedtuple('TokenIdentity', 'token_id user_id username')
+
+
+def hash_token(token):
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def create_api_token(user, name):
+    """Store a new token for ``user`` and return (ApiToken, plaintext token)"""
+    token = TOKEN_PREFIX + secrets.token_urlsafe(32)
+    api_token = ApiToken(user_id=user.id, name=name, prefix=token[:12], token_hash=hash_token(token))
+    db.session.add(api_token)
+    db.session.commit()
+    return api_token, token
+
+
+def revoke_api_token(token_id):
+    api_token = db.session.get(ApiToken, token_id)
+    if api_token is None:
+        return None
+    if api_token.revoked_at is None:
+        api_token.revoked_at = datetime.utcnow()
+        db.session.commit()
+    token_cache.clear()
+    return api_token
+
+
+def lookup_token(token):
+    """The identity behind a plaintext token, or None; needs an app context"""
+    row = db.session.execute(
+        select(ApiToken.id, User.id, User.username)
+        .join(User, User.id == ApiToken.user_id)
+        .where(ApiToken.token_hash == hash_token(token), ApiToken.revoked_at.is_(None), User.active.is_(True))
+    ).first()
+    return TokenIdentity(*row) if row else None
+
+
+class TokenCache:
+    """TTL cache of token hash -> identity, including misses"""
+
+    def __init__(self):
+        self.ttl = 60.0
+        self.max_entries = 10000
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.ttl = app.config.get('API_TOKEN_CACHE_TTL', self.ttl)
+        app.extensions['token_cache'] = self
+
+    def get(self, token):
+        """(found, identity) for a cached token"""
+        entry = self._entries.get(hash_token(token))
+        if entry is None or entry[0] < time.monotonic():
+            return False, None
+        return True, entry[1]
+
+    def put(self, token, identity):
+        with self._lock:
+            if len(self._entries) >= self.max_entries:
+                now = time.monotonic()
+                self._entries = {key: entry for key, entry in self._entries.items() if entry[0] >= now}
+                if len(self._entries) >= self.max_entries:
+                    self._entries.clear()
+            self._entries[hash_token(token)] = (time.monotonic() + self.ttl, identity)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+token_cache = TokenCache()
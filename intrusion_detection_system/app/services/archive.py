@@ -0,0 +1,349 @@
+"""Retention for the Detection table.
+
+Detections older than ``RETENTION_DAYS`` are moved into one archive file per
+day under ``ARCHIVE_DIR`` (``<year>/<month>/detections-<date>.csv.gz``, or
+``.parquet`` when pyarrow is installed) and deleted from the hot table. The
+rollup counters are left alone, so dashboards keep their all-time totals.
+
+Archived rows are read back lazily: only the partitions overlapping the
+requested time range are opened, and rows are streamed from them.
+"""
+import csv
+import gzip
+import heapq
+import os
+import re
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import delete, func, select
+
+from app import db
+from app.models.detection import Detection
+
+COLUMNS = ('id', 'user_id', 'prediction', 'confidence', 'timestamp',
+           'ip_address', 'protocol', 'src_bytes', 'dst_bytes')
+FORMATS = ('csv', 'parquet')
+EXTENSIONS = {'csv': '.csv.gz', 'parquet': '.parquet'}
+PARTITION_RE = re.compile(r'^detections-(\d{4}-\d{2}-\d{2})(?:\.(\d+))?(\.csv\.gz|\.parquet)$')
+
+ArchivedDetection = namedtuple('ArchivedDetection', COLUMNS)
+Partition = namedtuple('Partition', 'day part path format')
+
+
+def parquet_available():
+    try:
+        import pyarrow.parquet  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def archive_format(name=None):
+    name = name or current_app.config.get('ARCHIVE_FORMAT', 'auto')
+    if name == 'auto':
+        return 'parquet' if parquet_available() else 'csv'
+    if name not in FORMATS:
+        raise ValueError(f"Unknown archive format {name!r}, expected one of auto, {', '.join(FORMATS)}")
+    if name == 'parquet' and not parquet_available():
+        raise RuntimeError('The parquet archive format needs pyarrow installed')
+    return name
+
+
+def archive_dir():
+    return current_app.config.get('ARCHIVE_DIR') or os.path.join(current_app.instance_path, 'archive')
+
+
+def _partition_path(root, day, part, fmt):
+    suffix = f'.{part}' if part else ''
+    return os.path.join(root, f'{day:%Y}', f'{day:%m}', f'detections-{day:%Y-%m-%d}{suffix}{EXTENSIONS[fmt]}')
+
+
+def list_partitions(start=None, end=None, root=None):
+    """Archive files whose day overlaps [start, end), oldest first"""
+    root = root or archive_dir()
+    partitions = []
+    for directory, _, files in os.walk(root):
+        for name in files:
+            match = PARTITION_RE.match(name)
+            if not match:
+                continue
+            day = datetime.strptime(match.group(1), '%Y-%m-%d')
+            if start is not None and day + timedelta(days=1) <= start:
+                continue
+            if end is not None and day >= end:
+                continue
+            fmt = 'csv' if match.group(3) == '.csv.gz' else 'parquet'
+            partitions.append(Partition(day, int(match.group(2) or 0), os.path.join(directory, name), fmt))
+    return sorted(partitions)
+
+
+# Writing
+
+def _to_row(values):
+    row = dict(zip(COLUMNS, values))
+    return ArchivedDetection(**row)
+
+
+def _write_csv(path, rows):
+    count = 0
+    with gzip.open(path, 'wt', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(COLUMNS)
+        for row in rows:
+            writer.writerow([value.isoformat() if isinstance(value, datetime) else value for value in row])
+            count += 1
+    return count
+
+
+def _write_parquet(path, rows, batch_size=50000):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([
+        ('id', pa.int64()), ('user_id', pa.int64()), ('prediction', pa.string()),
+        ('confidence', pa.float64()), ('timestamp', pa.timestamp('us')), ('ip_address', pa.string()),
+        ('protocol', pa.string()), ('src_bytes', pa.int64()), ('dst_bytes', pa.int64()),
+    ])
+    count = 0
+    with pq.ParquetWriter(path, schema, compression='zstd') as writer:
+        batch = []
+        for row in rows:
+            batch.append(row._asdict())
+            if len(batch) >= batch_size:
+                writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+                count += len(batch)
+                batch = []
+        if batch:
+            writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+            count += len(batch)
+    return count
+
+
+def write_partition(path, rows, fmt):
+    """Write rows to ``path`` atomically, returning the number written"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + '.tmp'
+    try:
+        count = (_write_parquet if fmt == 'parquet' else _write_csv)(tmp_path, rows)
+        with open(tmp_path, 'rb') as f:
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return count
+
+
+def _next_part(root, day, fmt, existing):
+    part = max(p.part for p in existing) + 1 if existing else 0
+    return _partition_path(root, day, part, fmt)
+
+
+def archive_detections(retention_days=None, batch_size=None, fmt=None, dry_run=False):
+    """Move detections older than ``retention_days`` whole days into the archive.
+
+    Each day is exported, fsynced and renamed into place before its rows are
+    deleted, and is committed separately, so an interrupted run leaves every
+    row either in the table or in a finished archive file. A run that stopped
+    between the rename and the commit leaves rows in both; the next run deletes
+    those from the table instead of archiving them again. Returns a summary of
+    the days and rows moved.
+    """
+    config = current_app.config
+    retention_days = config.get('RETENTION_DAYS', 90) if retention_days is None else retention_days
+    batch_size = batch_size or config.get('ARCHIVE_BATCH_SIZE', 50000)
+    fmt = archive_format(fmt)
+    root = archive_dir()
+
+    cutoff = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=retention_days)
+    oldest = db.session.execute(select(func.min(Detection.timestamp)).where(Detection.timestamp < cutoff)).scalar()
+    summary = {'cutoff': cutoff.isoformat(), 'format': fmt, 'days': 0, 'rows': 0, 'files': []}
+    if oldest is None:
+        return summary
+
+    columns = [getattr(Detection, column) for column in COLUMNS]
+    # One walk of the archive for the whole run
+    archived_days = {partitions[0].day: partitions
+                     for partitions in _group_by_day(list_partitions(oldest, cutoff, root))}
+    day = oldest.replace(hour=0, minute=0, second=0, microsecond=0)
+    while day is not None:
+        next_day = day + timedelta(days=1)
+        in_day = (Detection.timestamp >= day, Detection.timestamp < next_day)
+        existing = archived_days.get(day, [])
+        if existing and not dry_run:
+            _delete_archived(existing, in_day, columns, batch_size)
+        last_id = db.session.execute(select(func.max(Detection.id)).where(*in_day)).scalar()
+        if last_id is not None:
+            if dry_run:
+                count = db.session.execute(select(func.count(Detection.id)).where(*in_day)).scalar()
+            else:
+                query = (select(*columns).where(*in_day, Detection.id <= last_id)
+                         .order_by(Detection.timestamp, Detection.id).execution_options(yield_per=batch_size))
+                path = _next_part(root, day, fmt, existing)
+                count = write_partition(path, (_to_row(values) for values in db.session.execute(query)), fmt)
+                # Rows written after the export started stay in the table for the next run
+                db.session.execute(delete(Detection).where(*in_day, Detection.id <= last_id))
+                db.session.commit()
+                summary['files'].append(path)
+            summary['days'] += 1
+            summary['rows'] += count
+        # Skip straight to the next day that still has rows
+        day = db.session.execute(select(func.min(Detection.timestamp))
+                                 .where(Detection.timestamp >= next_day, Detection.timestamp < cutoff)).scalar()
+        if day is not None:
+            day = day.replace(hour=0, minute=0, second=0, microsecond=0)
+    return summary
+
+
+def _already_archived(rows, archived):
+    """Ids of ``rows`` that are also in ``archived``, both sorted by (timestamp, id)"""
+    # Whole rows are compared: SQLite hands out the ids of deleted rows again
+    archived = iter(archived)
+    ahead = next(archived, None)
+    key, same = None, set()
+    for row in rows:
+        if _sort_key(row) != key:
+            key = _sort_key(row)
+            while ahead is not None and _sort_key(ahead) < key:
+                ahead = next(archived, None)
+            same = set()
+            while ahead is not None and _sort_key(ahead) == key:
+                same.add(ahead)
+                ahead = next(archived, None)
+        if row in same:
+            yield row.id
+
+
+def _delete_archived(partitions, in_day, columns, batch_size):
+    """Delete table rows of a day that are already in its archive files"""
+    query = (select(*columns).where(*in_day).order_by(Detection.timestamp, Detection.id)
+             .execution_options(yield_per=batch_size))
+    rows = (_to_row(values) for values in db.session.execute(query))
+    ids = list(_already_archived(rows, _read_day(partitions)))
+    for start in range(0, len(ids), batch_size):
+        db.session.execute(delete(Detection).where(Detection.id.in_(ids[start:start + batch_size])))
+    db.session.commit()
+
+
+# Reading
+
+def _parse_row(raw):
+    def number(value, cast):
+        return cast(value) if value not in ('', None) else None
+
+    return ArchivedDetection(
+        id=int(raw['id']), user_id=int(raw['user_id']), prediction=raw['prediction'],
+        confidence=float(raw['confidence']), timestamp=datetime.fromisoformat(raw['timestamp']),
+        ip_address=raw['ip_address'] or None, protocol=raw['protocol'] or None,
+        src_bytes=number(raw['src_bytes'], int), dst_bytes=number(raw['dst_bytes'], int))
+
+
+def _read_partition(partition, batch_size=10000):
+    if partition.format == 'parquet':
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(partition.path).iter_batches(batch_size=batch_size):
+            for raw in batch.to_pylist():
+                yield ArchivedDetection(**raw)
+    else:
+        with gzip.open(partition.path, 'rt', newline='') as f:
+            for raw in csv.DictReader(f):
+                yield _parse_row(raw)
+
+
+def _sort_key(row):
+    return row.timestamp, row.id
+
+
+def _unique(rows):
+    last_key, seen = None, set()
+    for row in rows:
+        key = _sort_key(row)
+        if key != last_key:
+            last_key, seen = key, set()
+        if row not in seen:
+            seen.add(row)
+            yield row
+
+
+def _read_day(partitions):
+    if len(partitions) == 1:
+        return _read_partition(partitions[0])
+    # Every part is sorted, so a streaming merge keeps the day in order. A row
+    # can be in two parts if compaction stopped before removing the old ones.
+    return _unique(heapq.merge(*(_read_partition(p) for p in partitions), key=_sort_key))
+
+
+def _group_by_day(partitions):
+    days = {}
+    for partition in partitions:
+        days.setdefault(partition.day, []).append(partition)
+    return [days[day] for day in sorted(days)]
+
+
+def read_archive(since=None, until=None, user_id=None, prediction=None, protocol=None, after=None):
+    """Stream archived detections in (timestamp, id) order.
+
+    ``after`` is a (timestamp, id) pair to resume from, as decoded from a
+    history cursor. Only partitions overlapping [since, until) are opened.
+    """
+    start = since
+    if after is not None and (start is None or after[0] > start):
+        start = after[0]
+    for day_partitions in _group_by_day(list_partitions(start, until)):
+        for row in _read_day(day_partitions):
+            if since is not None and row.timestamp < since:
+                continue
+            if until is not None and row.timestamp >= until:
+                return
+            if after is not None and _sort_key(row) <= after:
+                continue
+            if user_id is not None and row.user_id != user_id:
+                continue
+            if prediction is not None and row.prediction != prediction:
+                continue
+            if protocol is not None and row.protocol != protocol:
+                continue
+            yield row
+
+
+def delete_user_rows(user_id, root=None):
+    """Rewrite the archive files holding rows of ``user_id`` without them.
+
+    Each file is replaced atomically, and removed when nothing is left in it.
+    Returns the number of rows removed.
+    """
+    removed = 0
+    for partition in list_partitions(root=root or archive_dir()):
+        found = sum(1 for row in _read_partition(partition) if row.user_id == user_id)
+        if not found:
+            continue
+        rows = (row for row in _read_partition(partition) if row.user_id != user_id)
+        if write_partition(partition.path, rows, partition.format) == 0:
+            os.remove(partition.path)
+        removed += found
+    return removed
+
+
+def compact_archive(fmt=None):
+    """Merge the part files of each day into a single partition file.
+
+    The merged file atomically replaces part 0 before the other parts are
+    removed. If the run stops in between, readers see each row once because
+    _read_day drops duplicates, and the next run finishes the day.
+    """
+    fmt = archive_format(fmt)
+    root = archive_dir()
+    compacted = 0
+    for day_partitions in _group_by_day(list_partitions(root=root)):
+        if len(day_partitions) == 1 and day_partitions[0].format == fmt:
+            continue
+        day = day_partitions[0].day
+        path = _partition_path(root, day, 0, fmt)
+        write_partition(path, _read_day(day_partitions), fmt)
+        for partition in day_partitions:
+            if partition.path != path:
+                os.remove(partition.path)
+        compacted += 1
+    return compacted
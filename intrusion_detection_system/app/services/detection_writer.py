@@ -0,0 +1,280 @@
+import atexit
+import glob
+import json
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import insert
+
+from app import db
+from app.models.detection import Detection
+from app.services.incidents import incident_aggregator
+from app.services.metrics import DB_ERRORS, FLUSH_SECONDS, ROWS_WRITTEN
+from app.services.rollups import TIME_BUCKETS, apply_rollups
+
+
+class WriterQueueFull(Exception):
+    """Raised when the write-behind queue stays full past the enqueue timeout.
+
+    None of the submitted rows were queued, so the caller can retry the batch.
+    """
+
+
+def _to_int(value):
+    # Same fallback as the feature encoder: anything unparseable stores as 0
+    try:
+        return int(float(value))
+    except (TypeError, ValueError, OverflowError):
+        return 0
+
+
+def make_detection_row(user_id, record, prediction, confidence, timestamp):
+    """Build the column mapping for one Detection insert"""
+    return {
+        'user_id': user_id,
+        'prediction': str(prediction),
+        'confidence': float(confidence),
+        'timestamp': timestamp,
+        'ip_address': record.get('src_ip', 'Unknown'),
+        'protocol': record.get('protocol_type', 'Unknown'),
+        'src_bytes': _to_int(record.get('src_bytes')),
+        'dst_bytes': _to_int(record.get('dst_bytes'))
+    }
+
+
+class DetectionWriter:
+    """Write-behind buffer for Detection rows.
+
+    Rows are queued by the request thread and inserted in bulk by a background
+    worker every ``DETECTION_FLUSH_ROWS`` rows or ``DETECTION_FLUSH_INTERVAL_MS``
+    milliseconds, whichever comes first. When ``DETECTION_WRITE_BEHIND`` is off
+    rows are inserted synchronously in the caller's session.
+
+    A submitted batch is queued whole or not at all. A batch whose write fails
+    is retried ``DETECTION_WRITE_RETRIES`` times with exponential backoff, then
+    spilled to a JSON lines file under ``DETECTION_SPILL_DIR`` for
+    ``flask replay-detections``.
+    """
+
+    def __init__(self):
+        self.app = None
+        self.enabled = False
+        self.flush_rows = 500
+        self.flush_interval = 0.2
+        self.enqueue_timeout = 1.0
+        self.max_queued = 50000
+        self.retries = 3
+        self.retry_backoff = 0.1
+        self.spill_dir = None
+        self.rollup_buckets = TIME_BUCKETS
+        self.written = 0
+        self.failed = 0
+        self.retried = 0
+        self.spilled = 0
+        self.flushes = 0
+        self._queue = None
+        self._queued = 0
+        self._space = threading.Condition()
+        self._thread = None
+        self._pid = None
+        self._stopping = threading.Event()
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.app = app
+        self.enabled = app.config.get('DETECTION_WRITE_BEHIND', False)
+        self.flush_rows = app.config.get('DETECTION_FLUSH_ROWS', self.flush_rows)
+        self.flush_interval = app.config.get('DETECTION_FLUSH_INTERVAL_MS', 200) / 1000.0
+        self.enqueue_timeout = app.config.get('DETECTION_ENQUEUE_TIMEOUT', self.enqueue_timeout)
+        self.max_queued = app.config.get('DETECTION_QUEUE_MAXSIZE', self.max_queued)
+        self.retries = app.config.get('DETECTION_WRITE_RETRIES', self.retries)
+        self.retry_backoff = app.config.get('DETECTION_RETRY_BACKOFF', self.retry_backoff)
+        self.spill_dir = app.config.get('DETECTION_SPILL_DIR') or os.path.join(app.instance_path, 'spill')
+        self.rollup_buckets = tuple(app.config.get('ROLLUP_BUCKETS', self.rollup_buckets))
+        # Holds whole submitted batches; _queued counts their rows against max_queued
+        self._queue = queue.Queue()
+        self._queued = 0
+        app.extensions['detection_writer'] = self
+        if self.enabled:
+            atexit.register(self.stop)
+
+    def submit(self, rows, wait=False):
+        """Persist Detection row mappings, queueing them when write-behind is on.
+
+        With ``wait`` the caller blocks until there is room in the queue instead
+        of failing with WriterQueueFull, which suits offline jobs. Otherwise the
+        batch is either queued whole or rejected whole.
+        """
+        if not self.enabled:
+            start = time.perf_counter()
+            recorded = self._insert(rows)
+            db.session.commit()
+            incident_aggregator.committed(recorded)
+            self.written += len(rows)
+            ROWS_WRITTEN.inc(len(rows))
+            FLUSH_SECONDS.observe(time.perf_counter() - start)
+            return
+
+        rows = list(rows)
+        if not rows:
+            return
+        self._ensure_worker()
+        deadline = time.monotonic() + self.enqueue_timeout
+        with self._space:
+            # A batch larger than the whole queue is let in once the queue is empty
+            while self._queued and self._queued + len(rows) > self.max_queued:
+                if wait:
+                    self._space.wait()
+                    continue
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise WriterQueueFull('Detection write queue is full')
+                self._space.wait(remaining)
+            self._queued += len(rows)
+            self._queue.put(rows)
+
+    def pending(self):
+        return self._queued
+
+    def stats(self):
+        return {
+            'enabled': self.enabled,
+            'pending': self.pending(),
+            'written': self.written,
+            'failed': self.failed,
+            'retried': self.retried,
+            'spilled': self.spilled,
+            'flushes': self.flushes
+        }
+
+    def flush(self):
+        """Block until every queued row has been written"""
+        if self.enabled and self._thread is not None:
+            self._queue.join()
+
+    def stop(self):
+        """Drain the queue and stop the worker"""
+        thread = self._thread
+        if thread is None or not thread.is_alive():
+            return
+        self._stopping.set()
+        thread.join()
+        self._thread = None
+
+    def _ensure_worker(self):
+        # Start lazily so forked server workers each get their own thread
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+                return
+            self._stopping.clear()
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='detection-writer', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            batch, parts = self._collect()
+            if batch:
+                self._write_batch(batch)
+                with self._space:
+                    self._queued -= len(batch)
+                    self._space.notify_all()
+                for _ in range(parts):
+                    self._queue.task_done()
+            elif self._stopping.is_set():
+                return
+
+    def _collect(self):
+        """Queued batches, concatenated up to about ``flush_rows`` rows"""
+        batch = []
+        parts = 0
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.flush_rows:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.extend(self._queue.get(timeout=timeout))
+            except queue.Empty:
+                break
+            parts += 1
+        return batch, parts
+
+    def _write_batch(self, batch):
+        with self.app.app_context():
+            for attempt in range(self.retries + 1):
+                if attempt:
+                    time.sleep(self.retry_backoff * 2 ** (attempt - 1))
+                    self.retried += 1
+                start = time.perf_counter()
+                try:
+                    recorded = self._insert(batch)
+                    db.session.commit()
+                except Exception:
+                    db.session.rollback()
+                    DB_ERRORS.inc(source='detection_writer')
+                    self.app.logger.exception('Failed to write %d detections (attempt %d)', len(batch), attempt + 1)
+                    continue
+                incident_aggregator.committed(recorded)
+                self.written += len(batch)
+                self.flushes += 1
+                ROWS_WRITTEN.inc(len(batch))
+                FLUSH_SECONDS.observe(time.perf_counter() - start)
+                return
+            self._spill(batch)
+
+    def _spill(self, batch):
+        """Keep a batch that could not be written for ``replay_spilled``"""
+        try:
+            os.makedirs(self.spill_dir, exist_ok=True)
+            path = os.path.join(self.spill_dir, f'detections-{os.getpid()}-{time.time_ns()}.jsonl')
+            with open(path + '.tmp', 'w') as f:
+                for row in batch:
+                    f.write(json.dumps(dict(row, timestamp=row['timestamp'].isoformat())) + '\n')
+            os.replace(path + '.tmp', path)
+        except OSError:
+            self.failed += len(batch)
+            self.app.logger.exception('Dropped %d detections that could not be written or spilled', len(batch))
+            return
+        self.spilled += len(batch)
+        self.app.logger.error('Spilled %d detections to %s', len(batch), path)
+
+    def _insert(self, rows):
+        """Add rows with their rollups and incidents to the session.
+
+        Returns what incident_aggregator.committed() takes once the caller commits.
+        """
+        if not rows:
+            return None
+        stored = incident_aggregator.rows_to_store(rows)
+        if stored:
+            db.session.execute(insert(Detection), stored)
+        # Keep the dashboard counters and incidents in the same transaction;
+        # the counters include attacks that only live on as incidents
+        apply_rollups(rows, self.rollup_buckets)
+        return incident_aggregator.record(rows)
+
+
+detection_writer = DetectionWriter()
+
+
+def replay_spilled(spill_dir=None):
+    """Insert the batches spilled by the writer, deleting each file once committed"""
+    spill_dir = spill_dir or detection_writer.spill_dir
+    replayed = 0
+    for path in sorted(glob.glob(os.path.join(spill_dir, 'detections-*.jsonl'))):
+        with open(path) as f:
+            rows = [json.loads(line) for line in f if line.strip()]
+        for row in rows:
+            row['timestamp'] = datetime.fromisoformat(row['timestamp'])
+        recorded = detection_writer._insert(rows)
+        db.session.commit()
+        incident_aggregator.committed(recorded)
+        os.remove(path)
+        replayed += len(rows)
+    return replayed
@@ -0,0 +1,103 @@
+import numpy as np
+
+from app.services.metrics import UNKNOWN_CATEGORIES
+
+
+def _to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+class FeatureEncoder:
+    """Turns connection records into the model's float32 feature matrix.
+
+    Built once per loaded model. The pickled LabelEncoders are replaced by plain
+    dict lookups so unknown categories fall back to 0 for that value only.
+    """
+
+    def __init__(self, feature_names, categories):
+        self.feature_names = list(feature_names)
+        # categories maps each categorical feature to its classes in code order
+        self.tables = {
+            feature: {category: float(code) for code, category in enumerate(classes)}
+            for feature, classes in categories.items()
+        }
+        self.columns = [(index, feature, self.tables.get(feature))
+                        for index, feature in enumerate(self.feature_names)]
+        self.unknown_count = 0
+
+    @classmethod
+    def from_model_data(cls, model_data):
+        if 'categories' in model_data:
+            return cls(model_data['feature_names'], model_data['categories'])
+        return cls(model_data['feature_names'],
+                   {feature: encoder.classes_ for feature, encoder in model_data['label_encoders'].items()})
+
+    @property
+    def n_features(self):
+        return len(self.feature_names)
+
+    def allocate(self, n_rows):
+        return np.empty((n_rows, self.n_features), dtype=np.float32)
+
+    def encode(self, records, out=None):
+        """Encode a list of record dicts, writing into ``out`` when given"""
+        n_rows = len(records)
+        features = self.allocate(n_rows) if out is None else out[:n_rows]
+        unknown = 0
+
+        for index, feature, table in self.columns:
+            values = [record.get(feature) for record in records]
+            if table is not None:
+                column = np.fromiter((table.get(value, -1.0) for value in values), dtype=np.float32, count=n_rows)
+                missing = column < 0
+                n_missing = int(missing.sum())
+                if n_missing:
+                    unknown += n_missing
+                    UNKNOWN_CATEGORIES.inc(n_missing, feature=feature)
+                    column[missing] = 0.0
+            else:
+                try:
+                    column = np.array([0 if value is None else value for value in values], dtype=np.float32)
+                except (TypeError, ValueError):
+                    column = np.fromiter((_to_float(value) for value in values), dtype=np.float32, count=n_rows)
+                column[np.isnan(column)] = 0.0
+            features[:, index] = column
+
+        self.unknown_count += unknown
+        return features
+
+    def encode_one(self, record):
+        return self.encode([record])
+
+    def encode_frame(self, frame, out=None):
+        """Encode a DataFrame, e.g. a chunk read from an NSL-KDD CSV export"""
+        import pandas as pd
+
+        n_rows = len(frame)
+        features = self.allocate(n_rows) if out is None else out[:n_rows]
+        unknown = 0
+
+        for index, feature, table in self.columns:
+            if feature not in frame.columns:
+                # Same as encode(): an absent categorical value counts as unknown
+                if table is not None and n_rows:
+                    unknown += n_rows
+                    UNKNOWN_CATEGORIES.inc(n_rows, feature=feature)
+                features[:, index] = 0.0
+                continue
+            if table is not None:
+                column = frame[feature].map(table)
+                n_missing = int(column.isna().sum())
+                if n_missing:
+                    unknown += n_missing
+                    UNKNOWN_CATEGORIES.inc(n_missing, feature=feature)
+                features[:, index] = column.fillna(0.0).to_numpy(dtype=np.float32)
+            else:
+                column = pd.to_numeric(frame[feature], errors='coerce')
+                features[:, index] = column.fillna(0.0).to_numpy(dtype=np.float32)
+
+        self.unknown_count += unknown
+        return features
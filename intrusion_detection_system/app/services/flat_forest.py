@@ -0,0 +1,106 @@
+import numpy as np
+
+
+class FlatForest:
+    """A fitted RandomForestClassifier flattened into plain NumPy arrays.
+
+    Every tree's nodes are concatenated into shared ``feature``, ``threshold``,
+    ``children`` and ``value`` arrays, with ``children[2 * node]`` the left and
+    ``children[2 * node + 1]`` the right child. Leaves point back at themselves,
+    so a batch walks all trees at once in ``max_depth`` vectorized steps and the
+    leaf class distributions are averaged exactly like ``predict_proba``.
+    """
+
+    def __init__(self, feature, threshold, children, value, roots, classes, max_depth, block_size=256):
+        self.feature = feature
+        self.threshold = threshold
+        self.children = children
+        self.value = value
+        self.roots = roots
+        self.classes_ = classes
+        self.max_depth = int(max_depth)
+        self.block_size = block_size
+
+    @classmethod
+    def from_estimator(cls, forest, **kwargs):
+        features, thresholds, children, values, roots = [], [], [], [], []
+        offset = 0
+        max_depth = 0
+
+        for estimator in forest.estimators_:
+            tree = estimator.tree_
+            n_nodes = tree.node_count
+            node_ids = np.arange(n_nodes)
+            is_leaf = tree.children_left < 0
+
+            features.append(np.where(is_leaf, 0, tree.feature))
+            thresholds.append(tree.threshold)
+            left = np.where(is_leaf, node_ids, tree.children_left) + offset
+            right = np.where(is_leaf, node_ids, tree.children_right) + offset
+            children.append(np.column_stack([left, right]).ravel())
+
+            # Leaf class counts (or fractions in newer sklearn) to probabilities
+            value = tree.value[:, 0, :].astype(np.float64)
+            normalizer = value.sum(axis=1, keepdims=True)
+            normalizer[normalizer == 0.0] = 1.0
+            values.append(value / normalizer)
+
+            roots.append(offset)
+            offset += n_nodes
+            max_depth = max(max_depth, tree.max_depth)
+
+        return cls(
+            feature=np.concatenate(features).astype(np.int32),
+            threshold=np.concatenate(thresholds).astype(np.float64),
+            children=np.concatenate(children).astype(np.int32),
+            value=np.concatenate(values),
+            roots=np.asarray(roots, dtype=np.int32),
+            classes=np.asarray(forest.classes_),
+            max_depth=max_depth,
+            **kwargs)
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    @property
+    def is_split(self):
+        """Mask of internal (non-leaf) nodes"""
+        return self.children[0::2] != np.arange(len(self.feature))
+
+    def apply(self, features):
+        """Leaf node index reached in every tree, shape (n_samples, n_trees)"""
+        features = np.ascontiguousarray(features, dtype=np.float32)
+        n_samples, n_features = features.shape
+        flat = features.ravel()
+        row_offsets = (np.arange(n_samples, dtype=np.int32) * n_features)[:, None]
+        nodes = np.repeat(self.roots[None, :], n_samples, axis=0)
+        for _ in range(self.max_depth):
+            # Same test as sklearn: go left when x <= threshold, in float64
+            go_right = flat[row_offsets + self.feature[nodes]] > self.threshold[nodes]
+            nodes = self.children[2 * nodes + go_right]
+        return nodes
+
+    def predict_proba(self, features):
+        features = np.asarray(features, dtype=np.float32)
+        if features.ndim == 1:
+            features = features[None, :]
+        probabilities = np.empty((len(features), len(self.classes_)), dtype=np.float64)
+        # Blocks bound the (rows, trees, classes) intermediate
+        for start in range(0, len(features), self.block_size):
+            leaves = self.apply(features[start:start + self.block_size])
+            probabilities[start:start + len(leaves)] = self.value[leaves].sum(axis=1) / self.n_trees
+        return probabilities
+
+    def predict(self, features):
+        return self.classes_[self.predict_proba(features).argmax(axis=1)]
+
+
+def check_parity(forest, flat_forest, features, atol=1e-9):
+    """Largest absolute difference from sklearn's predict_proba, asserting it is within ``atol``"""
+    expected = forest.predict_proba(features)
+    actual = flat_forest.predict_proba(features)
+    difference = float(np.abs(expected - actual).max()) if len(features) else 0.0
+    if difference > atol:
+        raise AssertionError(f'Flat forest differs from predict_proba by {difference}')
+    return difference
@@ -0,0 +1,321 @@
+"""Derive NSL-KDD features from raw connection events.
+
+The traffic features of NSL-KDD are computed over two sliding windows that
+end at the current connection (which is counted in both):
+
+* time window, the connections of the past ``time_window`` seconds (2s):
+  ``count``, ``srv_count`` and the ``*_rate`` features derived from them
+* connection window, the last ``host_window`` connections (100):
+  the ``dst_host_*`` features
+
+Both windows keep running counters keyed by destination host, service,
+(host, service) and (host, source port) that are updated as connections enter
+and leave, so each event costs a fixed number of dict operations regardless of
+the traffic rate. Keys are dropped when their count reaches zero, and the time
+window holds at most ``max_time_window_events`` connections, so memory is
+bounded by the window sizes.
+"""
+import math
+import threading
+from collections import OrderedDict, deque
+from operator import itemgetter
+
+NSL_KDD_FEATURES = (
+    'protocol_type', 'service', 'flag', 'duration', 'src_bytes', 'dst_bytes', 'land',
+    'wrong_fragment', 'urgent', 'hot', 'num_failed_logins', 'logged_in', 'num_compromised',
+    'root_shell', 'su_attempted', 'num_root', 'num_file_creations', 'num_shells',
+    'num_access_files', 'num_outbound_cmds', 'is_host_login', 'is_guest_login', 'count',
+    'srv_count', 'serror_rate', 'srv_serror_rate', 'rerror_rate', 'srv_rerror_rate',
+    'same_srv_rate', 'diff_srv_rate', 'srv_diff_host_rate', 'dst_host_count',
+    'dst_host_srv_count', 'dst_host_same_srv_rate', 'dst_host_diff_srv_rate',
+    'dst_host_same_src_port_rate', 'dst_host_srv_diff_host_rate', 'dst_host_serror_rate',
+    'dst_host_srv_serror_rate', 'dst_host_rerror_rate', 'dst_host_srv_rerror_rate',
+)
+
+# Host-level content features copied from the event when present
+CONTENT_FEATURES = (
+    'wrong_fragment', 'urgent', 'hot', 'num_failed_logins', 'logged_in', 'num_compromised',
+    'root_shell', 'su_attempted', 'num_root', 'num_file_creations', 'num_shells',
+    'num_access_files', 'num_outbound_cmds', 'is_host_login', 'is_guest_login',
+)
+
+_ZEROS = (0,) * len(CONTENT_FEATURES)
+
+# Event fields used as window counter keys
+KEY_FIELDS = ('src_ip', 'dst_ip', 'src_port', 'dst_port', 'protocol', 'protocol_type', 'service', 'flag')
+
+SERROR_FLAGS = frozenset(('S0', 'S1', 'S2', 'S3'))
+RERROR_FLAGS = frozenset(('REJ',))
+
+# Service names used by NSL-KDD for the common well-known ports
+PORT_SERVICES = {
+    ('tcp', 20): 'ftp_data', ('tcp', 21): 'ftp', ('tcp', 22): 'ssh', ('tcp', 23): 'telnet',
+    ('tcp', 25): 'smtp', ('tcp', 53): 'domain', ('tcp', 79): 'finger', ('tcp', 80): 'http',
+    ('tcp', 110): 'pop_3', ('tcp', 111): 'sunrpc', ('tcp', 113): 'auth', ('tcp', 119): 'nntp',
+    ('tcp', 143): 'imap4', ('tcp', 179): 'bgp', ('tcp', 443): 'http_443', ('tcp', 513): 'login',
+    ('tcp', 514): 'shell', ('tcp', 6000): 'X11', ('tcp', 8001): 'http_8001',
+    ('udp', 53): 'domain_u', ('udp', 69): 'tftp_u', ('udp', 123): 'ntp_u',
+}
+
+
+def check_event(index, event):
+    """Raise ValueError for an event extract() cannot take, before it touches any window"""
+    timestamp = event.get('timestamp')
+    if timestamp is None:
+        raise ValueError(f'event {index} has no timestamp')
+    if isinstance(timestamp, bool) or not isinstance(timestamp, (int, float)) or not math.isfinite(timestamp):
+        raise ValueError(f'event {index}: timestamp must be a number of seconds')
+    for name in KEY_FIELDS:
+        value = event.get(name)
+        if value is not None and not isinstance(value, (str, int, float)):
+            raise ValueError(f'event {index}: {name} must be a string or number')
+
+
+def service_for(protocol, port):
+    if protocol == 'icmp':
+        return 'ecr_i'
+    return PORT_SERVICES.get((protocol, port), 'private')
+
+
+class _Window:
+    """Running counters over the connections currently inside one window"""
+
+    def __init__(self):
+        self.host = {}
+        self.service = {}
+        self.host_service = {}
+        self.host_port = {}
+        self.host_serror = {}
+        self.host_rerror = {}
+        self.service_serror = {}
+        self.service_rerror = {}
+
+    def key_count(self):
+        return sum(len(counter) for counter in vars(self).values())
+
+
+def _add(counter, key):
+    counter[key] = counter.get(key, 0) + 1
+
+
+def _remove(counter, key):
+    remaining = counter[key] - 1
+    if remaining:
+        counter[key] = remaining
+    else:
+        del counter[key]
+
+
+class FlowFeatureExtractor:
+    """Streams connection events into 41-value NSL-KDD feature vectors.
+
+    Events are dicts with ``timestamp`` (seconds), ``src_ip``, ``dst_ip``,
+    ``src_port``, ``dst_port``, ``protocol`` and ``flag``, and optionally
+    ``service``, ``duration``, ``src_bytes``, ``dst_bytes`` and any of the
+    content features. They must arrive in timestamp order; an earlier
+    timestamp is treated as the latest one seen. An event without a timestamp
+    raises ValueError. Not thread-safe; callers sharing an extractor hold
+    ``lock``.
+    """
+
+    def __init__(self, feature_names=NSL_KDD_FEATURES, time_window=2.0, host_window=100,
+                 max_time_window_events=500000):
+        self.feature_names = list(feature_names)
+        missing = set(self.feature_names) ^ set(NSL_KDD_FEATURES)
+        if missing:
+            raise ValueError(f"Feature names differ from NSL-KDD: {', '.join(sorted(missing))}")
+        order = [NSL_KDD_FEATURES.index(name) for name in self.feature_names]
+        self._order = None if order == list(range(len(order))) else itemgetter(*order)
+
+        self.time_window = time_window
+        self.host_window = host_window
+        self.max_time_window_events = max_time_window_events
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self._recent = deque()
+        self._recent_counts = _Window()
+        self._last = [None] * self.host_window
+        self._last_counts = _Window()
+        self._last_index = 0
+        self._clock = float('-inf')
+        self.events = 0
+
+    def stats(self):
+        return {
+            'events': self.events,
+            'time_window_connections': len(self._recent),
+            'host_window_connections': sum(1 for entry in self._last if entry is not None),
+            'tracked_keys': self._recent_counts.key_count() + self._last_counts.key_count(),
+        }
+
+    def extract(self, event):
+        """Feature values for one event, in ``feature_names`` order"""
+        get = event.get
+        protocol = get('protocol') or get('protocol_type', 'tcp')
+        dst_port = get('dst_port', 0)
+        service = get('service') or service_for(protocol, dst_port)
+        flag = get('flag', 'SF')
+        host = get('dst_ip')
+        src_port = get('src_port', 0)
+        serror = flag in SERROR_FLAGS
+        rerror = flag in RERROR_FLAGS
+        host_service = (host, service)
+        timestamp = get('timestamp')
+        if timestamp is None:
+            # Without one the time window would silently span the whole history
+            raise ValueError('event has no timestamp')
+        if timestamp < self._clock:
+            timestamp = self._clock
+        self._clock = timestamp
+        self.events += 1
+
+        # Time window: expire old connections, then add this one. The counter
+        # updates are spelled out, this is the per-event hot path.
+        recent = self._recent
+        w = self._recent_counts
+        hosts, services, host_services = w.host, w.service, w.host_service
+        horizon = timestamp - self.time_window
+        limit = self.max_time_window_events
+        while recent and (recent[0][0] <= horizon or len(recent) >= limit):
+            _, old_host, old_service, old_serror, old_rerror = recent.popleft()
+            _remove(hosts, old_host)
+            _remove(services, old_service)
+            _remove(host_services, (old_host, old_service))
+            if old_serror:
+                _remove(w.host_serror, old_host)
+                _remove(w.service_serror, old_service)
+            elif old_rerror:
+                _remove(w.host_rerror, old_host)
+                _remove(w.service_rerror, old_service)
+        recent.append((timestamp, host, service, serror, rerror))
+        count = hosts[host] = hosts.get(host, 0) + 1
+        srv_count = services[service] = services.get(service, 0) + 1
+        same_srv = host_services[host_service] = host_services.get(host_service, 0) + 1
+        if serror:
+            _add(w.host_serror, host)
+            _add(w.service_serror, service)
+        elif rerror:
+            _add(w.host_rerror, host)
+            _add(w.service_rerror, service)
+
+        time_features = (
+            count, srv_count,
+            w.host_serror.get(host, 0) / count, w.service_serror.get(service, 0) / srv_count,
+            w.host_rerror.get(host, 0) / count, w.service_rerror.get(service, 0) / srv_count,
+            same_srv / count, 1.0 - same_srv / count, 1.0 - same_srv / srv_count,
+        )
+
+        # Connection window: overwrite the oldest slot of the ring
+        last = self._last
+        w = self._last_counts
+        hosts, services, host_services, host_ports = w.host, w.service, w.host_service, w.host_port
+        index = self._last_index
+        host_port = (host, src_port)
+        oldest = last[index]
+        if oldest is not None:
+            old_host, old_service, old_port, old_serror, old_rerror = oldest
+            _remove(hosts, old_host)
+            _remove(services, old_service)
+            _remove(host_services, (old_host, old_service))
+            _remove(host_ports, (old_host, old_port))
+            if old_serror:
+                _remove(w.host_serror, old_host)
+                _remove(w.service_serror, old_service)
+            elif old_rerror:
+                _remove(w.host_rerror, old_host)
+                _remove(w.service_rerror, old_service)
+        last[index] = (host, service, src_port, serror, rerror)
+        self._last_index = index + 1 if index + 1 < self.host_window else 0
+        host_count = hosts[host] = hosts.get(host, 0) + 1
+        host_srv_count = services[service] = services.get(service, 0) + 1
+        same_srv = host_services[host_service] = host_services.get(host_service, 0) + 1
+        same_port = host_ports[host_port] = host_ports.get(host_port, 0) + 1
+        if serror:
+            _add(w.host_serror, host)
+            _add(w.service_serror, service)
+        elif rerror:
+            _add(w.host_rerror, host)
+            _add(w.service_rerror, service)
+
+        host_features = (
+            host_count, host_srv_count,
+            same_srv / host_count, 1.0 - same_srv / host_count,
+            same_port / host_count, 1.0 - same_srv / host_srv_count,
+            w.host_serror.get(host, 0) / host_count, w.service_serror.get(service, 0) / host_srv_count,
+            w.host_rerror.get(host, 0) / host_count, w.service_rerror.get(service, 0) / host_srv_count,
+        )
+
+        land = 1 if host == get('src_ip') and dst_port == src_port else 0
+        values = ((protocol, service, flag, get('duration', 0), get('src_bytes', 0), get('dst_bytes', 0), land)
+                  + tuple(map(get, CONTENT_FEATURES, _ZEROS)) + time_features + host_features)
+        if self._order is not None:
+            values = self._order(values)
+        return values
+
+    def extract_many(self, events):
+        extract = self.extract
+        return [extract(event) for event in events]
+
+    def records(self, events):
+        """Feature dicts for the model's encoder, keeping ``src_ip`` for storage.
+
+        Every event is checked first, so a bad one rejects the batch without
+        having advanced the windows for the events before it.
+        """
+        for index, event in enumerate(events):
+            check_event(index, event)
+        names = self.feature_names
+        records = []
+        for event in events:
+            record = dict(zip(names, self.extract(event)))
+            record['src_ip'] = event.get('src_ip', 'Unknown')
+            records.append(record)
+        return records
+
+
+class FlowStreams:
+    """One extractor per user for the raw-event endpoint.
+
+    Each user's events form their own stream, so one client's traffic never
+    shows up in another's window counts. The shared lock only guards the
+    stream lookup; extraction holds the stream's own lock. At most ``FLOW_MAX_STREAMS`` streams
+    are kept; the least recently used is dropped beyond that.
+    """
+
+    def __init__(self):
+        self.time_window = 2.0
+        self.host_window = 100
+        self.max_streams = 1000
+        self._streams = OrderedDict()
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.time_window = app.config.get('FLOW_TIME_WINDOW', self.time_window)
+        self.host_window = app.config.get('FLOW_HOST_WINDOW', self.host_window)
+        self.max_streams = app.config.get('FLOW_MAX_STREAMS', self.max_streams)
+        app.extensions['flow_streams'] = self
+
+    def records(self, key, events, feature_names):
+        """Feature records for ``events``, continuing the windows of stream ``key``"""
+        with self._lock:
+            extractor = self._streams.get(key)
+            if extractor is None or extractor.feature_names != list(feature_names):
+                extractor = FlowFeatureExtractor(feature_names, self.time_window, self.host_window)
+                self._streams[key] = extractor
+            self._streams.move_to_end(key)
+            while len(self._streams) > self.max_streams:
+                self._streams.popitem(last=False)
+        with extractor.lock:
+            return extractor.records(events)
+
+    def reset(self, key=None):
+        with self._lock:
+            if key is None:
+                self._streams.clear()
+            else:
+                self._streams.pop(key, None)
+
+
+flow_streams = FlowStreams()
@@ -0,0 +1,77 @@
+import base64
+from datetime import datetime
+
+from sqlalchemy import and_, or_
+
+from app.models.detection import Detection
+
+
+def encode_cursor(detection):
+    raw = f'{detection.timestamp.isoformat()}|{detection.id}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        timestamp, detection_id = raw.rsplit('|', 1)
+        return datetime.fromisoformat(timestamp), int(detection_id)
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError('Invalid cursor')
+
+
+def parse_filters(args):
+    """Read prediction/protocol/since/until filters from request args"""
+    filters = {}
+    for key in ('prediction', 'protocol'):
+        if args.get(key):
+            filters[key] = args.get(key)
+    for key in ('since', 'until'):
+        if args.get(key):
+            try:
+                filters[key] = datetime.fromisoformat(args.get(key))
+            except ValueError:
+                raise ValueError(f'Invalid {key} timestamp')
+    return filters
+
+
+def page_detections(user_id, filters=None, cursor=None, limit=50):
+    """One page of a user's detections, newest first, with keyset pagination.
+
+    Pages are ordered by (timestamp, id) descending and continue from the last
+    row of the previous page, so every page is an index range scan on
+    (user_id, timestamp) regardless of how deep the user pages. Returns the rows
+    and the cursor for the next page (None on the last page).
+    """
+    filters = filters or {}
+    query = Detection.query.filter(Detection.user_id == user_id)
+    if 'prediction' in filters:
+        query = query.filter(Detection.prediction == filters['prediction'])
+    if 'protocol' in filters:
+        query = query.filter(Detection.protocol == filters['protocol'])
+    if 'since' in filters:
+        query = query.filter(Detection.timestamp >= filters['since'])
+    if 'until' in filters:
+        query = query.filter(Detection.timestamp < filters['until'])
+    if cursor:
+        timestamp, detection_id = decode_cursor(cursor)
+        query = query.filter(or_(
+            Detection.timestamp < timestamp,
+            and_(Detection.timestamp == timestamp, Detection.id < detection_id)))
+
+    rows = query.order_by(Detection.timestamp.desc(), Detection.id.desc()).limit(limit + 1).all()
+    next_cursor = encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+    return rows[:limit], next_cursor
+
+
+def detection_to_dict(detection):
+    return {
+        'id': detection.id,
+        'timestamp': detection.timestamp.isoformat(),
+        'prediction': detection.prediction,
+        'confidence': detection.confidence,
+        'ip_address': detection.ip_address,
+        'protocol': detection.protocol,
+        'src_bytes': detection.src_bytes,
+        'dst_bytes': detection.dst_bytes
+    }
@@ -0,0 +1,307 @@
+"""Aggregation of attack detections into incidents.
+
+Runs inside the detection writer's transaction. Attack rows are grouped by
+(user, source IP, prediction, protocol). A group extends the key's current
+incident when it starts within ``INCIDENT_WINDOW_SECONDS`` of that incident's
+last attack, and opens a new incident otherwise. A DoS burst of 50,000 rows
+from one address thus becomes one incident row that is updated once per writer
+flush.
+
+The aggregator remembers each key's open incident (id and last seen) in an
+OrderedDict kept in update order, so expiry pops from the front and touches
+only expired keys. At most ``INCIDENT_MAX_OPEN`` keys are kept. Counters are
+incremented in SQL, so several workers extending the same incident stay
+correct. A key that is not in memory, after a restart, eviction or another
+worker's insert, is looked up by index before a new incident is opened.
+"""
+import base64
+import threading
+from collections import OrderedDict
+from datetime import timedelta
+
+from sqlalchemy import and_, bindparam, case, insert, or_, select
+
+from app import db
+from app.models.incident import Incident
+from app.services.history import decode_cursor
+from app.services.metrics import INCIDENTS_OPENED, INCIDENT_ROWS
+
+# Keys looked up per query for incidents opened elsewhere
+LOOKUP_CHUNK = 500
+
+
+class _Segment:
+    """Attacks of one key that belong to the same incident"""
+
+    __slots__ = ('first', 'last', 'count', 'src_bytes', 'dst_bytes', 'max_confidence')
+
+    def __init__(self, row):
+        self.first = self.last = row['timestamp']
+        self.count = 0
+        self.src_bytes = self.dst_bytes = 0
+        self.max_confidence = 0.0
+        self.add(row)
+
+    def add(self, row):
+        self.last = max(self.last, row['timestamp'])
+        self.count += 1
+        self.src_bytes += row.get('src_bytes') or 0
+        self.dst_bytes += row.get('dst_bytes') or 0
+        self.max_confidence = max(self.max_confidence, row.get('confidence') or 0.0)
+
+
+class _Recorded:
+    """What one batch did to the incident table, applied to memory after its commit"""
+
+    __slots__ = ('updates', 'opened', 'extended', 'attacks', 'now')
+
+    def __init__(self, updates, opened, extended, attacks, now):
+        self.updates = updates
+        self.opened = opened
+        self.extended = extended
+        self.attacks = attacks
+        self.now = now
+
+
+class IncidentAggregator:
+    """Folds attack rows into Incident rows with bounded per-process state"""
+
+    def __init__(self):
+        self.enabled = True
+        self.store_raw_attacks = True
+        self.window = timedelta(seconds=300)
+        self.max_open = 10000
+        self.opened = 0
+        self.extended = 0
+        self.evicted = 0
+        self._open = OrderedDict()
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.enabled = app.config.get('INCIDENTS_ENABLED', self.enabled)
+        self.store_raw_attacks = app.config.get('INCIDENT_STORE_RAW_ATTACKS', self.store_raw_attacks)
+        self.window = timedelta(seconds=app.config.get('INCIDENT_WINDOW_SECONDS', 300))
+        self.max_open = app.config.get('INCIDENT_MAX_OPEN', self.max_open)
+        app.extensions['incident_aggregator'] = self
+
+    def rows_to_store(self, rows):
+        """The rows that still go into the Detection table"""
+        if not self.enabled or self.store_raw_attacks:
+            return rows
+        return [row for row in rows if row['prediction'] == 'normal']
+
+    def record(self, rows):
+        """Add the attack rows of one writer batch to their incidents.
+
+        The caller commits, then passes the returned value to committed(). A
+        rolled back batch is simply not passed on, so a retried flush neither
+        counts twice nor leaves keys pointing at incidents that were never stored.
+        """
+        if not self.enabled:
+            return None
+        attacks = sorted((row for row in rows if row['prediction'] != 'normal'), key=lambda row: row['timestamp'])
+        if not attacks:
+            return None
+
+        segments = []
+        current = {}
+        for row in attacks:
+            key = (row['user_id'], row['ip_address'], row['prediction'], row['protocol'])
+            segment = current.get(key)
+            if segment is not None and row['timestamp'] - segment.last <= self.window:
+                segment.add(row)
+            else:
+                segment = current[key] = _Segment(row)
+                segments.append((key, segment))
+
+        with self._lock:
+            updates, opened, extended = self._apply(segments)
+        return _Recorded(updates, opened, extended, len(attacks), attacks[-1]['timestamp'])
+
+    def committed(self, recorded):
+        """Remember the incidents of a batch returned by record() once it is committed"""
+        if recorded is None:
+            return
+        with self._lock:
+            for incident_id, key, last_seen in recorded.updates:
+                entry = self._open.get(key)
+                if entry is not None and entry[0] == incident_id:
+                    last_seen = max(entry[1], last_seen)
+                self._open[key] = (incident_id, last_seen)
+                self._open.move_to_end(key)
+            self.opened += recorded.opened
+            self.extended += recorded.extended
+            self._expire(recorded.now)
+        INCIDENTS_OPENED.inc(recorded.opened)
+        INCIDENT_ROWS.inc(recorded.attacks)
+
+    def open_incidents(self):
+        return len(self._open)
+
+    def forget(self, user_id=None):
+        with self._lock:
+            if user_id is None:
+                self._open.clear()
+            else:
+                for key in [key for key in self._open if key[0] == user_id]:
+                    del self._open[key]
+
+    def stats(self):
+        return {
+            'enabled': self.enabled,
+            'open': len(self._open),
+            'opened': self.opened,
+            'extended': self.extended,
+            'evicted': self.evicted,
+        }
+
+    def _apply(self, segments):
+        """Extend or open one incident per segment with a few bulk statements.
+
+        Returns the (incident id, key, last seen) of every segment and the
+        numbers of incidents opened and extended.
+        """
+        extend, create, unknown, seen = [], [], [], set()
+        for key, segment in segments:
+            if key in seen:
+                # Starts more than a window after the key's previous segment
+                create.append((key, segment))
+                continue
+            seen.add(key)
+            entry = self._open.get(key)
+            if entry is not None and segment.first - entry[1] <= self.window:
+                extend.append((entry[0], key, segment))
+            else:
+                unknown.append(key)
+                create.append((key, segment))
+
+        # Another worker, or this one before a restart or eviction, may have an
+        # incident for the key that is still open
+        if unknown:
+            found = self._find(unknown, min(segment.first for _, segment in create) - self.window)
+            for i, (key, segment) in enumerate(create):
+                incident = found.pop(key, None)
+                if incident is not None and segment.first - incident[1] <= self.window:
+                    extend.append((incident[0], key, segment))
+                    create[i] = None
+            create = [item for item in create if item is not None]
+
+        missing = self._extend(extend)
+        if missing:
+            create.extend((key, segment) for incident_id, key, segment in extend if incident_id in missing)
+        ids = self._insert(create)
+
+        updates = [(incident_id, key, segment.last) for incident_id, key, segment in extend
+                   if incident_id not in missing]
+        updates.extend((incident_id, key, segment.last) for incident_id, (key, segment) in zip(ids, create))
+        return updates, len(ids), len(extend) - len(missing)
+
+    def _find(self, keys, since):
+        """The latest incident (id, last_seen) of each key active since ``since``"""
+        wanted = set(keys)
+        found = {}
+        for start in range(0, len(keys), LOOKUP_CHUNK):
+            chunk = keys[start:start + LOOKUP_CHUNK]
+            ip_addresses = {key[1] for key in chunk}
+            # IN never matches NULL, attacks without a source address need IS NULL
+            ip_match = Incident.ip_address.in_(ip_addresses - {None})
+            if None in ip_addresses:
+                ip_match = or_(ip_match, Incident.ip_address.is_(None))
+            rows = db.session.execute(
+                select(Incident.id, Incident.user_id, Incident.ip_address, Incident.prediction,
+                       Incident.protocol, Incident.last_seen)
+                .where(Incident.user_id.in_({key[0] for key in chunk}), ip_match,
+                       Incident.last_seen >= since)
+                .order_by(Incident.last_seen)
+            )
+            for incident_id, user_id, ip_address, prediction, protocol, last_seen in rows:
+                key = (user_id, ip_address, prediction, protocol)
+                if key in wanted:
+                    found[key] = (incident_id, last_seen)
+        return found
+
+    def _extend(self, extend):
+        """Add segments to existing incidents; returns the ids that no longer exist"""
+        if not extend:
+            return set()
+        table = Incident.__table__
+        statement = table.update().where(table.c.id == bindparam('incident_id')).values(
+            count=table.c.count + bindparam('add_count'),
+            src_bytes=table.c.src_bytes + bindparam('add_src_bytes'),
+            dst_bytes=table.c.dst_bytes + bindparam('add_dst_bytes'),
+            first_seen=case((table.c.first_seen > bindparam('seg_first'), bindparam('seg_first')),
+                            else_=table.c.first_seen),
+            last_seen=case((table.c.last_seen < bindparam('seg_last'), bindparam('seg_last')),
+                           else_=table.c.last_seen),
+            max_confidence=case((table.c.max_confidence < bindparam('seg_confidence'), bindparam('seg_confidence')),
+                                else_=table.c.max_confidence))
+        result = db.session.execute(statement, [
+            {'incident_id': incident_id, 'add_count': segment.count, 'add_src_bytes': segment.src_bytes,
+             'add_dst_bytes': segment.dst_bytes, 'seg_first': segment.first, 'seg_last': segment.last,
+             'seg_confidence': segment.max_confidence}
+            for incident_id, _, segment in extend])
+        if result.rowcount == len(extend):
+            return set()
+        # Some incidents were deleted (user purge) or their insert rolled back
+        ids = {incident_id for incident_id, _, _ in extend}
+        return ids - set(db.session.execute(select(Incident.id).where(Incident.id.in_(ids))).scalars())
+
+    def _insert(self, create):
+        if not create:
+            return []
+        return list(db.session.execute(
+            insert(Incident).returning(Incident.id, sort_by_parameter_order=True),
+            [{'user_id': key[0], 'ip_address': key[1], 'prediction': key[2], 'protocol': key[3],
+              'first_seen': segment.first, 'last_seen': segment.last, 'count': segment.count,
+              'src_bytes': segment.src_bytes, 'dst_bytes': segment.dst_bytes,
+              'max_confidence': segment.max_confidence}
+             for key, segment in create]).scalars())
+
+    def _expire(self, now):
+        horizon = now - self.window
+        while self._open:
+            key, (_, last_seen) = next(iter(self._open.items()))
+            if last_seen >= horizon and len(self._open) <= self.max_open:
+                break
+            del self._open[key]
+            if last_seen >= horizon:
+                self.evicted += 1
+
+
+incident_aggregator = IncidentAggregator()
+
+
+def encode_incident_cursor(incident):
+    raw = f'{incident.last_seen.isoformat()}|{incident.id}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def page_incidents(user_id=None, filters=None, cursor=None, limit=50):
+    """One page of incidents, most recently active first, with keyset pagination.
+
+    Same contract as ``page_detections`` but ordered by (last_seen, id); takes
+    the ``ip`` filter as well. ``user_id=None`` pages across all users.
+    """
+    filters = filters or {}
+    query = Incident.query
+    if user_id is not None:
+        query = query.filter(Incident.user_id == user_id)
+    if 'prediction' in filters:
+        query = query.filter(Incident.prediction == filters['prediction'])
+    if 'protocol' in filters:
+        query = query.filter(Incident.protocol == filters['protocol'])
+    if 'ip' in filters:
+        query = query.filter(Incident.ip_address == filters['ip'])
+    if 'since' in filters:
+        query = query.filter(Incident.last_seen >= filters['since'])
+    if 'until' in filters:
+        query = query.filter(Incident.first_seen < filters['until'])
+    if cursor:
+        last_seen, incident_id = decode_cursor(cursor)
+        query = query.filter(or_(
+            Incident.last_seen < last_seen,
+            and_(Incident.last_seen == last_seen, Incident.id < incident_id)))
+
+    rows = query.order_by(Incident.last_seen.desc(), Incident.id.desc()).limit(limit + 1).all()
+    next_cursor = encode_incident_cursor(rows[limit - 1]) if len(rows) > limit else None
+    return rows[:limit], next_cursor
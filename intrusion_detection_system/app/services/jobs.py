@@ -0,0 +1,67 @@
+"""Background jobs for admin tasks that are too slow for a request.
+
+A job runs on a daemon thread of the process that started it and records its
+progress in the ``background_job`` table, so any server worker can report on
+it. A job interrupted by a restart stays ``running``; the tasks that use this
+are written so they can simply be started again.
+"""
+import threading
+import uuid
+from datetime import datetime
+
+from flask import current_app
+
+from app import db
+from app.models.background_job import BackgroundJob
+
+
+class JobProgress:
+    """Handed to the job function to report how far it got"""
+
+    def __init__(self, job_id):
+        self.job_id = job_id
+
+    def __call__(self, done, total=None):
+        values = {'done': done}
+        if total is not None:
+            values['total'] = total
+        db.session.query(BackgroundJob).filter_by(id=self.job_id).update(values)
+        db.session.commit()
+
+
+def start_job(kind, description, target, *args, created_by=None, **kwargs):
+    """Run ``target(*args, progress=..., **kwargs)`` in the background"""
+    job = BackgroundJob(id=uuid.uuid4().hex, kind=kind, description=description, created_by=created_by)
+    db.session.add(job)
+    db.session.commit()
+
+    app = current_app._get_current_object()
+    thread = threading.Thread(target=_run, args=(app, job.id, target, args, kwargs),
+                              name=f'job-{kind}-{job.id[:8]}', daemon=True)
+    thread.start()
+    return job
+
+
+def _run(app, job_id, target, args, kwargs):
+    with app.app_context():
+        _finish(job_id, status='running', finished=False)
+        try:
+            target(*args, progress=JobProgress(job_id), **kwargs)
+        except Exception as e:
+            db.session.rollback()
+            app.logger.exception('Background job %s failed', job_id)
+            _finish(job_id, status='failed', error=str(e))
+        else:
+            _finish(job_id, status='finished')
+
+
+def _finish(job_id, status, error=None, finished=True):
+    values = {'status': status, 'error': error}
+    if finished:
+        values['finished_at'] = datetime.utcnow()
+    db.session.query(BackgroundJob).filter_by(id=job_id).update(values)
+    db.session.commit()
+
+
+def get_job(job_id):
+    return db.session.get(BackgroundJob, job_id)
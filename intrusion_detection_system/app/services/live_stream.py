@@ -0,0 +1,168 @@
+import threading
+from collections import deque
+from datetime import datetime
+
+from app.services.detection_writer import make_detection_row
+from app.services.scoring import score_matrix
+from app.services.traffic_simulator import simulate_samples
+
+NAMESPACE = '/live'
+
+
+class _Subscriber:
+    def __init__(self, user_id, buffer_size):
+        self.user_id = user_id
+        self.pending = deque(maxlen=buffer_size)
+        self.in_flight = False
+        self.dropped = 0
+
+
+class LiveStream:
+    """Scores simulated traffic once per tick and pushes it to every subscriber.
+
+    Each tick generates ``LIVE_STREAM_BATCH`` samples, scores them with one
+    predict_proba call and sends the batch to all subscribed clients. A client
+    has at most one unacknowledged message in flight. Ticks produced meanwhile
+    wait in a per-client buffer of ``LIVE_STREAM_CLIENT_BUFFER`` ticks and the
+    oldest are dropped when it overflows, so a slow browser never holds up the
+    server or the other clients.
+
+    With ``LIVE_STREAM_PERSIST`` on, each tick is also stored once for every
+    subscribed user, as the polling page used to store what each user saw.
+    """
+
+    def __init__(self):
+        self.socketio = None
+        self.app = None
+        self.interval = 3.0
+        self.batch_size = 5
+        self.buffer_size = 5
+        self.persist = True
+        self.profile = None
+        self.tick = 0
+        self._subscribers = {}
+        self._running = False
+        self._lock = threading.Lock()
+
+    def init_app(self, app, socketio):
+        self.app = app
+        self.socketio = socketio
+        self.interval = app.config.get('LIVE_STREAM_INTERVAL', self.interval)
+        self.batch_size = app.config.get('LIVE_STREAM_BATCH', self.batch_size)
+        self.buffer_size = app.config.get('LIVE_STREAM_CLIENT_BUFFER', self.buffer_size)
+        self.persist = app.config.get('LIVE_STREAM_PERSIST', self.persist)
+        self.profile = app.config.get('LIVE_STREAM_PROFILE')
+        app.extensions['live_stream'] = self
+
+    @property
+    def subscriber_count(self):
+        return len(self._subscribers)
+
+    def subscribe(self, sid, user_id):
+        with self._lock:
+            self._subscribers.setdefault(sid, _Subscriber(user_id, self.buffer_size))
+            start = not self._running
+            self._running = True
+        if start:
+            self.socketio.start_background_task(self._run)
+
+    def unsubscribe(self, sid):
+        with self._lock:
+            self._subscribers.pop(sid, None)
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if not self._subscribers:
+                    self._running = False
+                    return
+            try:
+                self.publish(self.score_tick())
+            except Exception:
+                self.app.logger.exception('Live stream tick failed')
+            self.socketio.sleep(self.interval)
+
+    def score_tick(self):
+        """Generate and score one tick of traffic"""
+        from app.services.model_registry import model_registry
+
+        samples = simulate_samples(self.batch_size, profile=self.profile)
+        loaded_model = model_registry.get()
+        features = loaded_model.encoder.encode(samples)
+        predictions, confidences, _ = score_matrix(loaded_model, features)
+        timestamp = datetime.utcnow()
+        self.tick += 1
+
+        if self.persist:
+            self._persist(samples, predictions, confidences, timestamp)
+
+        return {
+            'tick': self.tick,
+            'timestamp': timestamp.isoformat(),
+            'model_version': loaded_model.version,
+            'detections': [{
+                'src_ip': sample.get('src_ip', 'Unknown'),
+                'protocol_type': sample.get('protocol_type'),
+                'src_bytes': sample.get('src_bytes'),
+                'dst_bytes': sample.get('dst_bytes'),
+                'prediction': str(prediction),
+                'confidence': float(confidence),
+                'is_attack': prediction != 'normal'
+            } for sample, prediction, confidence in zip(samples, predictions, confidences)]
+        }
+
+    def publish(self, event):
+        with self._lock:
+            ready = []
+            for sid, subscriber in self._subscribers.items():
+                if len(subscriber.pending) == subscriber.pending.maxlen:
+                    subscriber.dropped += 1
+                subscriber.pending.append(event)
+                if not subscriber.in_flight:
+                    ready.append(sid)
+        for sid in ready:
+            self._send(sid)
+
+    def _send(self, sid):
+        with self._lock:
+            subscriber = self._subscribers.get(sid)
+            if subscriber is None or subscriber.in_flight or not subscriber.pending:
+                return
+            events = list(subscriber.pending)
+            subscriber.pending.clear()
+            subscriber.in_flight = True
+            dropped, subscriber.dropped = subscriber.dropped, 0
+
+        # Everything buffered since the last ack goes out as one message
+        message = {
+            'tick': events[-1]['tick'],
+            'timestamp': events[-1]['timestamp'],
+            'detections': [detection for event in events for detection in event['detections']],
+            'dropped_ticks': dropped
+        }
+        self.socketio.emit('detections', message, to=sid, namespace=NAMESPACE,
+                           callback=lambda *args: self._acknowledged(sid))
+
+    def _acknowledged(self, sid):
+        with self._lock:
+            subscriber = self._subscribers.get(sid)
+            if subscriber is None:
+                return
+            subscriber.in_flight = False
+        self._send(sid)
+
+    def _persist(self, samples, predictions, confidences, timestamp):
+        from app.services.detection_writer import detection_writer
+
+        with self._lock:
+            user_ids = sorted({subscriber.user_id for subscriber in self._subscribers.values()})
+        if not user_ids:
+            return
+        with self.app.app_context():
+            detection_writer.submit([make_detection_row(user_id, sample, prediction, confidence, timestamp)
+                                     for user_id in user_ids
+                                     for sample, prediction, confidence in zip(samples, predictions, confidences)],
+                                    wait=True)
+
+
+live_stream = LiveStream()
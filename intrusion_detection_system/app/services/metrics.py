@@ -0,0 +1,184 @@
+"""In-process metrics rendered in the Prometheus text exposition format.
+
+Counters and histograms are plain thread-safe Python objects so they can be
+updated from request threads and the background writer alike. Each process
+exposes its own values on ``/metrics``.
+"""
+import threading
+import time
+from contextlib import contextmanager
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_labels(labelnames, values, extra=None):
+    pairs = list(zip(labelnames, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        # Unlabelled counters are reported as 0 before their first increment
+        self._values = {} if self.labelnames else {(): 0}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels.get(name, '')) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(tuple(str(labels.get(name, '')) for name in self.labelnames), 0)
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            yield self.name, _format_labels(self.labelnames, key), value
+
+
+class Histogram:
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(name, '')) for name in self.labelnames)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * len(self.buckets), 0.0))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            self._values[key] = (counts, total + value)
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self):
+        with self._lock:
+            items = [(key, list(counts), total) for key, (counts, total) in self._values.items()]
+        for key, counts, total in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                yield (f'{self.name}_bucket',
+                       _format_labels(self.labelnames, key, ('le', _format_value(bound))), cumulative)
+            yield f'{self.name}_sum', _format_labels(self.labelnames, key), total
+            yield f'{self.name}_count', _format_labels(self.labelnames, key), cumulative
+
+
+class CallbackMetric:
+    """Gauge or counter whose value is read from ``callback`` at scrape time"""
+
+    def __init__(self, name, documentation, callback, kind='gauge'):
+        self.name = name
+        self.documentation = documentation
+        self.callback = callback
+        self.kind = kind
+
+    def samples(self):
+        yield self.name, '', self.callback()
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = {}
+
+    def register(self, metric):
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def callback(self, name, documentation, callback, kind='gauge'):
+        return self.register(CallbackMetric(name, documentation, callback, kind))
+
+    def render(self):
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            try:
+                samples = list(metric.samples())
+            except Exception:
+                continue
+            for name, labels, value in samples:
+                lines.append(f'{name}{labels} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+STAGE_SECONDS = registry.histogram(
+    'ids_predict_stage_seconds', 'Time spent per stage of a prediction request', ('endpoint', 'stage'))
+PREDICTIONS = registry.counter('ids_predictions_total', 'Predictions made, by class', ('prediction',))
+UNKNOWN_CATEGORIES = registry.counter(
+    'ids_unknown_category_total', 'Categorical values not seen in training, encoded as 0', ('feature',))
+MODEL_RELOADS = registry.counter('ids_model_reloads_total', 'Model files loaded from disk')
+MODEL_LOAD_ERRORS = registry.counter('ids_model_load_errors_total', 'Failed model loads')
+DB_ERRORS = registry.counter('ids_db_errors_total', 'Failed database writes', ('source',))
+REQUEST_ERRORS = registry.counter('ids_request_errors_total', 'Detection API requests that failed', ('endpoint', 'status'))
+FLUSH_SECONDS = registry.histogram('ids_detection_flush_seconds', 'Duration of bulk detection inserts')
+ROWS_WRITTEN = registry.counter('ids_detection_rows_written_total', 'Detection rows inserted')
+INCIDENTS_OPENED = registry.counter('ids_incidents_opened_total', 'Incidents opened by the aggregator')
+INCIDENT_ROWS = registry.counter('ids_incident_attacks_total', 'Attack detections folded into incidents')
+MICRO_BATCH_SIZE = registry.histogram(
+    'ids_micro_batch_size', 'Rows scored per coalesced predict call', buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256))
+
+
+class StageTimer:
+    """Records the duration of each named stage of one request"""
+
+    def __init__(self, endpoint):
+        self.endpoint = endpoint
+        self.durations = {}
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.durations[name] = elapsed
+            STAGE_SECONDS.observe(elapsed, endpoint=self.endpoint, stage=name)
+
+
+def count_predictions(predictions):
+    labels = {}
+    for prediction in predictions:
+        labels[prediction] = labels.get(prediction, 0) + 1
+    for prediction, count in labels.items():
+        PREDICTIONS.inc(count, prediction=prediction)
@@ -0,0 +1,150 @@
+"""Coalescing of concurrent single-record predictions.
+
+Every ``/api/predict`` call scores one row, and most of the time of a
+``predict_proba`` call on one row is fixed per-call overhead (input
+validation and dispatching each of the 100 trees). With the batcher on,
+request threads hand their encoded row to a worker thread and wait. The worker
+takes every row queued while it was busy, plus whatever arrives within
+``MICRO_BATCH_MAX_WAIT_MS``, up to ``MICRO_BATCH_MAX_SIZE`` rows. It scores
+them with one call and hands each request its own row of the result.
+"""
+import atexit
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+from app.services.metrics import MICRO_BATCH_SIZE
+from app.services.scoring import score_matrix
+
+
+class MicroBatcher:
+    """Scores concurrent single-row requests together on a worker thread"""
+
+    def __init__(self):
+        self.enabled = False
+        self.max_wait = 0.0
+        self.max_size = 64
+        self.timeout = 30.0
+        self.batches = 0
+        self.rows = 0
+        self._queue = queue.Queue()
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.configure(enabled=app.config.get('MICRO_BATCH_ENABLED', False),
+                       max_wait_ms=app.config.get('MICRO_BATCH_MAX_WAIT_MS', 0),
+                       max_size=app.config.get('MICRO_BATCH_MAX_SIZE', self.max_size))
+        self.timeout = app.config.get('MICRO_BATCH_TIMEOUT', self.timeout)
+        app.extensions['micro_batcher'] = self
+        atexit.register(self.stop)
+
+    def configure(self, enabled=None, max_wait_ms=None, max_size=None):
+        if enabled is not None:
+            self.enabled = enabled
+        if max_wait_ms is not None:
+            self.max_wait = max_wait_ms / 1000.0
+        if max_size is not None:
+            self.max_size = max(int(max_size), 1)
+
+    def score(self, loaded_model, features):
+        """Same result as ``score_matrix`` for a small batch, usually a single row"""
+        if not self.enabled:
+            return score_matrix(loaded_model, features)
+
+        self._ensure_worker()
+        future = Future()
+        self._queue.put((loaded_model, features, future))
+        return future.result(timeout=self.timeout)
+
+    def stats(self):
+        return {
+            'enabled': self.enabled,
+            'batches': self.batches,
+            'rows': self.rows,
+            'mean_batch_size': self.rows / self.batches if self.batches else 0.0,
+            'pending': self._queue.qsize(),
+        }
+
+    def stop(self):
+        thread = self._thread
+        if thread is None or not thread.is_alive() or self._pid != os.getpid():
+            return
+        self._queue.put(None)
+        thread.join()
+        self._thread = None
+
+    def _ensure_worker(self):
+        # Start lazily so forked server workers each get their own thread
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='micro-batcher', daemon=True)
+            self._thread.start()
+
+    def _collect(self, first):
+        """The first item plus everything else arriving before the deadline"""
+        batch = [first]
+        size = len(first[1])
+        deadline = time.monotonic() + self.max_wait
+        while size < self.max_size:
+            try:
+                # Rows queued while the previous batch was scored are taken without waiting
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+            if item is None:
+                self._queue.put(None)
+                break
+            batch.append(item)
+            size += len(item[1])
+        return batch
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            batch = self._collect(first)
+            # A model reload can put rows for two versions in one batch
+            by_model = {}
+            for item in batch:
+                by_model.setdefault(id(item[0]), []).append(item)
+            for items in by_model.values():
+                self._score(items)
+
+    def _score(self, items):
+        loaded_model = items[0][0]
+        try:
+            features = np.vstack([features for _, features, _ in items])
+            predictions, confidences, probabilities = score_matrix(loaded_model, features)
+        except Exception as e:
+            for _, _, future in items:
+                future.set_exception(e)
+            return
+
+        self.batches += 1
+        self.rows += len(features)
+        MICRO_BATCH_SIZE.observe(len(features))
+        start = 0
+        for _, rows, future in items:
+            end = start + len(rows)
+            future.set_result((predictions[start:end], confidences[start:end], probabilities[start:end]))
+            start = end
+
+
+micro_batcher = MicroBatcher()
@@ -0,0 +1,144 @@
+"""Memory-mappable model artifact.
+
+The pickled RandomForest is converted once into a directory of raw ``.npy``
+arrays (the flattened trees, see app/services/flat_forest.py) plus a
+``manifest.json`` holding the feature names, attack classes and label encoder
+categories. Workers open the arrays with ``mmap_mode='r'``, so the tree data
+lives in the OS page cache once and is shared by every process instead of
+being unpickled into each one. Loading needs neither joblib nor scikit-learn.
+"""
+import hashlib
+import json
+import os
+from datetime import datetime
+
+import numpy as np
+
+from app.services.flat_forest import FlatForest
+
+ARTIFACT_FORMAT = 'ids-flat-forest'
+FORMAT_VERSION = 1
+MANIFEST = 'manifest.json'
+ARRAYS = ('feature', 'threshold', 'children', 'value', 'roots')
+
+
+def is_artifact(path):
+    return os.path.isfile(os.path.join(path, MANIFEST))
+
+
+def manifest_path(path):
+    return os.path.join(path, MANIFEST)
+
+
+def default_artifact_path(model_path):
+    return os.path.splitext(model_path)[0] + '.artifact'
+
+
+def _file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _write_array(directory, name, array):
+    """Save ``array`` under a content-addressed name; returns (filename, sha256)"""
+    tmp_path = os.path.join(directory, f'.{name}.tmp-{os.getpid()}.npy')
+    with open(tmp_path, 'wb') as f:
+        np.save(f, array)
+        f.flush()
+        os.fsync(f.fileno())
+    sha256 = _file_sha256(tmp_path)
+    filename = f'{name}-{sha256[:16]}.npy'
+    path = os.path.join(directory, filename)
+    if os.path.exists(path):
+        # Same content is already there and may be mapped by running workers
+        os.remove(tmp_path)
+    else:
+        os.replace(tmp_path, path)
+    return filename, sha256
+
+
+def _referenced_files(directory):
+    try:
+        with open(manifest_path(directory)) as f:
+            return {spec['file'] for spec in json.load(f)['arrays'].values()}
+    except (OSError, ValueError, KeyError):
+        return set()
+
+
+def export_artifact(model_data, output, source_sha256=None):
+    """Write ``model_data`` (the unpickled dict) as an artifact directory.
+
+    Arrays are written under content-addressed names next to the ones in use,
+    then the manifest that points at them is replaced with one atomic rename.
+    ``output`` therefore always holds a complete artifact, the old or the new
+    one. Arrays of the previous manifest are kept, so a process that read it a
+    moment earlier can still open them; older ones are removed.
+    """
+    forest = FlatForest.from_estimator(model_data['model'])
+    output = os.path.abspath(output)
+    os.makedirs(output, exist_ok=True)
+    previous_files = _referenced_files(output)
+
+    arrays = {}
+    for name in ARRAYS:
+        array = np.ascontiguousarray(getattr(forest, name))
+        filename, sha256 = _write_array(output, name, array)
+        arrays[name] = {'file': filename, 'dtype': str(array.dtype), 'shape': list(array.shape),
+                        'sha256': sha256}
+
+    manifest = {
+        'format': ARTIFACT_FORMAT,
+        'format_version': FORMAT_VERSION,
+        'created_at': datetime.utcnow().isoformat(),
+        'source_sha256': source_sha256,
+        'feature_names': list(model_data['feature_names']),
+        'attack_classes': [str(c) for c in model_data['attack_classes']],
+        'classes': [str(c) for c in forest.classes_],
+        'categories': {feature: [str(c) for c in encoder.classes_]
+                       for feature, encoder in model_data['label_encoders'].items()},
+        'max_depth': forest.max_depth,
+        'n_trees': forest.n_trees,
+        'arrays': arrays,
+    }
+    tmp_manifest = f'{manifest_path(output)}.tmp-{os.getpid()}'
+    with open(tmp_manifest, 'w') as f:
+        json.dump(manifest, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_manifest, manifest_path(output))
+
+    keep = previous_files | {spec['file'] for spec in arrays.values()} | {MANIFEST}
+    for filename in os.listdir(output):
+        if filename not in keep and filename.endswith('.npy') and not filename.startswith('.'):
+            os.remove(os.path.join(output, filename))
+    return manifest
+
+
+def load_artifact(path, mmap=True):
+    """Load an artifact into the same dict shape as the pickle, with a FlatForest as model"""
+    with open(manifest_path(path)) as f:
+        manifest = json.load(f)
+    if manifest.get('format') != ARTIFACT_FORMAT or manifest.get('format_version') != FORMAT_VERSION:
+        raise ValueError(f"Unsupported model artifact format in {path}")
+
+    arrays = {}
+    for name in ARRAYS:
+        spec = manifest['arrays'][name]
+        array = np.load(os.path.join(path, spec['file']), mmap_mode='r' if mmap else None, allow_pickle=False)
+        if list(array.shape) != spec['shape'] or str(array.dtype) != spec['dtype']:
+            raise ValueError(f'{spec["file"]} does not match the manifest')
+        # A plain ndarray view over the mapping, without np.memmap's per-slice overhead
+        arrays[name] = np.asarray(array)
+
+    forest = FlatForest(classes=np.asarray(manifest['classes'], dtype=object),
+                        max_depth=manifest['max_depth'], **arrays)
+    return {
+        'model': forest,
+        'feature_names': manifest['feature_names'],
+        'attack_classes': manifest['attack_classes'],
+        'categories': manifest['categories'],
+        'manifest': manifest,
+    }
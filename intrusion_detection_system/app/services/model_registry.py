@@ -0,0 +1,212 @@
+import hashlib
+import os
+import threading
+import time
+from datetime import datetime
+
+from app.services.feature_encoder import FeatureEncoder
+from app.services.flat_forest import FlatForest
+from app.services.model_artifact import is_artifact, load_artifact, manifest_path
+from app.services.metrics import MODEL_RELOADS
+
+INFERENCE_BACKENDS = ('sklearn', 'flat', 'auto')
+
+DEFAULT_MODEL_PATH = os.path.join(os.path.dirname(__file__), '..', 'static', 'models', 'intrusion_detection_model.pkl')
+
+
+class LoadedModel:
+    """A loaded model artifact together with the file metadata it came from"""
+
+    def __init__(self, data, path, sha256, mtime, size, n_jobs=1, backend='sklearn', flat_max_batch=1000):
+        self.data = data
+        self.path = path
+        self.sha256 = sha256
+        self.mtime = mtime
+        self.size = size
+        self.loaded_at = datetime.utcnow()
+        self.encoder = FeatureEncoder.from_model_data(data)
+        # The pickle asks for n_jobs=-1, which spawns a thread pool per call
+        self.model.n_jobs = n_jobs
+        self.options = {'n_jobs': n_jobs, 'backend': backend, 'flat_max_batch': flat_max_batch}
+
+        if backend not in INFERENCE_BACKENDS:
+            raise ValueError(f'Unknown inference backend {backend!r}')
+        self.flat_forest = None
+        self.warm = False
+        if isinstance(self.model, FlatForest):
+            # Memory-mapped artifacts only carry the flattened trees
+            self.backend = 'flat'
+            self.flat_forest = self.model
+            self.flat_max_batch = float('inf')
+            return
+        self.backend = backend
+        # 'auto' uses the flat forest for small batches, where sklearn's
+        # per-call overhead dominates, and sklearn for large ones
+        self.flat_max_batch = float('inf') if backend == 'flat' else flat_max_batch
+        if backend in ('flat', 'auto'):
+            self.flat_forest = FlatForest.from_estimator(self.model)
+
+    @property
+    def model(self):
+        return self.data['model']
+
+    @property
+    def feature_names(self):
+        return self.data['feature_names']
+
+    @property
+    def attack_classes(self):
+        return self.data['attack_classes']
+
+    def predict_proba(self, features):
+        if self.flat_forest is not None and len(features) <= self.flat_max_batch:
+            probabilities = self.flat_forest.predict_proba(features)
+        else:
+            probabilities = self.model.predict_proba(features)
+        self.warm = True
+        return probabilities
+
+    def warm_up(self):
+        """Score one all-zero row so the first real request skips lazy setup"""
+        features = self.encoder.allocate(1)
+        features.fill(0.0)
+        self.predict_proba(features)
+
+    @property
+    def version(self):
+        return self.sha256[:12]
+
+    def info(self):
+        return {
+            'version': self.version,
+            'sha256': self.sha256,
+            'path': os.path.abspath(self.path),
+            'mtime': datetime.utcfromtimestamp(self.mtime).isoformat(),
+            'size': self.size,
+            'loaded_at': self.loaded_at.isoformat(),
+            'n_features': len(self.feature_names),
+            'n_jobs': self.model.n_jobs,
+            'backend': self.backend,
+            'format': 'artifact' if 'manifest' in self.data else 'pickle',
+            'warm': self.warm,
+            'attack_classes': list(self.attack_classes)
+        }
+
+
+class ModelRegistry:
+    """Process-wide holder for the trained model.
+
+    The pickle is loaded once and shared by every request thread. The file's
+    mtime and size are re-checked at most every ``MODEL_RELOAD_CHECK_INTERVAL``
+    seconds and the model is reloaded when either changes.
+    """
+
+    def __init__(self, path=None, check_interval=2.0, n_jobs=1, backend='sklearn', flat_max_batch=1000, mmap=True):
+        self.path = path
+        self.mmap = mmap
+        self.check_interval = check_interval
+        self.n_jobs = n_jobs
+        self.backend = backend
+        self.flat_max_batch = flat_max_batch
+        self.reload_count = 0
+        self._current = None
+        self._last_check = 0.0
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.path = app.config.get('MODEL_PATH') or DEFAULT_MODEL_PATH
+        self.check_interval = app.config.get('MODEL_RELOAD_CHECK_INTERVAL', self.check_interval)
+        self.n_jobs = app.config.get('MODEL_N_JOBS', self.n_jobs)
+        self.backend = app.config.get('INFERENCE_BACKEND', self.backend)
+        self.flat_max_batch = app.config.get('FLAT_FOREST_MAX_BATCH', self.flat_max_batch)
+        self.mmap = app.config.get('MODEL_MMAP', self.mmap)
+        app.extensions['model_registry'] = self
+        if app.config.get('MODEL_PRELOAD'):
+            self.warm_up()
+        elif app.config.get('MODEL_WARMUP_BACKGROUND'):
+            threading.Thread(target=self._warm_up_quietly, args=(app,), name='model-warmup', daemon=True).start()
+
+    def warm_up(self):
+        """Load the model and run one prediction through it"""
+        loaded_model = self.get()
+        loaded_model.warm_up()
+        return loaded_model
+
+    def _warm_up_quietly(self, app):
+        try:
+            self.warm_up()
+        except Exception:
+            app.logger.exception('Model warm-up failed')
+
+    @property
+    def ready(self):
+        current = self._current
+        return current is not None and current.warm
+
+    def _resolve_path(self):
+        path = self.path or DEFAULT_MODEL_PATH
+        if not os.path.exists(path):
+            # Try alternate path
+            path = 'intrusion_detection_model.pkl'
+        return path
+
+    def _stat_path(self, path):
+        # An artifact directory changes when its manifest is replaced
+        return manifest_path(path) if is_artifact(path) else path
+
+    def _load(self, path, stat):
+        with open(self._stat_path(path), 'rb') as f:
+            sha256 = hashlib.sha256(f.read()).hexdigest()
+        if self._current is not None and self._current.sha256 == sha256:
+            # Touched but unchanged, keep the loaded model
+            self._current.mtime = stat.st_mtime
+            return self._current
+        if is_artifact(path):
+            data = load_artifact(path, mmap=self.mmap)
+        else:
+            # Deferred so app startup does not pay for joblib, and unpickling the
+            # model pulls in scikit-learn only when it is first needed
+            import joblib
+            data = joblib.load(path)
+        self.reload_count += 1
+        MODEL_RELOADS.inc()
+        return LoadedModel(data, path, sha256, stat.st_mtime, stat.st_size, n_jobs=self.n_jobs,
+                           backend=self.backend, flat_max_batch=self.flat_max_batch)
+
+    def _is_stale(self, stat):
+        current = self._current
+        return current is None or current.mtime != stat.st_mtime or current.size != stat.st_size
+
+    def get(self):
+        """Return the current LoadedModel, loading or reloading it if needed"""
+        current = self._current
+        now = time.monotonic()
+        if current is not None and now - self._last_check < self.check_interval:
+            return current
+
+        with self._lock:
+            if self._current is not None and now - self._last_check < self.check_interval:
+                return self._current
+            path = self._resolve_path()
+            stat = os.stat(self._stat_path(path))
+            if self._is_stale(stat):
+                self._current = self._load(path, stat)
+            self._last_check = time.monotonic()
+            return self._current
+
+    def invalidate(self):
+        """Drop the loaded model so the next get() loads it from disk again"""
+        with self._lock:
+            self._current = None
+            self._last_check = 0.0
+
+    def info(self):
+        current = self._current
+        if current is None:
+            return {'loaded': False, 'reload_count': self.reload_count}
+        info = current.info()
+        info.update({'loaded': True, 'reload_count': self.reload_count})
+        return info
+
+
+model_registry = ModelRegistry()
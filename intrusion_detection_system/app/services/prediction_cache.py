@@ -0,0 +1,137 @@
+import hashlib
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+# Rough per-entry bookkeeping cost of the OrderedDict slot, key bytes and tuple
+ENTRY_OVERHEAD = 200
+
+
+class PredictionCache:
+    """Bounded LRU + TTL cache of class probabilities per encoded feature vector.
+
+    Keys are a BLAKE2 digest of the float32 feature row, so repeated records
+    (SYN floods resending identical counts and flags) skip inference. Entries
+    belong to one model version; when the registry loads a different model
+    file the whole cache is dropped. Capacity is given in bytes through
+    ``PREDICTION_CACHE_MAX_BYTES``.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.max_bytes = 16 * 2 ** 20
+        self.ttl = 300.0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self.bytes = 0
+        self._version = None
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.enabled = app.config.get('PREDICTION_CACHE_ENABLED', False)
+        self.max_bytes = app.config.get('PREDICTION_CACHE_MAX_BYTES', self.max_bytes)
+        self.ttl = app.config.get('PREDICTION_CACHE_TTL', self.ttl)
+        app.extensions['prediction_cache'] = self
+
+    @staticmethod
+    def key(row):
+        return hashlib.blake2b(row.tobytes(), digest_size=16).digest()
+
+    def predict_proba(self, loaded_model, features, compute):
+        """Probabilities for ``features``, calling ``compute`` only for cache misses"""
+        features = np.ascontiguousarray(features, dtype=np.float32)
+        keys = [self.key(row) for row in features]
+        now = time.monotonic()
+        cached = {}
+
+        with self._lock:
+            if self._version != loaded_model.sha256:
+                self._clear(loaded_model.sha256)
+            for i, key in enumerate(keys):
+                entry = self._entries.get(key)
+                if entry is None:
+                    continue
+                expires_at, probabilities = entry
+                if expires_at < now:
+                    self._remove(key)
+                    self.expirations += 1
+                    continue
+                self._entries.move_to_end(key)
+                cached[i] = probabilities
+            self.hits += len(cached)
+            self.misses += len(keys) - len(cached)
+
+        if len(cached) == len(keys):
+            return np.vstack([cached[i] for i in range(len(keys))])
+
+        missing = [i for i in range(len(keys)) if i not in cached]
+        computed = compute(loaded_model, features[missing])
+        result = np.empty((len(keys), computed.shape[1]), dtype=computed.dtype)
+        result[missing] = computed
+        for i, probabilities in cached.items():
+            result[i] = probabilities
+
+        with self._lock:
+            if self._version == loaded_model.sha256:
+                expires_at = now + self.ttl
+                for i, probabilities in zip(missing, computed):
+                    self._store(keys[i], (expires_at, probabilities.copy()))
+        return result
+
+    def clear(self):
+        with self._lock:
+            self._clear(self._version)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'enabled': self.enabled,
+            'entries': len(self._entries),
+            'bytes': self.bytes,
+            'max_bytes': self.max_bytes,
+            'ttl_seconds': self.ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+            'invalidations': self.invalidations,
+            'model_sha256': self._version
+        }
+
+    def _clear(self, version):
+        if self._entries:
+            self.invalidations += 1
+        self._entries.clear()
+        self.bytes = 0
+        self._version = version
+
+    @staticmethod
+    def _entry_size(key, value):
+        return sys.getsizeof(key) + value[1].nbytes + ENTRY_OVERHEAD
+
+    def _store(self, key, value):
+        if key in self._entries:
+            self._remove(key)
+        size = self._entry_size(key, value)
+        while self._entries and self.bytes + size > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+        if size <= self.max_bytes:
+            self._entries[key] = value
+            self.bytes += size
+
+    def _remove(self, key):
+        value = self._entries.pop(key)
+        self.bytes -= self._entry_size(key, value)
+
+
+prediction_cache = PredictionCache()
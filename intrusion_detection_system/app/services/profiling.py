@@ -0,0 +1,44 @@
+import cProfile
+import io
+import pstats
+from functools import wraps
+
+from flask import current_app, jsonify, make_response, request
+from flask_login import current_user
+
+PROFILE_HEADER = 'X-Profile'
+
+
+def _profile_requested():
+    if not current_app.config.get('PROFILING_ENABLED', True):
+        return False
+    if request.headers.get(PROFILE_HEADER, '').lower() not in ('1', 'true', 'yes'):
+        return False
+    return current_user.is_authenticated and current_user.can_manage_users()
+
+
+def profiled(view):
+    """Run the view under cProfile when an admin sends ``X-Profile: 1``.
+
+    The normal response is returned inside a JSON envelope next to the top
+    functions by cumulative time.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if not _profile_requested():
+            return view(*args, **kwargs)
+
+        profiler = cProfile.Profile()
+        response = make_response(profiler.runcall(view, *args, **kwargs))
+
+        stream = io.StringIO()
+        limit = current_app.config.get('PROFILE_TOP_FUNCTIONS', 30)
+        pstats.Stats(profiler, stream=stream).sort_stats('cumulative').print_stats(limit)
+        body = response.get_json(silent=True)
+        return jsonify({
+            'status': response.status_code,
+            'response': body if body is not None else response.get_data(as_text=True),
+            'profile': stream.getvalue()
+        })
+
+    return wrapper
@@ -0,0 +1,191 @@
+from collections import Counter
+from datetime import timedelta
+
+from sqlalchemy import and_, delete, func, select, update
+
+from app import db
+from app.models.detection import Detection
+from app.models.detection_rollup import ALL_TIME, GLOBAL_SCOPE, DetectionRollup
+from app.models.incident import Incident
+from app.models.user import User
+from app.services.archive import read_archive
+from app.services.incidents import incident_aggregator
+
+TIME_BUCKETS = ('minute', 'hour', 'day')
+KEY_COLUMNS = ('user_id', 'bucket', 'bucket_start', 'prediction')
+
+
+def bucket_start(timestamp, bucket):
+    if bucket == 'minute':
+        return timestamp.replace(second=0, microsecond=0)
+    if bucket == 'hour':
+        return timestamp.replace(minute=0, second=0, microsecond=0)
+    if bucket == 'day':
+        return timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+    if bucket == 'all':
+        return ALL_TIME
+    raise ValueError(f'Unknown rollup bucket {bucket!r}')
+
+
+def _by_minute(rows):
+    return Counter((row['user_id'], bucket_start(row['timestamp'], 'minute'), row['prediction']) for row in rows)
+
+
+def _expand(per_minute, buckets):
+    # Every coarser bucket is a truncation of the minute bucket
+    deltas = Counter()
+    for (user_id, minute, prediction), count in per_minute.items():
+        starts = [('all', ALL_TIME)] + [(bucket, bucket_start(minute, bucket)) for bucket in buckets]
+        for bucket, start in starts:
+            deltas[(user_id, bucket, start, prediction)] += count
+            deltas[(GLOBAL_SCOPE, bucket, start, prediction)] += count
+    return deltas
+
+
+def rollup_deltas(rows, buckets=TIME_BUCKETS):
+    """Counter of rollup keys for Detection row mappings, per user and global"""
+    return _expand(_by_minute(rows), buckets)
+
+
+def _upsert(deltas):
+    table = DetectionRollup.__table__
+    values = [dict(zip(KEY_COLUMNS, key), count=count) for key, count in deltas.items() if count]
+    if not values:
+        return
+
+    dialect = db.session.get_bind().dialect.name
+    if dialect in ('sqlite', 'postgresql'):
+        if dialect == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert
+        statement = insert(table)
+        statement = statement.on_conflict_do_update(
+            index_elements=list(KEY_COLUMNS),
+            set_={'count': table.c.count + statement.excluded['count']})
+        db.session.execute(statement, values)
+    elif dialect in ('mysql', 'mariadb'):
+        from sqlalchemy.dialects.mysql import insert
+        statement = insert(table)
+        statement = statement.on_duplicate_key_update(count=table.c.count + statement.inserted['count'])
+        db.session.execute(statement, values)
+    else:
+        for value in values:
+            key = and_(*(table.c[column] == value[column] for column in KEY_COLUMNS))
+            result = db.session.execute(update(table).where(key).values(count=table.c.count + value['count']))
+            if result.rowcount == 0:
+                db.session.execute(table.insert().values(**value))
+
+
+def apply_rollups(rows, buckets=TIME_BUCKETS):
+    """Add freshly written Detection rows to the rollups in the current transaction"""
+    _upsert(rollup_deltas(rows, buckets))
+
+
+def get_counts(user_id=GLOBAL_SCOPE):
+    """All-time detection counts by prediction class"""
+    result = db.session.execute(
+        select(DetectionRollup.prediction, DetectionRollup.count)
+        .where(DetectionRollup.user_id == user_id, DetectionRollup.bucket == 'all'))
+    return {prediction: count for prediction, count in result}
+
+
+def get_summary(user_id=GLOBAL_SCOPE):
+    """total/normal/attack counts as used by the dashboards"""
+    counts = get_counts(user_id)
+    total = sum(counts.values())
+    normal = counts.get('normal', 0)
+    return {'total_detections': total, 'normal_count': normal, 'attack_count': total - normal}
+
+
+def get_series(bucket, since=None, user_id=GLOBAL_SCOPE):
+    """Counts per time bucket and class, oldest first"""
+    if bucket not in TIME_BUCKETS:
+        raise ValueError(f'Unknown rollup bucket {bucket!r}')
+    query = (select(DetectionRollup.bucket_start, DetectionRollup.prediction, DetectionRollup.count)
+             .where(DetectionRollup.user_id == user_id, DetectionRollup.bucket == bucket)
+             .order_by(DetectionRollup.bucket_start))
+    if since is not None:
+        query = query.where(DetectionRollup.bucket_start >= bucket_start(since, bucket))
+    series = {}
+    for start, prediction, count in db.session.execute(query):
+        series.setdefault(start, {})[prediction] = count
+    return [{'bucket_start': start.isoformat(), 'counts': counts} for start, counts in series.items()]
+
+
+def remove_user(user_id):
+    """Subtract a user's counters from the global ones and drop them"""
+    table = DetectionRollup.__table__
+    user_rows = db.session.execute(
+        select(table.c.bucket, table.c.bucket_start, table.c.prediction, table.c.count)
+        .where(table.c.user_id == user_id)).all()
+    if not user_rows:
+        return
+    _upsert(Counter({(GLOBAL_SCOPE, bucket, start, prediction): -count
+                     for bucket, start, prediction, count in user_rows}))
+    db.session.execute(delete(table).where(table.c.user_id == user_id))
+
+
+def _spread(first, last, count):
+    """Per-minute counts for ``count`` attacks spread evenly from ``first`` to ``last``"""
+    minute = bucket_start(first, 'minute')
+    end = bucket_start(last, 'minute')
+    if minute == end:
+        return {minute: count}
+    span = (last - first).total_seconds()
+    spread = {}
+    placed = 0
+    while minute < end:
+        minute += timedelta(minutes=1)
+        upto = round(count * (minute - first).total_seconds() / span)
+        spread[minute - timedelta(minutes=1)] = upto - placed
+        placed = upto
+    spread[end] = count - placed
+    return spread
+
+
+def rebuild_rollups(buckets=None, batch_size=50000):
+    """Recompute every rollup from the Detection table and the archive, streaming their rows.
+
+    With ``INCIDENT_STORE_RAW_ATTACKS`` off the attacks only exist as incidents,
+    so they are counted from the Incident table instead: exact per class, spread
+    evenly over each incident's minutes. Attack rows stored before a user's
+    first incident are still counted from Detection.
+    """
+    buckets = buckets or TIME_BUCKETS
+    db.session.execute(delete(DetectionRollup.__table__))
+    from_incidents = incident_aggregator.enabled and not incident_aggregator.store_raw_attacks
+    since = {}
+    if from_incidents:
+        since = dict(db.session.execute(
+            select(Incident.user_id, func.min(Incident.first_seen)).group_by(Incident.user_id)).all())
+
+    def counted(user_id, timestamp, prediction):
+        if prediction == 'normal' or user_id not in since:
+            return True
+        return timestamp is not None and timestamp < since[user_id]
+
+    per_minute = Counter()
+    query = select(Detection.user_id, Detection.timestamp, Detection.prediction).execution_options(yield_per=batch_size)
+    rows = 0
+    for user_id, timestamp, prediction in db.session.execute(query):
+        if counted(user_id, timestamp, prediction):
+            per_minute[(user_id, bucket_start(timestamp or ALL_TIME, 'minute'), prediction)] += 1
+            rows += 1
+    # Archived detections still count; skip those of users deleted since
+    user_ids = set(db.session.execute(select(User.id)).scalars())
+    for row in read_archive():
+        if row.user_id in user_ids and counted(row.user_id, row.timestamp, row.prediction):
+            per_minute[(row.user_id, bucket_start(row.timestamp, 'minute'), row.prediction)] += 1
+            rows += 1
+    if from_incidents:
+        query = (select(Incident.user_id, Incident.prediction, Incident.first_seen, Incident.last_seen, Incident.count)
+                 .execution_options(yield_per=batch_size))
+        for user_id, prediction, first_seen, last_seen, count in db.session.execute(query):
+            for minute, share in _spread(first_seen, last_seen, count).items():
+                per_minute[(user_id, minute, prediction)] += share
+            rows += count
+    deltas = _expand(per_minute, buckets)
+    _upsert(deltas)
+    db.session.commit()
+    return rows
@@ -0,0 +1,17 @@
+import numpy as np
+
+from app.services.prediction_cache import prediction_cache
+from app.services.scoring_engine import scoring_engine
+
+
+def score_matrix(loaded_model, features):
+    """Run predict_proba once and derive classes and confidences from it"""
+    model = loaded_model.model
+    if prediction_cache.enabled:
+        probabilities = prediction_cache.predict_proba(loaded_model, features, scoring_engine.predict_proba)
+    else:
+        probabilities = scoring_engine.predict_proba(loaded_model, features)
+    best = probabilities.argmax(axis=1)
+    predictions = model.classes_[best]
+    confidences = probabilities[np.arange(len(best)), best]
+    return predictions, confidences, probabilities
@@ -0,0 +1,95 @@
+import atexit
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+_worker_model = None
+
+
+def _init_worker(path, options):
+    """Load the model once per pool process"""
+    global _worker_model
+    from app.services.model_registry import ModelRegistry
+    registry = ModelRegistry(path, check_interval=float('inf'), **options)
+    _worker_model = registry.get()
+
+
+def _score_chunk(features):
+    return _worker_model.predict_proba(features)
+
+
+class ScoringEngine:
+    """Splits large batches across a process pool.
+
+    Batches of at least ``SCORING_PARALLEL_THRESHOLD`` rows are cut into
+    ``SCORING_CHUNK_SIZE`` slices and scored by ``SCORING_WORKERS`` processes,
+    each holding its own copy of the model. Results are reassembled in input
+    order. Smaller batches, or ``SCORING_WORKERS`` of 0 or 1, are scored in
+    the calling thread.
+    """
+
+    def __init__(self):
+        self.workers = 0
+        self.chunk_size = 5000
+        self.threshold = 10000
+        self.mp_context = 'spawn'
+        self._executor = None
+        self._executor_key = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.configure(workers=app.config.get('SCORING_WORKERS', 0),
+                       chunk_size=app.config.get('SCORING_CHUNK_SIZE', self.chunk_size),
+                       threshold=app.config.get('SCORING_PARALLEL_THRESHOLD', self.threshold),
+                       mp_context=app.config.get('SCORING_MP_CONTEXT', self.mp_context))
+        app.extensions['scoring_engine'] = self
+        atexit.register(self.shutdown)
+
+    def configure(self, workers=None, chunk_size=None, threshold=None, mp_context=None):
+        if workers is not None:
+            self.workers = workers if workers >= 0 else os.cpu_count() or 1
+        if chunk_size is not None:
+            self.chunk_size = chunk_size
+        if threshold is not None:
+            self.threshold = threshold
+        if mp_context is not None:
+            self.mp_context = mp_context
+        self.shutdown()
+
+    def predict_proba(self, loaded_model, features):
+        """Class probabilities for ``features``, in input order"""
+        if self.workers <= 1 or len(features) < max(self.threshold, 2):
+            return loaded_model.predict_proba(features)
+
+        executor = self._get_executor(loaded_model)
+        chunks = [features[start:start + self.chunk_size] for start in range(0, len(features), self.chunk_size)]
+        return np.vstack(list(executor.map(_score_chunk, chunks)))
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+            self._executor = None
+            self._executor_key = None
+
+    def _get_executor(self, loaded_model):
+        # Pools are tied to one model file version and one process
+        key = (os.getpid(), loaded_model.sha256, self.workers)
+        with self._lock:
+            if self._executor is not None and self._executor_key == key:
+                return self._executor
+            if self._executor is not None and self._executor_key[0] == os.getpid():
+                self._executor.shutdown(wait=False)
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context(self.mp_context),
+                initializer=_init_worker,
+                initargs=(loaded_model.path, loaded_model.options))
+            self._executor_key = key
+            return self._executor
+
+
+scoring_engine = ScoringEngine()
@@ -0,0 +1,182 @@
+import math
+
+import numpy as np
+
+PROTOCOLS = ['tcp', 'udp', 'icmp']
+SERVICES = ['http', 'smtp', 'ftp', 'ssh', 'telnet']
+FLAGS = ['SF', 'S0', 'REJ', 'RSTR']
+
+RATE_FEATURES = [
+    'serror_rate', 'srv_serror_rate', 'rerror_rate', 'srv_rerror_rate', 'same_srv_rate',
+    'diff_srv_rate', 'srv_diff_host_rate', 'dst_host_same_srv_rate', 'dst_host_diff_srv_rate',
+    'dst_host_same_src_port_rate', 'dst_host_srv_diff_host_rate', 'dst_host_serror_rate',
+    'dst_host_srv_serror_rate', 'dst_host_rerror_rate', 'dst_host_srv_rerror_rate'
+]
+
+# Classes a mix can draw, each reshaped by _apply_attack
+MIX_CLASSES = ('normal', 'dos', 'probe', 'r2l', 'u2r')
+
+# Class mixes for the attack-mix profiles; None keeps the plain demo distributions
+PROFILES = {
+    'baseline': None,
+    'mixed': {'normal': 0.80, 'dos': 0.10, 'probe': 0.05, 'r2l': 0.04, 'u2r': 0.01},
+    'dos_burst': {'normal': 0.20, 'dos': 0.80},
+    'scan': {'normal': 0.50, 'probe': 0.50},
+}
+
+
+class TrafficSimulator:
+    """Vectorized generator of NSL-KDD shaped connection records.
+
+    Every feature is drawn for all N samples with a single NumPy call, using the
+    same distributions as the original per-sample demo generator. An optional
+    attack-mix profile assigns each sample a class and reshapes the features
+    that characterise that class.
+    """
+
+    def __init__(self, seed=None):
+        self.rng = np.random.default_rng(seed)
+
+    def generate(self, count, profile=None):
+        """Column arrays for ``count`` samples, keyed by feature name.
+
+        With a profile, ``profile_class`` holds each sample's ground-truth class.
+        """
+        rng = self.rng
+        columns = {
+            'duration': rng.exponential(50, count),
+            'protocol_type': rng.choice(PROTOCOLS, count),
+            'service': rng.choice(SERVICES, count),
+            'flag': rng.choice(FLAGS, count),
+            'src_bytes': rng.exponential(1000, count).astype(np.int64),
+            'dst_bytes': rng.exponential(500, count).astype(np.int64),
+            'land': rng.choice([0, 1], count, p=[0.99, 0.01]),
+            'wrong_fragment': rng.poisson(0.1, count),
+            'urgent': rng.poisson(0.01, count),
+            'hot': rng.poisson(0.5, count),
+            'num_failed_logins': rng.poisson(0.1, count),
+            'logged_in': rng.choice([0, 1], count, p=[0.3, 0.7]),
+            'num_compromised': rng.poisson(0.1, count),
+            'root_shell': rng.poisson(0.05, count),
+            'su_attempted': rng.poisson(0.01, count),
+            'num_root': rng.poisson(0.1, count),
+            'num_file_creations': rng.poisson(0.1, count),
+            'num_shells': rng.poisson(0.05, count),
+            'num_access_files': rng.poisson(0.1, count),
+            'num_outbound_cmds': rng.poisson(0.01, count),
+            'is_host_login': rng.choice([0, 1], count, p=[0.95, 0.05]),
+            'is_guest_login': rng.choice([0, 1], count, p=[0.95, 0.05]),
+            'count': rng.poisson(10, count),
+            'srv_count': rng.poisson(8, count),
+        }
+        rates = rng.uniform(0, 1, (len(RATE_FEATURES), count))
+        columns.update(zip(RATE_FEATURES, rates))
+        columns['dst_host_count'] = rng.poisson(50, count)
+        columns['dst_host_srv_count'] = rng.poisson(30, count)
+        columns['src_ip_host'] = rng.integers(1, 255, count)
+
+        mix = resolve_mix(profile)
+        if mix:
+            labels = rng.choice(list(mix), count, p=_normalized(mix.values()))
+            for label in mix:
+                mask = labels == label
+                if label != 'normal' and mask.any():
+                    _apply_attack(columns, label, mask, rng)
+            columns['profile_class'] = labels
+        return columns
+
+    def samples(self, count, profile=None):
+        """``count`` samples as JSON-ready dicts, like /detection/api/simulate returns"""
+        columns = self.generate(count, profile)
+        hosts = columns.pop('src_ip_host').tolist()
+        # Ground truth is not a record field and must not reach the encoder
+        columns.pop('profile_class', None)
+        names = list(columns)
+        values = [columns[name].tolist() for name in names]
+        samples = [dict(zip(names, row)) for row in zip(*values)]
+        for sample, host in zip(samples, hosts):
+            sample['src_ip'] = f'192.168.1.{host}'
+        return samples
+
+
+def resolve_mix(profile):
+    """The class mix for a profile name or a custom ``{class: weight}`` dict.
+
+    Raises ValueError for an unknown name, an unknown class, or weights that
+    are negative or do not add up to a positive total.
+    """
+    if profile is None:
+        return None
+    if isinstance(profile, str):
+        if profile not in PROFILES:
+            raise ValueError(f"Unknown profile, expected one of {', '.join(PROFILES)}")
+        return PROFILES[profile]
+    if not isinstance(profile, dict) or not profile:
+        raise ValueError('profile must be a profile name or a {class: weight} mix')
+    unknown = sorted(str(label) for label in profile if label not in MIX_CLASSES)
+    if unknown:
+        raise ValueError(f"Unknown classes in mix: {', '.join(unknown)}, expected {', '.join(MIX_CLASSES)}")
+    weights = list(profile.values())
+    if not all(isinstance(w, (int, float)) and not isinstance(w, bool) and math.isfinite(w) and w >= 0
+               for w in weights) or sum(weights) <= 0:
+        raise ValueError('Mix weights must be non-negative numbers with a positive sum')
+    return profile
+
+
+def _normalized(weights):
+    weights = np.asarray(list(weights), dtype=float)
+    return weights / weights.sum()
+
+
+def _apply_attack(columns, label, mask, rng):
+    n = int(mask.sum())
+    if label == 'dos':
+        # SYN flood: half-open connections piling up on one service
+        columns['flag'][mask] = 'S0'
+        columns['src_bytes'][mask] = 0
+        columns['dst_bytes'][mask] = 0
+        columns['count'][mask] = rng.poisson(250, n)
+        columns['srv_count'][mask] = rng.poisson(250, n)
+        for feature in ('serror_rate', 'srv_serror_rate', 'dst_host_serror_rate', 'dst_host_srv_serror_rate'):
+            columns[feature][mask] = rng.uniform(0.9, 1.0, n)
+        columns['same_srv_rate'][mask] = rng.uniform(0.9, 1.0, n)
+        columns['dst_host_count'][mask] = 255
+        columns['dst_host_srv_count'][mask] = 255
+    elif label == 'probe':
+        # Port/host sweep: rejected connections across many services
+        columns['flag'][mask] = 'REJ'
+        columns['src_bytes'][mask] = rng.poisson(5, n)
+        for feature in ('rerror_rate', 'srv_rerror_rate', 'dst_host_rerror_rate', 'dst_host_srv_rerror_rate'):
+            columns[feature][mask] = rng.uniform(0.8, 1.0, n)
+        columns['diff_srv_rate'][mask] = rng.uniform(0.7, 1.0, n)
+        columns['same_srv_rate'][mask] = rng.uniform(0.0, 0.1, n)
+        columns['dst_host_diff_srv_rate'][mask] = rng.uniform(0.7, 1.0, n)
+        columns['dst_host_count'][mask] = 255
+        columns['dst_host_srv_count'][mask] = rng.poisson(2, n)
+    elif label == 'r2l':
+        # Remote login guessing
+        columns['service'][mask] = rng.choice(['ftp', 'telnet', 'ssh'], n)
+        columns['flag'][mask] = 'SF'
+        columns['num_failed_logins'][mask] = rng.poisson(3, n) + 1
+        columns['hot'][mask] = rng.poisson(3, n)
+        columns['is_guest_login'][mask] = rng.choice([0, 1], n, p=[0.5, 0.5])
+        columns['count'][mask] = rng.poisson(2, n)
+    elif label == 'u2r':
+        # Privilege escalation inside an established session
+        columns['service'][mask] = 'telnet'
+        columns['flag'][mask] = 'SF'
+        columns['logged_in'][mask] = 1
+        columns['root_shell'][mask] = 1
+        columns['num_file_creations'][mask] = rng.poisson(2, n) + 1
+        columns['num_shells'][mask] = rng.poisson(1, n) + 1
+        columns['hot'][mask] = rng.poisson(5, n)
+        columns['duration'][mask] = rng.exponential(500, n)
+
+
+_default_simulator = TrafficSimulator()
+
+
+def simulate_samples(count, seed=None, profile=None):
+    """Generate random network traffic samples for demonstration"""
+    simulator = _default_simulator if seed is None else TrafficSimulator(seed)
+    return simulator.samples(count, profile)
@@ -0,0 +1,109 @@
+"""Per-process cache behind the Flask-Login user loader.
+
+Every authenticated request used to load its user with a primary-key SELECT.
+The cache keeps a detached snapshot of each active user's columns for
+``USER_CACHE_TTL`` seconds and attaches a copy to the request's session with
+``merge(load=False)``, which issues no query. Once an entry expires, it is
+revalidated by reading only the user's ``version`` and ``active`` columns, and
+kept if neither changed.
+
+``version`` is bumped in the database on every ORM update of a user (see
+``app/models/user.py``). A change made through another worker is therefore
+picked up here within one TTL. Changes made through this process also drop the
+entry right away via ``invalidate``.
+"""
+import threading
+import time
+
+from sqlalchemy import select
+from sqlalchemy.orm import make_transient_to_detached
+
+from app import db
+from app.models.user import User
+
+
+class UserCache:
+    """TTL cache of user snapshots keyed by id, revalidated by version"""
+
+    def __init__(self):
+        self.enabled = True
+        self.ttl = 10.0
+        self.max_entries = 10000
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+        self.invalidations = 0
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.enabled = app.config.get('USER_CACHE_ENABLED', self.enabled)
+        self.ttl = app.config.get('USER_CACHE_TTL', self.ttl)
+        self.max_entries = app.config.get('USER_CACHE_MAX_ENTRIES', self.max_entries)
+        app.extensions['user_cache'] = self
+
+    def load(self, user_id):
+        """The active user with ``user_id`` attached to the current session, or None"""
+        if not self.enabled:
+            user = db.session.get(User, user_id)
+            return user if user and user.active else None
+
+        entry = self._entries.get(user_id)
+        if entry is not None:
+            expires, snapshot = entry
+            if expires >= time.monotonic():
+                self.hits += 1
+                return db.session.merge(snapshot, load=False)
+            row = db.session.execute(select(User.version, User.active).where(User.id == user_id)).first()
+            if row is not None and row.active and row.version == snapshot.version:
+                self.revalidations += 1
+                self._store(user_id, snapshot)
+                return db.session.merge(snapshot, load=False)
+            self.invalidate(user_id)
+
+        self.misses += 1
+        user = db.session.get(User, user_id)
+        if user is None or not user.active:
+            return None
+        self._store(user_id, self._snapshot(user))
+        return user
+
+    def invalidate(self, user_id=None):
+        with self._lock:
+            if user_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(user_id, None)
+            self.invalidations += 1
+
+    def stats(self):
+        lookups = self.hits + self.revalidations + self.misses
+        return {
+            'enabled': self.enabled,
+            'entries': len(self._entries),
+            'hits': self.hits,
+            'revalidations': self.revalidations,
+            'misses': self.misses,
+            'invalidations': self.invalidations,
+            'hit_ratio': (self.hits + self.revalidations) / lookups if lookups else 0.0,
+        }
+
+    @staticmethod
+    def _snapshot(user):
+        # A separate detached instance, so the request's own object (which may
+        # be modified or expired by a commit) never leaks into the cache
+        snapshot = User(**{column.key: getattr(user, column.key) for column in User.__table__.columns})
+        make_transient_to_detached(snapshot)
+        return snapshot
+
+    def _store(self, user_id, snapshot):
+        with self._lock:
+            if len(self._entries) >= self.max_entries and user_id not in self._entries:
+                now = time.monotonic()
+                self._entries = {key: entry for key, entry in self._entries.items() if entry[0] >= now}
+                if len(self._entries) >= self.max_entries:
+                    self._entries.pop(next(iter(self._entries)))
+            self._entries[user_id] = (time.monotonic() + self.ttl, snapshot)
+
+
+user_cache = UserCache()
@@ -0,0 +1,68 @@
+from sqlalchemy import delete, func, select
+
+from app import db
+from app.models.api_token import ApiToken
+from app.models.detection import Detection
+from app.models.incident import Incident
+from app.models.user import User
+from app.services.archive import delete_user_rows, list_partitions
+from app.services.detection_writer import detection_writer
+from app.services.incidents import incident_aggregator
+from app.services.rollups import remove_user
+
+
+def count_detections(user_id, limit=None):
+    """Number of detections a user has, counting at most ``limit`` of them"""
+    query = select(Detection.id).where(Detection.user_id == user_id)
+    if limit is not None:
+        query = query.limit(limit)
+    return db.session.execute(select(func.count()).select_from(query.subquery())).scalar()
+
+
+def delete_detections(user_id, chunk_size=None, progress=None):
+    """Delete a user's detections with set-based DELETEs.
+
+    Without ``chunk_size`` this is a single statement. With it, rows go in
+    chunks of that many ids, each committed separately so the write lock is
+    released between chunks and ``progress(deleted)`` can be reported.
+    """
+    if chunk_size is None:
+        return db.session.execute(delete(Detection).where(Detection.user_id == user_id)).rowcount
+
+    deleted = 0
+    while True:
+        ids = db.session.execute(
+            select(Detection.id).where(Detection.user_id == user_id).limit(chunk_size)).scalars().all()
+        if not ids:
+            return deleted
+        db.session.execute(delete(Detection).where(Detection.id.in_(ids)))
+        db.session.commit()
+        deleted += len(ids)
+        if progress:
+            progress(deleted)
+
+
+def has_archive():
+    """Whether any archive files exist, which makes purging a user slower"""
+    return bool(list_partitions())
+
+
+def purge_user(user_id, chunk_size=None, progress=None):
+    """Delete a user, their detections (archived ones too) and their rollup counters, then commit"""
+    if progress:
+        progress(0, count_detections(user_id))
+    deleted = delete_detections(user_id, chunk_size, progress)
+    # Before the user row goes, so an interrupted purge can simply be run again
+    deleted += delete_user_rows(user_id)
+    # Detections still queued for writing would otherwise land after the purge.
+    # Commit first so the writer is not waiting on this transaction's lock.
+    db.session.commit()
+    detection_writer.flush()
+    deleted += delete_detections(user_id)
+    remove_user(user_id)
+    db.session.execute(delete(ApiToken).where(ApiToken.user_id == user_id))
+    db.session.execute(delete(Incident).where(Incident.user_id == user_id))
+    incident_aggregator.forget(user_id)
+    db.session.execute(delete(User).where(User.id == user_id))
+    db.session.commit()
+    return deleted
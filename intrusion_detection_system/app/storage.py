@@ -0,0 +1,85 @@
+"""Engine settings for the configured database.
+
+SQLite files are opened in WAL mode with a busy timeout so several server
+workers can write without "database is locked" errors. Server databases
+(PostgreSQL, MySQL) get a connection pool with pre-ping.
+"""
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+
+def normalize_database_uri(uri):
+    # Hosted Postgres providers still hand out postgres:// URLs
+    if uri and uri.startswith('postgres://'):
+        return 'postgresql://' + uri[len('postgres://'):]
+    return uri
+
+
+def is_sqlite_file(url):
+    return url.get_backend_name() == 'sqlite' and url.database not in (None, '', ':memory:')
+
+
+def engine_options(config):
+    """SQLAlchemy create_engine() keyword arguments for the configured URI"""
+    url = make_url(config['SQLALCHEMY_DATABASE_URI'])
+    options = {}
+    if url.get_backend_name() == 'sqlite':
+        if is_sqlite_file(url):
+            # pysqlite waits this long for a lock before raising
+            options['connect_args'] = {'timeout': config.get('SQLITE_BUSY_TIMEOUT_MS', 5000) / 1000.0}
+    else:
+        options.update({
+            'pool_size': config.get('DB_POOL_SIZE', 10),
+            'max_overflow': config.get('DB_MAX_OVERFLOW', 20),
+            'pool_timeout': config.get('DB_POOL_TIMEOUT', 30),
+            'pool_recycle': config.get('DB_POOL_RECYCLE', 1800),
+            'pool_pre_ping': config.get('DB_POOL_PRE_PING', True),
+        })
+    # Explicit SQLALCHEMY_ENGINE_OPTIONS win over the defaults above
+    options.update(config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+    return options
+
+
+def configure_storage(app):
+    """Fill in engine options; call before db.init_app(app)"""
+    app.config['SQLALCHEMY_DATABASE_URI'] = normalize_database_uri(app.config['SQLALCHEMY_DATABASE_URI'])
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config)
+
+
+def sqlite_pragmas(config, url):
+    pragmas = {'busy_timeout': int(config.get('SQLITE_BUSY_TIMEOUT_MS', 5000))}
+    if is_sqlite_file(url):
+        if config.get('SQLITE_WAL', True):
+            pragmas['journal_mode'] = 'WAL'
+        pragmas['synchronous'] = config.get('SQLITE_SYNCHRONOUS', 'NORMAL')
+    pragmas.update(config.get('SQLITE_PRAGMAS') or {})
+    return pragmas
+
+
+def install_pragmas(app, engine):
+    """Apply SQLite pragmas to every new connection of ``engine``"""
+    if engine.url.get_backend_name() != 'sqlite':
+        return
+    pragmas = sqlite_pragmas(app.config, engine.url)
+
+    @event.listens_for(engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f'PRAGMA {name}={value}')
+        finally:
+            cursor.close()
+
+    # Connections opened before the listener was attached keep old settings
+    engine.dispose()
+
+
+def storage_info(engine):
+    """Backend, pool and pragma summary for diagnostics"""
+    info = {'backend': engine.url.get_backend_name(), 'pool': engine.pool.status()}
+    if info['backend'] == 'sqlite':
+        with engine.connect() as connection:
+            for name in ('journal_mode', 'synchronous', 'busy_timeout'):
+                info[name] = connection.exec_driver_sql(f'PRAGMA {name}').scalar()
+    return info
@@ -0,0 +1,90 @@
+"""Parity and latency of the flat forest backend against sklearn's predict_proba.
+
+Parity is checked on every row of nsl_kdd_sample.csv, on perturbed copies that
+land on and around split thresholds, and on out-of-range values. The script
+exits non-zero if any probability differs by more than --atol.
+
+    python benchmarks/bench_flat_forest.py
+"""
+import argparse
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from common import SAMPLE_CSV, make_app
+
+
+def parity_cases(loaded_model, flat_forest, sample, rng):
+    yield 'nsl_kdd_sample.csv', sample
+
+    noisy = sample * rng.uniform(0.5, 1.5, size=sample.shape).astype(np.float32)
+    yield 'perturbed rows', noisy
+
+    # Values sitting exactly on a split threshold must go left, as in sklearn
+    on_threshold = sample.copy()
+    split_nodes = np.flatnonzero(flat_forest.is_split)
+    picks = rng.choice(split_nodes, size=min(len(on_threshold), len(split_nodes)), replace=False)
+    for row, node in enumerate(picks):
+        on_threshold[row, flat_forest.feature[node]] = np.float32(flat_forest.threshold[node])
+    yield 'values on split thresholds', on_threshold[:len(picks)]
+
+    extremes = rng.choice([-1e9, 0.0, 1e9], size=(500, sample.shape[1])).astype(np.float32)
+    yield 'out of range values', extremes
+
+    yield 'single row', sample[:1]
+
+
+def time_call(fn, features, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(features)
+        timings.append(time.perf_counter() - start)
+    return np.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--atol', type=float, default=1e-9)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    make_app()
+    from app.services.flat_forest import FlatForest, check_parity
+    from app.services.model_registry import model_registry
+
+    loaded_model = model_registry.get()
+    forest = loaded_model.model
+    flat_forest = FlatForest.from_estimator(forest)
+    sample = loaded_model.encoder.encode_frame(pd.read_csv(SAMPLE_CSV))
+    rng = np.random.default_rng(0)
+
+    print('parity')
+    failed = False
+    for name, features in parity_cases(loaded_model, flat_forest, sample, rng):
+        try:
+            difference = check_parity(forest, flat_forest, features, atol=args.atol)
+            print(f'  ok    {name:<28} rows={len(features):<6} max diff={difference:.2e}')
+        except AssertionError as e:
+            failed = True
+            print(f'  FAIL  {name:<28} {e}')
+        if not np.array_equal(forest.predict(features), flat_forest.predict(features)):
+            failed = True
+            print(f'  FAIL  {name:<28} predicted classes differ')
+
+    print('\nlatency (median)')
+    print(f"{'batch':>8} {'sklearn ms':>12} {'flat ms':>10} {'speedup':>8}")
+    for batch_size in (1, 100, 10000):
+        features = np.resize(sample, (batch_size, sample.shape[1]))
+        repeat = args.repeat if batch_size < 10000 else max(args.repeat // 4, 3)
+        sklearn_time = time_call(forest.predict_proba, features, repeat)
+        flat_time = time_call(flat_forest.predict_proba, features, repeat)
+        print(f'{batch_size:>8} {sklearn_time * 1000:>12.3f} {flat_time * 1000:>10.3f} {sklearn_time / flat_time:>7.1f}x')
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+"""Incident aggregation under a DoS burst.
+
+Feeds a simulated burst (one source flooding ``neptune`` over TCP, mixed with
+normal traffic and a scan from many addresses) through the DetectionWriter in
+batches, as the write-behind worker would, against a SQLite file. Reports the
+Detection and Incident rows stored, write time and the aggregator's open keys,
+with and without raw attack rows, and with aggregation off.
+
+    python benchmarks/bench_incidents.py --rows 50000 --batch-size 256 --scan-ips 20000
+"""
+import argparse
+import os
+import random
+import shutil
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import common  # noqa: F401  (puts the app on sys.path)
+
+MODES = {
+    'off': {'INCIDENTS_ENABLED': False},
+    'incidents': {'INCIDENTS_ENABLED': True, 'INCIDENT_STORE_RAW_ATTACKS': True},
+    'incidents-only': {'INCIDENTS_ENABLED': True, 'INCIDENT_STORE_RAW_ATTACKS': False},
+}
+
+
+def make_app(database_path, mode, max_open):
+    from app import create_app
+    from config import TestingConfig, config
+
+    settings = dict(MODES[mode], SQLALCHEMY_DATABASE_URI=f'sqlite:///{database_path}', INCIDENT_MAX_OPEN=max_open)
+    config['incident-bench'] = type('IncidentBenchConfig', (TestingConfig,), settings)
+    return create_app('incident-bench')
+
+
+def burst(rows, scan_ips, seed=0):
+    """Detection rows for one burst: 80% flood, 10% scan, 10% normal"""
+    rng = random.Random(seed)
+    start = datetime(2024, 1, 1)
+    for i in range(rows):
+        timestamp = start + timedelta(milliseconds=10 * i)
+        draw = rng.random()
+        if draw < 0.8:
+            prediction, ip_address, protocol = 'neptune', '203.0.113.7', 'tcp'
+        elif draw < 0.9:
+            host = rng.randrange(scan_ips)
+            prediction, ip_address, protocol = 'portsweep', f'10.{host >> 16}.{host >> 8 & 255}.{host & 255}', 'tcp'
+        else:
+            prediction, ip_address, protocol = 'normal', '192.168.1.10', 'udp'
+        yield {'user_id': 1, 'prediction': prediction, 'confidence': rng.uniform(0.6, 1.0),
+               'timestamp': timestamp, 'ip_address': ip_address, 'protocol': protocol,
+               'src_bytes': rng.randint(0, 1500), 'dst_bytes': rng.randint(0, 1500)}
+
+
+def run(mode, rows, batch_size, scan_ips, max_open):
+    from app import db
+    from app.models.detection import Detection
+    from app.models.incident import Incident
+    from app.services.detection_writer import detection_writer
+    from app.services.incidents import incident_aggregator
+
+    workdir = tempfile.mkdtemp(prefix='ids-incidents-')
+    try:
+        app = make_app(os.path.join(workdir, 'bench.db'), mode, max_open)
+        incident_aggregator.forget()
+        with app.app_context():
+            batch = []
+            began = time.perf_counter()
+            for row in burst(rows, scan_ips):
+                batch.append(row)
+                if len(batch) == batch_size:
+                    detection_writer.submit(batch)
+                    batch = []
+            if batch:
+                detection_writer.submit(batch)
+            elapsed = time.perf_counter() - began
+            neptune = Incident.query.filter_by(prediction='neptune').all()
+            result = {
+                'detections': Detection.query.count(),
+                'incidents': Incident.query.count(),
+                'neptune_count': sum(incident.count for incident in neptune),
+                'neptune_incidents': len(neptune),
+                'open': incident_aggregator.open_incidents(),
+                'rows_per_s': rows / elapsed,
+                'database_kib': os.path.getsize(os.path.join(workdir, 'bench.db')) / 1024,
+            }
+            db.session.remove()
+            db.engine.dispose()
+        return result
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=50000)
+    parser.add_argument('--batch-size', type=int, default=256)
+    parser.add_argument('--scan-ips', type=int, default=20000)
+    parser.add_argument('--max-open', type=int, default=1000)
+    args = parser.parse_args()
+
+    print(f'{"mode":<16}{"detections":>12}{"incidents":>11}{"neptune":>16}{"open keys":>11}{"rows/s":>10}{"db KiB":>10}')
+    for mode in MODES:
+        result = run(mode, args.rows, args.batch_size, args.scan_ips, args.max_open)
+        neptune = f'{result["neptune_count"]} in {result["neptune_incidents"]}'
+        print(f'{mode:<16}{result["detections"]:>12}{result["incidents"]:>11}{neptune:>16}'
+              f'{result["open"]:>11}{result["rows_per_s"]:>10.0f}{result["database_kib"]:>10.0f}')
+
+
+if __name__ == '__main__':
+    main()
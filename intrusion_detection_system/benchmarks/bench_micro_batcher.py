@@ -0,0 +1,165 @@
+"""Load test of /detection/api/predict with and without the micro-batcher.
+
+A gunicorn server (the shipped gunicorn.conf.py, one gthread worker) is
+started per mode against a temporary SQLite file. N client threads then send
+single-record predict calls over keep-alive connections for --duration
+seconds. The report gives throughput, latency percentiles and the mean number
+of rows per predict_proba call, read from /metrics.
+
+    python benchmarks/bench_micro_batcher.py --clients 1 10 100 --duration 10
+"""
+import argparse
+import http.client
+import json
+import os
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+
+import numpy as np
+
+from common import ROOT, load_sample_records
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_server(port, threads, database_path, **settings):
+    env = dict(os.environ, FLASK_CONFIG='production', DATABASE_URL=f'sqlite:///{database_path}',
+               GUNICORN_BIND=f'127.0.0.1:{port}', GUNICORN_WORKERS='1', GUNICORN_THREADS=str(threads),
+               PYTHONWARNINGS='ignore', **settings)
+    server = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'run:app'],
+                              cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 120
+    while time.monotonic() < deadline:
+        try:
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+            connection.request('GET', '/readyz')
+            if connection.getresponse().status == 200:
+                return server
+        except OSError:
+            pass
+        if server.poll() is not None:
+            raise RuntimeError('gunicorn exited during startup')
+        time.sleep(0.2)
+    server.kill()
+    raise RuntimeError('gunicorn did not become ready')
+
+
+def login(port):
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+    body = urllib.parse.urlencode({'username': 'admin', 'password': 'admin123'})
+    connection.request('POST', '/login', body, {'Content-Type': 'application/x-www-form-urlencoded'})
+    response = connection.getresponse()
+    response.read()
+    cookie = response.getheader('Set-Cookie', '')
+    if 'session=' not in cookie:
+        raise RuntimeError('Login failed')
+    return cookie.split(';', 1)[0]
+
+
+def batch_stats(port, cookie):
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+    connection.request('GET', '/metrics', headers={'Cookie': cookie})
+    text = connection.getresponse().read().decode()
+    values = dict(re.findall(r'^ids_micro_batch_size_(sum|count) (\S+)$', text, re.M))
+    return float(values.get('sum', 0)), float(values.get('count', 0))
+
+
+def drive(port, headers, bodies, clients, duration, path='/detection/api/predict'):
+    latencies = [[] for _ in range(clients)]
+    errors = [0] * clients
+    stop = time.perf_counter() + duration
+
+    def client(index):
+        connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+        request_headers = {'Content-Type': 'application/json', **headers}
+        i = index
+        while time.perf_counter() < stop:
+            start = time.perf_counter()
+            try:
+                connection.request('POST', path, bodies[i % len(bodies)], request_headers)
+                response = connection.getresponse()
+                response.read()
+                ok = response.status == 200
+            except (OSError, http.client.HTTPException):
+                connection.close()
+                connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+                ok = False
+            if ok:
+                latencies[index].append(time.perf_counter() - start)
+            else:
+                errors[index] += 1
+            i += clients
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    merged = np.array([value for values in latencies for value in values]) * 1000
+    return {
+        'requests': len(merged),
+        'errors': sum(errors),
+        'rps': len(merged) / elapsed,
+        'p50_ms': float(np.percentile(merged, 50)) if len(merged) else None,
+        'p95_ms': float(np.percentile(merged, 95)) if len(merged) else None,
+        'p99_ms': float(np.percentile(merged, 99)) if len(merged) else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--clients', type=int, nargs='+', default=[1, 10, 100])
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--max-wait-ms', type=float, default=0)
+    parser.add_argument('--max-size', type=int, default=64)
+    parser.add_argument('--json', help='write the results to this file')
+    args = parser.parse_args()
+
+    bodies = [json.dumps(record) for record in load_sample_records(2000)]
+    threads = max(args.clients)
+    modes = {
+        'direct': {'MICRO_BATCH_ENABLED': '0'},
+        'micro_batch': {'MICRO_BATCH_ENABLED': '1', 'MICRO_BATCH_MAX_WAIT_MS': str(args.max_wait_ms),
+                        'MICRO_BATCH_MAX_SIZE': str(args.max_size)},
+    }
+    results = {}
+    print(f"{'mode':<12} {'clients':>7} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'rows/call':>9} {'errors':>6}")
+    for mode, settings in modes.items():
+        with tempfile.TemporaryDirectory() as tmp:
+            port = free_port()
+            server = start_server(port, threads, os.path.join(tmp, 'bench.db'), **settings)
+            try:
+                cookie = login(port)
+                drive(port, {'Cookie': cookie}, bodies, 1, 1)  # warm up
+                for clients in args.clients:
+                    rows_before, calls_before = batch_stats(port, cookie)
+                    result = drive(port, {'Cookie': cookie}, bodies, clients, args.duration)
+                    rows, calls = batch_stats(port, cookie)
+                    result['rows_per_call'] = (rows - rows_before) / (calls - calls_before) if calls > calls_before else 1.0
+                    results[f'{mode}/{clients}'] = result
+                    print(f"{mode:<12} {clients:>7} {result['rps']:>8.0f} {result['p50_ms']:>8.1f} "
+                          f"{result['p95_ms']:>8.1f} {result['p99_ms']:>8.1f} {result['rows_per_call']:>9.1f} "
+                          f"{result['errors']:>6}")
+            finally:
+                server.terminate()
+                server.wait()
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
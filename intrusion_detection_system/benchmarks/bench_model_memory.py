@@ -0,0 +1,96 @@
+"""Per-worker memory of the pickled model versus the memory-mapped artifact.
+
+Starts N processes that each load the model the way a server worker without
+preload_app does, score one batch, then hold still while the parent reads
+/proc/<pid>/smaps_rollup (Linux only). PSS splits shared pages between the
+processes mapping them, so it shows what each worker really costs.
+
+    flask --app run.py export-model
+    python benchmarks/bench_model_memory.py --workers 4
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+
+from common import ROOT, SAMPLE_CSV
+
+DEFAULT_PICKLE = os.path.join(ROOT, 'app', 'static', 'models', 'intrusion_detection_model.pkl')
+
+
+def memory_kib(pid):
+    values = {}
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == 'kB':
+                values[parts[0].rstrip(':')] = int(parts[1])
+    private = values.get('Private_Clean', 0) + values.get('Private_Dirty', 0)
+    return {'rss': values['Rss'], 'pss': values['Pss'], 'private': private}
+
+
+def worker(path, ready, done, baseline):
+    import warnings
+    warnings.filterwarnings('ignore', category=UserWarning)
+    import numpy as np
+    sys.path.insert(0, ROOT)
+    from app.services.model_registry import ModelRegistry
+
+    baseline.put((os.getpid(), memory_kib(os.getpid())))
+    loaded_model = ModelRegistry(path, check_interval=float('inf')).get()
+    import pandas as pd
+    features = loaded_model.encoder.encode_frame(pd.read_csv(SAMPLE_CSV, nrows=1000))
+    loaded_model.predict_proba(features)
+    ready.wait()
+    done.wait()
+
+
+def measure(path, workers):
+    context = multiprocessing.get_context('spawn')
+    ready = context.Barrier(workers + 1)
+    done = context.Event()
+    baseline = context.Queue()
+    processes = [context.Process(target=worker, args=(path, ready, done, baseline)) for _ in range(workers)]
+    for process in processes:
+        process.start()
+    ready.wait()
+    before = dict(baseline.get() for _ in processes)
+    after = {process.pid: memory_kib(process.pid) for process in processes}
+    done.set()
+    for process in processes:
+        process.join()
+
+    def mean(key, source):
+        return sum(source[pid][key] for pid in source) / len(source) / 1024
+
+    return {
+        'rss_mib': mean('rss', after),
+        'pss_mib': mean('pss', after),
+        'private_mib': mean('private', after),
+        'model_rss_mib': mean('rss', after) - mean('rss', before),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--pickle', default=DEFAULT_PICKLE)
+    parser.add_argument('--artifact', default=None, help='artifact directory (next to the pickle by default)')
+    args = parser.parse_args()
+
+    sys.path.insert(0, ROOT)
+    from app.services.model_artifact import default_artifact_path, is_artifact
+    artifact = args.artifact or default_artifact_path(args.pickle)
+    if not is_artifact(artifact):
+        parser.error(f'No artifact at {artifact}, run `flask --app run.py export-model` first')
+
+    print(f'{args.workers} workers, mean per worker (MiB)')
+    print(f"{'format':<10} {'RSS':>8} {'PSS':>8} {'private':>8} {'RSS added by model load':>24}")
+    for name, path in (('pickle', args.pickle), ('artifact', artifact)):
+        result = measure(path, args.workers)
+        print(f"{name:<10} {result['rss_mib']:>8.1f} {result['pss_mib']:>8.1f} "
+              f"{result['private_mib']:>8.1f} {result['model_rss_mib']:>24.1f}")
+
+
+if __name__ == '__main__':
+    main()
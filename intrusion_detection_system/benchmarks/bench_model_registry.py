@@ -0,0 +1,43 @@
+"""Requests/sec of /detection/api/predict with and without the model registry.
+
+"before" invalidates the registry ahead of every request, which reproduces the
+old behaviour of running joblib.load per call. "after" uses the shared model.
+
+    python benchmarks/bench_model_registry.py --requests 200
+"""
+import argparse
+import time
+
+from common import load_sample_records, login, make_app
+
+
+def run(app, records, n_requests, reload_every_request):
+    from app.services.model_registry import model_registry
+
+    client = login(app.test_client())
+    model_registry.get()
+    start = time.perf_counter()
+    for i in range(n_requests):
+        if reload_every_request:
+            model_registry.invalidate()
+        response = client.post('/detection/api/predict', json=records[i % len(records)])
+        assert response.status_code == 200, response.get_json()
+    return n_requests / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=200)
+    args = parser.parse_args()
+
+    app = make_app()
+    records = load_sample_records(limit=1000)
+    before = run(app, records, max(args.requests // 10, 5), reload_every_request=True)
+    after = run(app, records, args.requests, reload_every_request=False)
+    print(f'before (load per request): {before:8.1f} req/s')
+    print(f'after  (model registry):   {after:8.1f} req/s')
+    print(f'speedup: {after / before:.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+"""Scaling curve of the multi-process scoring engine from 1 to N workers.
+
+The rows of nsl_kdd_sample.csv are repeated up to --rows and scored with each
+worker count. Every run is checked against the single-process result so the
+output order is verified as well.
+
+    python benchmarks/bench_scoring_engine.py --rows 200000 --max-workers 8
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from common import SAMPLE_CSV, make_app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--max-workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--chunk-size', type=int, default=5000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    app = make_app()
+    from app.services.model_registry import model_registry
+    from app.services.scoring_engine import scoring_engine
+
+    loaded_model = model_registry.get()
+    sample = loaded_model.encoder.encode_frame(pd.read_csv(SAMPLE_CSV))
+    features = np.resize(sample, (args.rows, sample.shape[1]))
+    expected = loaded_model.predict_proba(features)
+
+    print(f'{args.rows:,} rows, chunk size {args.chunk_size}')
+    print(f"{'workers':>8} {'seconds':>9} {'rows/sec':>12} {'speedup':>8}")
+    baseline = None
+    for workers in range(1, args.max_workers + 1):
+        scoring_engine.configure(workers=workers, chunk_size=args.chunk_size, threshold=0)
+        scoring_engine.predict_proba(loaded_model, features[:args.chunk_size * workers])  # start the pool
+
+        timings = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            result = scoring_engine.predict_proba(loaded_model, features)
+            timings.append(time.perf_counter() - start)
+        np.testing.assert_allclose(result, expected)
+
+        seconds = min(timings)
+        baseline = baseline or seconds
+        print(f'{workers:>8} {seconds:>9.3f} {args.rows / seconds:>12,.0f} {baseline / seconds:>7.2f}x')
+    scoring_engine.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""The ASGI detection service against the Flask endpoint under gunicorn.
+
+Both servers run one worker process against their own temporary SQLite file,
+with write-behind on. Flask clients log in and send the session cookie; service
+clients send a bearer token created with `flask create-api-token`. The same
+single-record bodies are posted by 1, 10 and 100 keep-alive clients.
+
+    python benchmarks/bench_service.py --clients 1 10 100 --duration 10
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import http.client
+
+from bench_micro_batcher import drive, free_port, login, start_server
+from common import ROOT, load_sample_records
+
+
+def server_env(database_path, **settings):
+    return dict(os.environ, FLASK_CONFIG='production', DATABASE_URL=f'sqlite:///{database_path}',
+                PYTHONWARNINGS='ignore', **settings)
+
+
+def start_service(port, database_path, **settings):
+    env = server_env(database_path, **settings)
+    subprocess.run([sys.executable, '-m', 'flask', '--app', 'run.py', 'init-db'], cwd=ROOT, env=env,
+                   check=True, capture_output=True)
+    output = subprocess.run([sys.executable, '-m', 'flask', '--app', 'run.py', 'create-api-token', 'admin',
+                             '--name', 'bench'], cwd=ROOT, env=env, check=True, capture_output=True, text=True)
+    token = output.stdout.strip().splitlines()[-1]
+    server = subprocess.Popen([sys.executable, '-m', 'uvicorn', 'service:app', '--host', '127.0.0.1',
+                               '--port', str(port), '--workers', '1', '--log-level', 'warning', '--no-access-log'],
+                              cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 120
+    while time.monotonic() < deadline:
+        try:
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+            connection.request('GET', '/readyz')
+            if connection.getresponse().status == 200:
+                return server, token
+        except OSError:
+            pass
+        if server.poll() is not None:
+            raise RuntimeError('uvicorn exited during startup')
+        time.sleep(0.2)
+    server.kill()
+    raise RuntimeError('uvicorn did not become ready')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--clients', type=int, nargs='+', default=[1, 10, 100])
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--micro-batch', action='store_true', help='enable the micro-batcher in both servers')
+    parser.add_argument('--json', help='write the results to this file')
+    args = parser.parse_args()
+
+    bodies = [json.dumps(record) for record in load_sample_records(2000)]
+    settings = {'MICRO_BATCH_ENABLED': '1' if args.micro_batch else '0'}
+    results = {}
+    print(f"{'server':<8} {'clients':>7} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>6}")
+    for mode in ('flask', 'service'):
+        with tempfile.TemporaryDirectory() as tmp:
+            port = free_port()
+            database_path = os.path.join(tmp, 'bench.db')
+            if mode == 'flask':
+                server = start_server(port, max(args.clients), database_path, **settings)
+                headers, path = {'Cookie': login(port)}, '/detection/api/predict'
+            else:
+                server, token = start_service(port, database_path, **settings)
+                headers, path = {'Authorization': f'Bearer {token}'}, '/api/predict'
+            try:
+                drive(port, headers, bodies, 1, 1, path)  # warm up
+                for clients in args.clients:
+                    result = drive(port, headers, bodies, clients, args.duration, path)
+                    results[f'{mode}/{clients}'] = result
+                    print(f"{mode:<8} {clients:>7} {result['rps']:>8.0f} {result['p50_ms']:>8.1f} "
+                          f"{result['p95_ms']:>8.1f} {result['p99_ms']:>8.1f} {result['errors']:>6}")
+            finally:
+                server.terminate()
+                server.wait()
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""Cold start cost of the app, measured in fresh interpreter processes.
+
+Each run times importing the app package, create_app() against an empty
+SQLite file (with and without the database bootstrap), the first request and
+the model warm-up, and records which heavy libraries were imported by then.
+
+    python benchmarks/bench_startup.py --repeat 5
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import tempfile
+
+from common import ROOT
+
+HEAVY_MODULES = ('pandas', 'sklearn', 'joblib')
+
+PROBE = r'''
+import json, os, sys, time, warnings
+warnings.filterwarnings('ignore', category=UserWarning)
+bootstrap, database_path = sys.argv[1] == '1', sys.argv[2]
+timings = {}
+
+start = time.perf_counter()
+from app import create_app
+from config import TestingConfig, config
+timings['import_app'] = time.perf_counter() - start
+
+config['startup-bench'] = type('StartupBenchConfig', (TestingConfig,), {
+    'SQLALCHEMY_DATABASE_URI': f'sqlite:///{database_path}', 'DB_BOOTSTRAP_ON_STARTUP': bootstrap})
+start = time.perf_counter()
+app = create_app('startup-bench')
+timings['create_app'] = time.perf_counter() - start
+loaded = [name for name in HEAVY_MODULES if name in sys.modules]
+
+start = time.perf_counter()
+app.test_client().get('/healthz')
+timings['first_request'] = time.perf_counter() - start
+
+from app.services.model_registry import model_registry
+start = time.perf_counter()
+with app.app_context():
+    model_registry.warm_up()
+timings['model_warm_up'] = time.perf_counter() - start
+print(json.dumps({'timings': timings, 'heavy_modules_after_create_app': loaded}))
+'''
+
+
+def probe(bootstrap):
+    with tempfile.TemporaryDirectory(prefix='ids-startup-') as workdir:
+        code = f'HEAVY_MODULES = {HEAVY_MODULES!r}\n' + PROBE
+        output = subprocess.check_output(
+            [sys.executable, '-c', code, '1' if bootstrap else '0', f'{workdir}/startup.db'],
+            cwd=ROOT, text=True, stderr=subprocess.DEVNULL)
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def measure_startup(repeat=5):
+    """Seconds per phase for every run, plus the heavy modules seen at startup"""
+    samples, heavy = {}, set()
+    for bootstrap in (True, False):
+        suffix = '' if bootstrap else '_no_bootstrap'
+        for _ in range(repeat):
+            result = probe(bootstrap)
+            heavy.update(result['heavy_modules_after_create_app'])
+            for phase, seconds in result['timings'].items():
+                samples.setdefault(phase + suffix, []).append(seconds)
+    # The import and warm-up phases don't depend on the bootstrap setting
+    for phase in ('import_app', 'model_warm_up'):
+        samples[phase] += samples.pop(phase + '_no_bootstrap')
+    return samples, sorted(heavy)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    samples, heavy = measure_startup(args.repeat)
+    print(f"{'phase':<28} {'median ms':>10} {'max ms':>10}")
+    for phase, values in samples.items():
+        print(f'{phase:<28} {statistics.median(values) * 1000:>10.1f} {max(values) * 1000:>10.1f}')
+    print(f"Heavy modules imported by create_app(): {', '.join(heavy) or 'none'}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+"""Concurrent Detection write throughput against a SQLite file.
+
+Each worker process builds its own app, then inserts batches of detections
+through the DetectionWriter (synchronously, as one server worker flushing its
+queue would). The run is repeated with WAL + busy timeout (the default
+storage settings) and with the rollback journal and no busy timeout, which is
+how the app used to open the database.
+
+    python benchmarks/bench_storage.py --workers 1 2 4 8 --batches 100 --batch-size 50
+"""
+import argparse
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+from datetime import datetime
+
+from common import load_sample_records
+
+MODES = {
+    'wal': {'SQLITE_WAL': True, 'SQLITE_SYNCHRONOUS': 'NORMAL', 'SQLITE_BUSY_TIMEOUT_MS': 5000},
+    'legacy': {'SQLITE_WAL': False, 'SQLITE_SYNCHRONOUS': 'FULL', 'SQLITE_BUSY_TIMEOUT_MS': 0,
+               'SQLALCHEMY_ENGINE_OPTIONS': {'connect_args': {'timeout': 0}}},
+}
+
+
+def make_app(database_path, mode):
+    from app import create_app
+    from config import TestingConfig, config
+
+    settings = dict(MODES[mode], SQLALCHEMY_DATABASE_URI=f'sqlite:///{database_path}')
+    config['storage-bench'] = type('StorageBenchConfig', (TestingConfig,), settings)
+    return create_app('storage-bench')
+
+
+def worker(database_path, mode, batches, batch_size, ready, results):
+    from sqlalchemy.exc import OperationalError
+    from app import db
+    from app.services.detection_writer import detection_writer, make_detection_row
+
+    try:
+        app = make_app(database_path, mode)
+    finally:
+        # Start writing only once every worker has finished booting
+        ready.wait()
+    records = load_sample_records(batch_size)
+    written = errors = 0
+    with app.app_context():
+        began = time.perf_counter()
+        for _ in range(batches):
+            timestamp = datetime.utcnow()
+            rows = [make_detection_row(1, record, 'normal', 0.9, timestamp) for record in records]
+            try:
+                detection_writer.submit(rows)
+                written += len(rows)
+            except OperationalError:
+                db.session.rollback()
+                errors += 1
+        results.put((written, errors, time.perf_counter() - began))
+
+
+def run(mode, workers, batches, batch_size):
+    workdir = tempfile.mkdtemp(prefix='ids-storage-')
+    database_path = os.path.join(workdir, 'bench.db')
+    try:
+        # Create the schema and admin once, before the workers race for it
+        make_app(database_path, mode)
+        context = multiprocessing.get_context('spawn')
+        ready = context.Barrier(workers + 1)
+        results = context.Queue()
+        processes = [context.Process(target=worker, args=(database_path, mode, batches, batch_size, ready, results))
+                     for _ in range(workers)]
+        for process in processes:
+            process.start()
+        ready.wait()
+        began = time.perf_counter()
+        for process in processes:
+            process.join()
+        elapsed = time.perf_counter() - began
+        outcomes = []
+        while not results.empty():
+            outcomes.append(results.get())
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    written = sum(outcome[0] for outcome in outcomes)
+    errors = sum(outcome[1] for outcome in outcomes)
+    # A worker that crashed wrote nothing; count all of its batches as failed
+    errors += (workers - len(outcomes)) * batches
+    return written, errors, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--batches', type=int, default=100)
+    parser.add_argument('--batch-size', type=int, default=50)
+    parser.add_argument('--modes', nargs='+', choices=sorted(MODES), default=['legacy', 'wal'])
+    args = parser.parse_args()
+
+    print(f'{args.batches} batches of {args.batch_size} rows per worker')
+    print(f"{'mode':>7} {'workers':>8} {'rows':>8} {'failed batches':>14} {'seconds':>9} {'rows/sec':>10}")
+    for mode in args.modes:
+        for workers in args.workers:
+            written, errors, elapsed = run(mode, workers, args.batches, args.batch_size)
+            print(f'{mode:>7} {workers:>8} {written:>8} {errors:>14} {elapsed:>9.2f} {written / elapsed:>10.0f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,40 @@
+"""Shared helpers for the benchmark scripts"""
+import csv
+import os
+import sys
+import warnings
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+SAMPLE_CSV = os.path.join(ROOT, 'nsl_kdd_sample.csv')
+
+# The bundled pickle was produced by a newer scikit-learn
+warnings.filterwarnings('ignore', category=UserWarning)
+
+
+def load_sample_records(limit=None, path=SAMPLE_CSV):
+    """Read NSL-KDD rows as dicts with numeric fields converted"""
+    records = []
+    with open(path, newline='') as f:
+        for row in csv.DictReader(f):
+            row.pop('class', None)
+            for key, value in row.items():
+                if key not in ('protocol_type', 'service', 'flag'):
+                    row[key] = float(value)
+            records.append(row)
+            if limit and len(records) >= limit:
+                break
+    return records
+
+
+def make_app(config_name='testing'):
+    from app import create_app
+    return create_app(config_name)
+
+
+def login(client, username='admin', password='admin123'):
+    response = client.post('/login', data={'username': username, 'password': password})
+    assert response.status_code in (200, 302), response.status_code
+    return client
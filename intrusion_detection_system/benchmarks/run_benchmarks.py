@@ -0,0 +1,283 @@
+"""End-to-end performance benchmarks for the IDS.
+
+Runs against create_app('testing') with a temporary SQLite file and
+nsl_kdd_sample.csv as input, and writes a JSON report that can be compared
+between runs:
+
+    python benchmarks/run_benchmarks.py                       # full run
+    python benchmarks/run_benchmarks.py --quick               # smaller tables and fewer requests
+    python benchmarks/run_benchmarks.py --compare benchmarks/results/previous.json
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+
+from bench_startup import measure_startup
+from common import ROOT, load_sample_records, login
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+
+# Metrics where a larger value is better; everything else is a latency or size
+HIGHER_IS_BETTER = ('req_per_sec', 'records_per_sec')
+
+
+def percentiles(samples):
+    values = np.asarray(samples) * 1000
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {'p50_ms': round(p50, 3), 'p95_ms': round(p95, 3), 'p99_ms': round(p99, 3),
+            'mean_ms': round(values.mean(), 3), 'n': len(values)}
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def peak_rss_mb():
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    scale = 1 if sys.platform == 'darwin' else 1024
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale / 2 ** 20, 1)
+
+
+def environment():
+    import sklearn
+    try:
+        commit = subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'timestamp': datetime.utcnow().isoformat(),
+        'commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'numpy': np.__version__,
+        'sklearn': sklearn.__version__,
+    }
+
+
+def make_app(database_path):
+    from app import create_app
+    from config import TestingConfig, config
+
+    class BenchmarkConfig(TestingConfig):
+        SQLALCHEMY_DATABASE_URI = f'sqlite:///{database_path}'
+
+    config['benchmark'] = BenchmarkConfig
+    return create_app('benchmark')
+
+
+def bench_model_load(app, repeat):
+    from app.services.model_registry import model_registry
+
+    def cold_load():
+        model_registry.invalidate()
+        model_registry.get()
+
+    with app.app_context():
+        return percentiles(timed(cold_load, repeat))
+
+
+def bench_inference(app, records, repeat):
+    """In-process encode + predict_proba latency, without HTTP or DB"""
+    from app.services.model_registry import model_registry
+    from app.services.scoring import score_matrix
+
+    loaded_model = model_registry.get()
+    results = {}
+    for size in (1, 100, 10000):
+        batch = (records * (size // len(records) + 1))[:size]
+        runs = repeat if size < 10000 else max(repeat // 10, 3)
+        results[f'batch_{size}'] = percentiles(timed(
+            lambda: score_matrix(loaded_model, loaded_model.encoder.encode(batch)), runs))
+    return results
+
+
+def bench_predict_api(client, records, n_requests):
+    """Latency and throughput of /detection/api/predict, one request at a time"""
+    samples = []
+    start = time.perf_counter()
+    for i in range(n_requests):
+        sent = time.perf_counter()
+        response = client.post('/detection/api/predict', json=records[i % len(records)])
+        samples.append(time.perf_counter() - sent)
+        assert response.status_code == 200, response.get_json()
+    elapsed = time.perf_counter() - start
+    result = percentiles(samples)
+    result['req_per_sec'] = round(n_requests / elapsed, 1)
+    return result
+
+
+def bench_predict_batch_api(client, records, repeat):
+    results = {}
+    for size in (100, 1000, 10000):
+        batch = (records * (size // len(records) + 1))[:size]
+        runs = repeat if size < 10000 else max(repeat // 5, 3)
+
+        def call():
+            response = client.post('/detection/api/predict_batch', json=batch)
+            assert response.status_code == 200, response.get_json()
+
+        result = percentiles(timed(call, runs))
+        result['records_per_sec'] = round(size / (result['p50_ms'] / 1000), 1)
+        results[f'batch_{size}'] = result
+    return results
+
+
+def grow_detections(app, target_rows, user_id, chunk=50000):
+    """Insert synthetic detections until the table holds ``target_rows``"""
+    from datetime import timedelta
+    from app.models.detection import Detection
+    from app.services.detection_writer import detection_writer
+
+    rng = np.random.default_rng(0)
+    classes = np.array(['normal', 'dos', 'probe', 'r2l', 'u2r'])
+    with app.app_context():
+        existing = Detection.query.count()
+        start = datetime.utcnow() - timedelta(days=30)
+        while existing < target_rows:
+            n = min(chunk, target_rows - existing)
+            offsets = rng.integers(0, 30 * 86400, n).tolist()
+            predictions = classes[rng.choice(5, n, p=[0.6, 0.2, 0.1, 0.07, 0.03])].tolist()
+            rows = [{
+                'user_id': user_id, 'prediction': prediction, 'confidence': 0.9,
+                'timestamp': start + timedelta(seconds=offset), 'ip_address': '10.0.0.1',
+                'protocol': 'tcp', 'src_bytes': 100, 'dst_bytes': 200
+            } for prediction, offset in zip(predictions, offsets)]
+            detection_writer.submit(rows)
+            existing += n
+        return existing
+
+
+def bench_dashboards(app, client, table_sizes, repeat):
+    pages = {
+        'main_dashboard': '/dashboard',
+        'admin_dashboard': '/admin/dashboard',
+        'results_page': '/detection/results',
+        'results_page_filtered': '/detection/results?prediction=dos&protocol=tcp',
+        'detections_api': '/detection/api/detections?limit=100',
+    }
+    results = {}
+    for size in table_sizes:
+        start = time.perf_counter()
+        rows = grow_detections(app, size, user_id=1)
+        fill_seconds = time.perf_counter() - start
+        entry = {'rows': rows, 'insert_seconds': round(fill_seconds, 2)}
+        for name, url in pages.items():
+            def call():
+                response = client.get(url)
+                assert response.status_code == 200, (url, response.status_code)
+            call()
+            entry[name] = percentiles(timed(call, repeat))
+        results[f'rows_{size}'] = entry
+        print(f'  {rows:>9,} rows: main {entry["main_dashboard"]["p50_ms"]} ms, '
+              f'admin {entry["admin_dashboard"]["p50_ms"]} ms', file=sys.stderr)
+    return results
+
+
+def flatten(report, prefix=''):
+    values = {}
+    for key, value in report.items():
+        name = f'{prefix}{key}'
+        if isinstance(value, dict):
+            values.update(flatten(value, f'{name}.'))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            values[name] = value
+    return values
+
+
+def compare(current, previous_path, threshold):
+    """Print metrics that moved by more than ``threshold`` percent"""
+    with open(previous_path) as f:
+        previous = json.load(f)
+    old, new = flatten(previous['results']), flatten(current['results'])
+    regressions = 0
+    print(f"\nComparison with {previous_path} ({previous['environment'].get('commit')})")
+    for name in sorted(set(old) & set(new)):
+        if not name.endswith(('p50_ms', 'p95_ms', 'p99_ms', 'mean_ms', 'req_per_sec', 'records_per_sec', 'peak_rss_mb')):
+            continue
+        if not old[name]:
+            continue
+        change = (new[name] - old[name]) / old[name] * 100
+        worse = -change if name.endswith(HIGHER_IS_BETTER) else change
+        if abs(change) >= threshold:
+            marker = 'REGRESSION' if worse > 0 else 'improved'
+            regressions += worse > 0
+            print(f'  {marker:<10} {name:<60} {old[name]:>12} -> {new[name]:>12} ({change:+.1f}%)')
+    print(f'{regressions} regression(s) over {threshold}%')
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--quick', action='store_true', help='small tables and fewer iterations')
+    parser.add_argument('--table-sizes', help='comma separated Detection table sizes for dashboard latency')
+    parser.add_argument('--requests', type=int, help='requests for the /api/predict throughput run')
+    parser.add_argument('--repeat', type=int, help='iterations per latency measurement')
+    parser.add_argument('--output', help='report path (default: benchmarks/results/<timestamp>.json)')
+    parser.add_argument('--compare', help='previous report to compare against')
+    parser.add_argument('--threshold', type=float, default=10.0, help='percent change reported by --compare')
+    args = parser.parse_args()
+
+    table_sizes = [int(size) for size in (args.table_sizes or ('10000,50000' if args.quick else '10000,100000,1000000')).split(',')]
+    n_requests = args.requests or (200 if args.quick else 1000)
+    repeat = args.repeat or (20 if args.quick else 100)
+
+    workdir = tempfile.mkdtemp(prefix='ids-bench-')
+    try:
+        records = load_sample_records(limit=2000)
+        results = {}
+
+        start = time.perf_counter()
+        app = make_app(os.path.join(workdir, 'bench.db'))
+        results['app_startup_ms'] = round((time.perf_counter() - start) * 1000, 1)
+        print('cold start', file=sys.stderr)
+        startup, heavy_modules = measure_startup(3 if args.quick else 5)
+        results['cold_start'] = {phase: percentiles(samples) for phase, samples in startup.items()}
+        results['cold_start']['heavy_modules'] = heavy_modules
+        client = login(app.test_client())
+
+        print('model load', file=sys.stderr)
+        results['model_load'] = bench_model_load(app, max(repeat // 20, 3))
+        results['inference'] = bench_inference(app, records, repeat)
+        print('predict api', file=sys.stderr)
+        results['predict_api'] = bench_predict_api(client, records, n_requests)
+        results['predict_batch_api'] = bench_predict_batch_api(client, records, max(repeat // 5, 3))
+        print('dashboards', file=sys.stderr)
+        gc.collect()
+        results['dashboards'] = bench_dashboards(app, client, table_sizes, max(repeat // 5, 3))
+        results['peak_rss_mb'] = peak_rss_mb()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {'environment': environment(), 'config': {
+        'table_sizes': table_sizes, 'requests': n_requests, 'repeat': repeat}, 'results': results}
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{datetime.utcnow():%Y%m%dT%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(json.dumps(results, indent=2))
+    print(f'Report written to {output}', file=sys.stderr)
+
+    if args.compare:
+        sys.exit(1 if compare(report, args.compare, args.threshold) else 0)
+
+
+if __name__ == '__main__':
+    main()
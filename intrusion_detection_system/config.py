@@ -2,17 +2,164 @@ import os
 
 class Config:
     SECRET_KEY = 'your-secret-key-here-change-in-production'
-    SQLALCHEMY_DATABASE_URI = 'sqlite:///database.db'
+    SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL', 'sqlite:///database.db')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Create tables, run migrations and the admin bootstrap in create_app();
+    # turn off to skip them on every worker boot and run `flask init-db` on deploy
+    DB_BOOTSTRAP_ON_STARTUP = os.environ.get('DB_BOOTSTRAP_ON_STARTUP', '1') != '0'
+
+    # Storage tuning, see app/storage.py
+    # SQLite files: WAL journal so readers don't block the writer, and a busy
+    # timeout so concurrent workers wait for the write lock instead of failing
+    SQLITE_WAL = True
+    SQLITE_SYNCHRONOUS = 'NORMAL'
+    SQLITE_BUSY_TIMEOUT_MS = 5000
+    # Server databases (DATABASE_URL=postgresql://...): connection pool per process
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 10))
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 20))
+    DB_POOL_TIMEOUT = 30
+    DB_POOL_RECYCLE = 1800
+    DB_POOL_PRE_PING = True
+
+    # Model registry
+    # A .pkl file, or a directory written by `flask export-model`
+    MODEL_PATH = os.environ.get('MODEL_PATH') or os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), 'app', 'static', 'models', 'intrusion_detection_model.pkl')
+    # Map artifact arrays read-only so worker processes share them in the page cache
+    MODEL_MMAP = True
+    MODEL_RELOAD_CHECK_INTERVAL = 2.0
+    # Load the model and score one row inside create_app(); with gunicorn's
+    # preload_app the master does this once and workers share it after fork
+    MODEL_PRELOAD = False
+    # Otherwise warm the model on a background thread at startup, see /readyz
+    MODEL_WARMUP_BACKGROUND = False
+    # Threads per predict call inside the forest; keep at 1 under a web server
+    MODEL_N_JOBS = 1
+    # 'sklearn', 'flat' (trees flattened into NumPy arrays, see app/services/flat_forest.py)
+    # or 'auto' (flat up to FLAT_FOREST_MAX_BATCH rows, sklearn above)
+    INFERENCE_BACKEND = os.environ.get('INFERENCE_BACKEND', 'sklearn')
+    FLAT_FOREST_MAX_BATCH = 1000
+
+    # Batch scoring
+    PREDICT_BATCH_MAX_RECORDS = 10000
+    CSV_CHUNK_SIZE = 10000
+    SIMULATE_MAX_COUNT = 10000
+
+    # Raw connection events: window sizes of the derived NSL-KDD features
+    FLOW_TIME_WINDOW = 2.0
+    FLOW_HOST_WINDOW = 100
+    FLOW_MAX_STREAMS = 1000
+
+    # Multi-process scoring of large batches; 0 disables, -1 uses every core
+    SCORING_WORKERS = 0
+    SCORING_CHUNK_SIZE = 5000
+    SCORING_PARALLEL_THRESHOLD = 10000
+    SCORING_MP_CONTEXT = 'spawn'
+
+    # Coalesce concurrent /api/predict calls into one predict_proba call. A
+    # batch takes the rows that queued up while the previous one was scored,
+    # plus any arriving within MICRO_BATCH_MAX_WAIT_MS (worth raising when
+    # several cores feed the queue in parallel)
+    MICRO_BATCH_ENABLED = os.environ.get('MICRO_BATCH_ENABLED', '0') == '1'
+    MICRO_BATCH_MAX_WAIT_MS = float(os.environ.get('MICRO_BATCH_MAX_WAIT_MS', 0))
+    MICRO_BATCH_MAX_SIZE = int(os.environ.get('MICRO_BATCH_MAX_SIZE', 64))
+    MICRO_BATCH_TIMEOUT = 30.0
+
+    # Cache of class probabilities for repeated identical feature vectors
+    PREDICTION_CACHE_ENABLED = False
+    PREDICTION_CACHE_MAX_BYTES = 16 * 1024 * 1024
+    PREDICTION_CACHE_TTL = 300
+
+    # Write-behind persistence of detections
+    DETECTION_WRITE_BEHIND = True
+    DETECTION_FLUSH_ROWS = 500
+    DETECTION_FLUSH_INTERVAL_MS = 200
+    DETECTION_QUEUE_MAXSIZE = 50000
+    DETECTION_ENQUEUE_TIMEOUT = 1.0
+    # Failed flushes are retried with exponential backoff, then written to
+    # DETECTION_SPILL_DIR (instance/spill) for `flask replay-detections`
+    DETECTION_WRITE_RETRIES = 3
+    DETECTION_RETRY_BACKOFF = 0.1
+    DETECTION_SPILL_DIR = os.environ.get('DETECTION_SPILL_DIR')
+
+    # Attack detections are also folded into incidents per (source IP, class,
+    # protocol); an incident stays open while attacks keep arriving within
+    # INCIDENT_WINDOW_SECONDS. Turn off INCIDENT_STORE_RAW_ATTACKS to keep only
+    # the incidents and the rollup counters for attacks, not one row each
+    INCIDENTS_ENABLED = True
+    INCIDENT_WINDOW_SECONDS = 300
+    INCIDENT_MAX_OPEN = 10000
+    INCIDENT_STORE_RAW_ATTACKS = os.environ.get('INCIDENT_STORE_RAW_ATTACKS', '1') != '0'
+
+    # Time buckets kept in the detection_rollup table next to the all-time counts
+    ROLLUP_BUCKETS = ('minute', 'hour', 'day')
+
+    # Live detection push channel (Socket.IO namespace /live)
+    SOCKETIO_ASYNC_MODE = 'threading'
+    # e.g. redis://localhost:6379/0; needed for more than one server worker,
+    # which also makes browsers connect over WebSocket only
+    SOCKETIO_MESSAGE_QUEUE = os.environ.get('SOCKETIO_MESSAGE_QUEUE')
+    LIVE_STREAM_INTERVAL = 3.0
+    LIVE_STREAM_BATCH = 5
+    # Traffic simulator profile for the stream, e.g. 'mixed'; None for the plain demo traffic
+    LIVE_STREAM_PROFILE = None
+    # Ticks buffered per client while its previous message is unacknowledged
+    LIVE_STREAM_CLIENT_BUFFER = 5
+    # Store each tick in the history of every subscribed user; off keeps the stream view-only
+    LIVE_STREAM_PERSIST = True
+
+    # Detection history paging
+    RESULTS_PAGE_SIZE = 50
+    API_MAX_PAGE_SIZE = 1000
+
+    # Retention: `flask archive-detections` moves detections older than
+    # RETENTION_DAYS into per-day files under ARCHIVE_DIR (instance/archive
+    # by default); 'auto' writes Parquet when pyarrow is installed, else CSV
+    RETENTION_DAYS = 90
+    ARCHIVE_DIR = os.environ.get('ARCHIVE_DIR')
+    ARCHIVE_FORMAT = 'auto'
+    ARCHIVE_BATCH_SIZE = 50000
+
+    # Deleting a user with more detections than this runs as a background job
+    # that deletes USER_DELETE_CHUNK_SIZE rows per transaction
+    USER_DELETE_SYNC_MAX = 10000
+    USER_DELETE_CHUNK_SIZE = 5000
+
+    # Users behind Flask-Login sessions are cached per process; entries older
+    # than USER_CACHE_TTL seconds are revalidated against the user's version
+    USER_CACHE_ENABLED = True
+    USER_CACHE_TTL = 10
+    USER_CACHE_MAX_ENTRIES = 10000
+
+    # Detection service for sensors (service.py, ASGI): bearer API tokens are
+    # cached for API_TOKEN_CACHE_TTL seconds, inference runs on a bounded pool
+    API_TOKEN_CACHE_TTL = 60
+    SERVICE_INFERENCE_THREADS = int(os.environ.get('SERVICE_INFERENCE_THREADS', 4))
+    SERVICE_MAX_PENDING = int(os.environ.get('SERVICE_MAX_PENDING', 256))
+    SERVICE_MAX_BODY_BYTES = 64 * 1024
+
+    # Instrumentation: /metrics requires this bearer token when set and is
+    # limited to logged-in admins otherwise (the ASGI service needs the token),
+    # admins can send X-Profile: 1 to get a cProfile summary of an API call
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+    PROFILING_ENABLED = True
+    PROFILE_TOP_FUNCTIONS = 30
 
 class DevelopmentConfig(Config):
     DEBUG = True
 
 class ProductionConfig(Config):
     DEBUG = False
+    MODEL_PRELOAD = True
+
+class TestingConfig(Config):
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = 'sqlite://'
+    DETECTION_WRITE_BEHIND = False
 
 config = {
     'development': DevelopmentConfig,
     'production': ProductionConfig,
+    'testing': TestingConfig,
     'default': DevelopmentConfig
 }
\ No newline at end of file
@@ -0,0 +1,36 @@
+"""Gunicorn settings: gunicorn -c gunicorn.conf.py run:app
+
+The app, and with ProductionConfig the model, is loaded once in the master
+before the workers fork, so every worker shares the same model pages
+copy-on-write and boots without importing or unpickling anything.
+"""
+import gc
+import multiprocessing
+import os
+
+os.environ.setdefault('FLASK_CONFIG', 'production')
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:5000')
+# The Socket.IO live stream keeps its clients in the worker's memory, so
+# several workers need SOCKETIO_MESSAGE_QUEUE; without one a single worker
+# (with threads) serves everything
+default_workers = multiprocessing.cpu_count() if os.environ.get('SOCKETIO_MESSAGE_QUEUE') else 1
+workers = int(os.environ.get('GUNICORN_WORKERS', default_workers))
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+preload_app = True
+timeout = 60
+
+
+def when_ready(server):
+    # Objects created so far (the model, encoder tables, modules) are moved out
+    # of the collector's reach so its passes don't write to the shared pages
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    # Pooled connections opened by the master must not be shared with workers
+    from app import db
+    from run import app
+    with app.app_context():
+        db.engine.dispose(close=False)
@@ -0,0 +1,100 @@
+"""Drive the predict endpoints of a running server at a target request rate.
+
+    python loadgen.py --rate 200 --duration 30 --concurrency 16
+    python loadgen.py --endpoint predict_batch --batch-size 1000 --rate 5 --profile dos_burst
+"""
+import argparse
+import http.cookiejar
+import json
+import threading
+import time
+import urllib.parse
+import urllib.request
+
+import numpy as np
+
+from app.services.traffic_simulator import PROFILES, TrafficSimulator
+
+
+def login(base_url, username, password):
+    jar = http.cookiejar.CookieJar()
+    opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(jar))
+    data = urllib.parse.urlencode({'username': username, 'password': password}).encode()
+    opener.open(f'{base_url}/login', data)
+    if not any(cookie.name == 'session' for cookie in jar):
+        raise SystemExit('Login failed')
+    return opener
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Synthetic load generator for the detection API')
+    parser.add_argument('--url', default='http://127.0.0.1:5000')
+    parser.add_argument('--username', default='admin')
+    parser.add_argument('--password', default='admin123')
+    parser.add_argument('--endpoint', choices=['predict', 'predict_batch'], default='predict')
+    parser.add_argument('--batch-size', type=int, default=100, help='records per predict_batch call')
+    parser.add_argument('--rate', type=float, default=50, help='target requests per second')
+    parser.add_argument('--duration', type=float, default=10, help='seconds to run')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--profile', choices=list(PROFILES), default='mixed')
+    parser.add_argument('--seed', type=int)
+    args = parser.parse_args()
+
+    opener = login(args.url, args.username, args.password)
+    url = f'{args.url}/detection/api/{args.endpoint}'
+    per_request = 1 if args.endpoint == 'predict' else args.batch_size
+    total = int(args.rate * args.duration)
+
+    # Pre-generate the payloads so the generator itself is not the bottleneck
+    samples = TrafficSimulator(args.seed).samples(min(total * per_request, 100000), args.profile)
+    bodies = []
+    for i in range(0, len(samples), per_request):
+        chunk = samples[i:i + per_request]
+        bodies.append(json.dumps(chunk[0] if per_request == 1 else chunk).encode())
+
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+    next_index = iter(range(total))
+    start = time.perf_counter()
+
+    def worker():
+        while True:
+            with lock:
+                i = next(next_index, None)
+            if i is None:
+                return
+            # Open-loop schedule: request i is due at start + i / rate
+            delay = start + i / args.rate - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            request = urllib.request.Request(url, bodies[i % len(bodies)], {'Content-Type': 'application/json'})
+            sent = time.perf_counter()
+            try:
+                opener.open(request).read()
+                elapsed = time.perf_counter() - sent
+                with lock:
+                    latencies.append(elapsed)
+            except Exception as e:
+                with lock:
+                    errors.append(str(e))
+
+    threads = [threading.Thread(target=worker) for _ in range(args.concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    done = len(latencies)
+    print(f'{done} ok, {len(errors)} errors in {elapsed:.1f}s')
+    print(f'achieved {done / elapsed:.1f} req/s ({done * per_request / elapsed:.0f} records/s), target {args.rate} req/s')
+    if latencies:
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) * 1000
+        print(f'latency p50 {p50:.1f} ms  p95 {p95:.1f} ms  p99 {p99:.1f} ms')
+    if errors:
+        print(f'first error: {errors[0]}')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,7 +1,7 @@
-from app import create_app
+from app import create_app, socketio
 import os
 
-app = create_app()
+app = create_app(os.environ.get('FLASK_CONFIG', 'development'))
 
 if __name__ == '__main__':
-    app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
+    socketio.run(app, debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
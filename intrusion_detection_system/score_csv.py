@@ -0,0 +1,65 @@
+"""Score an NSL-KDD style CSV export in fixed-size chunks.
+
+    python score_csv.py capture.csv --output scored.csv
+    python score_csv.py capture.csv --user analyst --chunk-size 50000
+"""
+import argparse
+import sys
+
+from app import create_app
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Stream a CSV through the intrusion detection model')
+    parser.add_argument('path', help='CSV file with the 41 NSL-KDD feature columns')
+    parser.add_argument('--output', help='write prediction/confidence columns to this CSV')
+    parser.add_argument('--user', help='store detections in the database under this username')
+    parser.add_argument('--chunk-size', type=int, help='rows per chunk (default: CSV_CHUNK_SIZE)')
+    parser.add_argument('--workers', type=int, help='scoring processes, -1 for every core (default: SCORING_WORKERS)')
+    parser.add_argument('--config', default='development', help='configuration name from config.py')
+    args = parser.parse_args()
+
+    if not args.output and not args.user:
+        parser.error('nothing to do, pass --output and/or --user')
+
+    app = create_app(args.config)
+    with app.app_context():
+        from app.models.user import User
+        from app.services.csv_ingest import ingest_csv
+        from app.services.detection_writer import detection_writer
+        from app.services.model_registry import model_registry
+        from app.services.scoring_engine import scoring_engine
+
+        if args.workers is not None:
+            scoring_engine.configure(workers=args.workers)
+
+        user_id = None
+        if args.user:
+            user = User.query.filter_by(username=args.user).first()
+            if not user:
+                parser.error(f'unknown user {args.user}')
+            user_id = user.id
+
+        def progress(rows, rate):
+            print(f'\r{rows:>12,} rows  {rate:>10,.0f} rows/sec', end='', file=sys.stderr, flush=True)
+
+        output = open(args.output, 'w', newline='') if args.output else None
+        try:
+            report = ingest_csv(args.path, model_registry.get(),
+                                chunk_size=args.chunk_size or app.config['CSV_CHUNK_SIZE'],
+                                user_id=user_id, writer=detection_writer,
+                                output=output, progress=progress)
+        finally:
+            if output:
+                output.close()
+        detection_writer.stop()
+        scoring_engine.shutdown()
+
+    print(file=sys.stderr)
+    print(f"Scored {report['rows']:,} rows in {report['seconds']}s ({report['rows_per_sec']:,.0f} rows/sec)")
+    for label, count in sorted(report['summary'].items()):
+        print(f'  {label:<8} {count:>12,}')
+
+
+if __name__ == '__main__':
+    main()
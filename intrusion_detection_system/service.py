@@ -0,0 +1,13 @@
+"""Detection service for sensors, an ASGI app (see app/asgi.py).
+
+    flask --app run.py create-api-token <username>
+    uvicorn service:app --host 0.0.0.0 --port 8000 --workers 2
+"""
+from app.asgi import create_service
+import os
+
+app = create_service(os.environ.get('FLASK_CONFIG', 'production'))
+
+if __name__ == '__main__':
+    import uvicorn
+    uvicorn.run(app, host=os.environ.get('SERVICE_HOST', '0.0.0.0'), port=int(os.environ.get('SERVICE_PORT', 8000)))
@@ -0,0 +1,32 @@
+import os
+import sys
+import warnings
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+# The bundled pickle was produced by a newer scikit-learn
+warnings.filterwarnings('ignore', category=UserWarning)
+
+SAMPLE_CSV = os.path.join(ROOT, 'nsl_kdd_sample.csv')
+
+
+@pytest.fixture
+def make_app(tmp_path):
+    """Build an app on a temporary SQLite file with config overrides"""
+    from app import create_app
+    from config import TestingConfig, config
+
+    def factory(**settings):
+        settings.setdefault('SQLALCHEMY_DATABASE_URI', f'sqlite:///{tmp_path / "test.db"}')
+        config['pytest'] = type('PytestConfig', (TestingConfig,), settings)
+        return create_app('pytest')
+
+    yield factory
+    from app.services.detection_writer import detection_writer
+    from app.services.incidents import incident_aggregator
+    detection_writer.stop()
+    incident_aggregator.forget()
@@ -0,0 +1,87 @@
+import os
+from datetime import datetime, timedelta
+
+from app import db
+from app.models.detection import Detection
+from app.services.archive import (archive_detections, compact_archive, list_partitions, read_archive,
+                                  write_partition, _read_day)
+
+
+def add_detections(days_ago, count):
+    timestamp = datetime.utcnow() - timedelta(days=days_ago)
+    db.session.add_all([Detection(user_id=1, prediction='normal', confidence=0.9, ip_address='10.0.0.1',
+                                  protocol='tcp', timestamp=timestamp + timedelta(seconds=i)) for i in range(count)])
+    db.session.commit()
+
+
+def test_rerun_after_a_crash_before_the_delete_does_not_duplicate(make_app, tmp_path):
+    app = make_app(ARCHIVE_DIR=str(tmp_path / 'archive'), ARCHIVE_FORMAT='csv')
+    with app.app_context():
+        add_detections(100, 5)
+        rows = [{column.key: getattr(d, column.key) for column in Detection.__table__.columns}
+                for d in Detection.query.all()]
+        archive_detections(retention_days=90)
+        # As if the run had stopped after renaming the file but before committing the DELETE
+        db.session.execute(Detection.__table__.insert(), rows)
+        db.session.commit()
+
+        summary = archive_detections(retention_days=90)
+        assert summary['rows'] == 0
+        assert Detection.query.count() == 0
+        assert len(list(read_archive())) == 5
+
+
+
+def test_archive_visits_only_days_with_rows_and_keeps_new_ones(make_app, tmp_path):
+    app = make_app(ARCHIVE_DIR=str(tmp_path / 'archive'), ARCHIVE_FORMAT='csv')
+    with app.app_context():
+        add_detections(300, 2)
+        add_detections(100, 2)
+        assert archive_detections(retention_days=90)['days'] == 2
+        # A later row of an archived day goes into a new part, not into the deleted set
+        add_detections(100, 1)
+        summary = archive_detections(retention_days=90)
+        assert (summary['days'], summary['rows']) == (1, 1)
+        assert len(list_partitions()) == 3
+        assert len(list(read_archive())) == 5
+
+def test_interrupted_compaction_keeps_each_row_once(make_app, tmp_path):
+    app = make_app(ARCHIVE_DIR=str(tmp_path / 'archive'), ARCHIVE_FORMAT='csv')
+    with app.app_context():
+        add_detections(100, 3)
+        archive_detections(retention_days=90)
+        add_detections(100, 2)
+        archive_detections(retention_days=90)
+        partitions = list_partitions()
+        assert len(partitions) == 2
+
+        # Merged part 0 is in place but part 1 was not removed yet
+        write_partition(partitions[0].path, _read_day(partitions), 'csv')
+        assert len(list(read_archive())) == 5
+
+        assert compact_archive('csv') == 1
+        assert [os.path.basename(p.path) for p in list_partitions()] == [os.path.basename(partitions[0].path)]
+        assert len(list(read_archive())) == 5
+
+
+def test_purging_a_user_removes_their_archived_rows(make_app, tmp_path):
+    from app.models.user import User
+    from app.services.user_deletion import purge_user
+
+    app = make_app(ARCHIVE_DIR=str(tmp_path / 'archive'), ARCHIVE_FORMAT='csv')
+    with app.app_context():
+        user = User(username='analyst', email='analyst@example.com', role='User')
+        user.set_password('analyst123')
+        db.session.add(user)
+        db.session.commit()
+        add_detections(100, 3)
+        add_detections(110, 1)
+        Detection.query.update({'user_id': user.id})
+        add_detections(100, 2)
+        archive_detections(retention_days=90)
+        assert len(list_partitions()) == 2
+
+        assert purge_user(user.id) == 4
+        assert [row.user_id for row in read_archive()] == [1, 1]
+        # The day that only held the user's rows is gone
+        assert len(list_partitions()) == 1
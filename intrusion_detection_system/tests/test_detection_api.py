@@ -0,0 +1,60 @@
+import pytest
+
+from app.models.detection import Detection
+
+pytestmark = pytest.mark.filterwarnings('ignore::UserWarning')
+
+
+@pytest.fixture
+def client(make_app):
+    app = make_app()
+    client = app.test_client()
+    client.post('/login', data={'username': 'admin', 'password': 'admin123'})
+    with app.app_context():
+        yield client
+
+
+def test_predict_batch_rejects_a_bad_record_before_scoring(client):
+    records = [{'protocol_type': 'tcp', 'src_bytes': 10}, {'protocol_type': 'tcp', 'src_bytes': [1]}]
+    response = client.post('/detection/api/predict_batch', json=records)
+    assert response.status_code == 400
+    assert response.get_json()['error'] == 'Record 1: src_bytes must be a string, number or null'
+
+    response = client.post('/detection/api/predict_batch', json=[{'src_ip': 7}])
+    assert response.status_code == 400
+    assert response.get_json()['error'] == 'Record 0: src_ip must be a string'
+    assert Detection.query.count() == 0
+
+
+def test_predict_batch_scores_unparseable_numbers_as_zero(client):
+    response = client.post('/detection/api/predict_batch', json=[{'src_bytes': 'abc', 'dst_bytes': '1e3'}])
+    assert response.status_code == 200
+    detection = Detection.query.one()
+    assert (detection.src_bytes, detection.dst_bytes) == (0, 1000)
+
+
+def test_predict_flows_rejects_a_bad_event_without_advancing_the_stream(client):
+    from app.services.flow_features import flow_streams
+
+    flow_streams.reset()
+    events = [{'timestamp': 100.0 + i, 'src_ip': '10.0.0.1', 'dst_ip': '10.0.0.2', 'dst_port': 80} for i in range(3)]
+    assert client.post('/detection/api/predict_flows', json=events[:1]).status_code == 200
+    stream = next(iter(flow_streams._streams.values()))
+    before = stream.stats()
+
+    response = client.post('/detection/api/predict_flows', json=[events[1], {'timestamp': 'soon'}, events[2]])
+    assert response.status_code == 400
+    assert 'event 1: timestamp must be a number' in response.get_json()['error']
+    assert stream.stats() == before
+
+
+@pytest.mark.parametrize('profile', ['flood', [1], {'x': 1}, {'dos': -1, 'normal': 1}, {'dos': 0}, {'dos': True}])
+def test_simulate_rejects_bad_profiles(client, profile):
+    response = client.post('/detection/api/simulate', json={'count': 3, 'profile': profile})
+    assert response.status_code == 400
+
+
+def test_simulate_accepts_a_custom_mix(client):
+    response = client.post('/detection/api/simulate', json={'count': 3, 'seed': 1, 'profile': {'dos': 1, 'normal': 0}})
+    assert response.status_code == 200
+    assert all(sample['flag'] == 'S0' for sample in response.get_json()['samples'])
@@ -0,0 +1,109 @@
+import threading
+from datetime import datetime
+
+import pytest
+
+from app.models.detection import Detection
+from app.services.detection_writer import WriterQueueFull, detection_writer, make_detection_row, replay_spilled
+
+
+def rows(n, prediction='normal'):
+    return [{'user_id': 1, 'prediction': prediction, 'confidence': 0.9, 'timestamp': datetime(2024, 1, 1),
+             'ip_address': '10.0.0.1', 'protocol': 'tcp', 'src_bytes': i, 'dst_bytes': 0} for i in range(n)]
+
+
+@pytest.fixture
+def write_behind(make_app, tmp_path):
+    return make_app(DETECTION_WRITE_BEHIND=True, DETECTION_QUEUE_MAXSIZE=5, DETECTION_ENQUEUE_TIMEOUT=0.05,
+                    DETECTION_FLUSH_INTERVAL_MS=10, DETECTION_RETRY_BACKOFF=0.001,
+                    DETECTION_SPILL_DIR=str(tmp_path / 'spill'))
+
+
+def test_queue_full_rejects_the_whole_batch(write_behind, monkeypatch):
+    release = threading.Event()
+    write_batch = detection_writer._write_batch
+
+    def blocked(batch):
+        release.wait(5)
+        write_batch(batch)
+
+    monkeypatch.setattr(detection_writer, '_write_batch', blocked)
+    with write_behind.app_context():
+        detection_writer.submit(rows(3))
+        with pytest.raises(WriterQueueFull):
+            detection_writer.submit(rows(3))
+        assert detection_writer.pending() == 3
+
+        release.set()
+        detection_writer.flush()
+        detection_writer.submit(rows(3))
+        detection_writer.flush()
+        assert Detection.query.count() == 6
+
+
+def test_failed_flush_is_retried(write_behind, monkeypatch):
+    insert = detection_writer._insert
+    failures = iter([True, True])
+
+    def flaky(batch):
+        if next(failures, False):
+            raise RuntimeError('database is locked')
+        insert(batch)
+
+    monkeypatch.setattr(detection_writer, '_insert', flaky)
+    retried = detection_writer.retried
+    with write_behind.app_context():
+        detection_writer.submit(rows(4))
+        detection_writer.flush()
+        assert Detection.query.count() == 4
+    assert detection_writer.retried == retried + 2
+
+
+def test_batch_is_spilled_after_retries_and_replayed(write_behind, monkeypatch):
+    insert = detection_writer._insert
+
+    def broken(batch):
+        raise RuntimeError('disk I/O error')
+
+    monkeypatch.setattr(detection_writer, '_insert', broken)
+    spilled = detection_writer.spilled
+    with write_behind.app_context():
+        detection_writer.submit(rows(4))
+        detection_writer.flush()
+        assert Detection.query.count() == 0
+        assert detection_writer.spilled == spilled + 4
+
+        monkeypatch.setattr(detection_writer, '_insert', insert)
+        assert replay_spilled() == 4
+        assert Detection.query.count() == 4
+        assert replay_spilled() == 0
+
+
+def test_make_detection_row_coerces_byte_counts_like_the_encoder():
+    row = make_detection_row(1, {'src_bytes': 'abc', 'dst_bytes': '1e3'}, 'normal', 0.5, datetime(2024, 1, 1))
+    assert (row['src_bytes'], row['dst_bytes']) == (0, 1000)
+    row = make_detection_row(1, {'src_bytes': 'nan', 'dst_bytes': None}, 'normal', 0.5, datetime(2024, 1, 1))
+    assert (row['src_bytes'], row['dst_bytes']) == (0, 0)
+
+
+def test_purge_waits_for_the_users_queued_detections(make_app, tmp_path):
+    from app import db
+    from app.models.user import User
+    from app.services.rollups import get_counts, get_summary
+    from app.services.user_deletion import purge_user
+
+    app = make_app(DETECTION_WRITE_BEHIND=True, DETECTION_FLUSH_INTERVAL_MS=300,
+                   DETECTION_SPILL_DIR=str(tmp_path / 'spill'))
+    with app.app_context():
+        user = User(username='analyst', email='analyst@example.com', role='User')
+        user.set_password('analyst123')
+        db.session.add(user)
+        db.session.commit()
+        user_id = user.id
+        detection_writer.submit([dict(row, user_id=user_id) for row in rows(4)])
+
+        purge_user(user_id)
+        detection_writer.flush()
+        assert Detection.query.filter_by(user_id=user_id).count() == 0
+        assert get_counts(user_id) == {}
+        assert get_summary()['total_detections'] == 0
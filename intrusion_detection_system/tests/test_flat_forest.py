@@ -0,0 +1,56 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import SAMPLE_CSV
+
+# The bundled pickle was produced by a newer scikit-learn
+pytestmark = pytest.mark.filterwarnings('ignore::UserWarning')
+
+
+@pytest.fixture(scope='module')
+def forests():
+    from app import create_app
+    from app.services.flat_forest import FlatForest
+    from app.services.model_registry import model_registry
+
+    create_app('testing')
+    loaded_model = model_registry.get()
+    forest = loaded_model.model
+    flat_forest = FlatForest.from_estimator(forest)
+    sample = loaded_model.encoder.encode_frame(pd.read_csv(SAMPLE_CSV))
+    return forest, flat_forest, sample
+
+
+def assert_parity(forest, flat_forest, features):
+    assert np.allclose(flat_forest.predict_proba(features), forest.predict_proba(features), rtol=0, atol=1e-9)
+    assert np.array_equal(flat_forest.predict(features), forest.predict(features))
+
+
+def test_sample_csv(forests):
+    forest, flat_forest, sample = forests
+    assert_parity(forest, flat_forest, sample)
+
+
+def test_single_row(forests):
+    forest, flat_forest, sample = forests
+    assert_parity(forest, flat_forest, sample[:1])
+
+
+def test_values_on_split_thresholds(forests):
+    # sklearn sends a value equal to the threshold left
+    forest, flat_forest, sample = forests
+    rng = np.random.default_rng(0)
+    split_nodes = np.flatnonzero(flat_forest.is_split)
+    picks = rng.choice(split_nodes, size=min(len(sample), len(split_nodes)), replace=False)
+    features = sample[:len(picks)].copy()
+    for row, node in enumerate(picks):
+        features[row, flat_forest.feature[node]] = np.float32(flat_forest.threshold[node])
+    assert_parity(forest, flat_forest, features)
+
+
+def test_perturbed_and_out_of_range_rows(forests):
+    forest, flat_forest, sample = forests
+    rng = np.random.default_rng(1)
+    assert_parity(forest, flat_forest, sample * rng.uniform(0.5, 1.5, size=sample.shape).astype(np.float32))
+    assert_parity(forest, flat_forest, rng.choice([-1e9, 0.0, 1e9], size=(500, sample.shape[1])).astype(np.float32))
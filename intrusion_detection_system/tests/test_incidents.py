@@ -0,0 +1,44 @@
+from datetime import datetime, timedelta
+
+from app.models.incident import Incident
+from app.services.detection_writer import detection_writer
+from app.services.incidents import incident_aggregator
+
+START = datetime(2024, 1, 1)
+
+
+def attacks(seconds, ip_address='203.0.113.7'):
+    return [{'user_id': 1, 'prediction': 'neptune', 'confidence': 0.9, 'timestamp': START + timedelta(seconds=second),
+             'ip_address': ip_address, 'protocol': 'tcp', 'src_bytes': 0, 'dst_bytes': 0} for second in seconds]
+
+
+def test_a_retried_flush_counts_its_incidents_once(make_app, tmp_path, monkeypatch):
+    app = make_app(DETECTION_WRITE_BEHIND=True, DETECTION_FLUSH_INTERVAL_MS=10, DETECTION_RETRY_BACKOFF=0.001,
+                   DETECTION_SPILL_DIR=str(tmp_path / 'spill'))
+    insert = detection_writer._insert
+    calls = []
+
+    def fails_once(rows):
+        recorded = insert(rows)
+        calls.append(len(rows))
+        if len(calls) == 1:
+            raise RuntimeError('database went away')
+        return recorded
+
+    monkeypatch.setattr(detection_writer, '_insert', fails_once)
+    with app.app_context():
+        opened = incident_aggregator.opened
+        detection_writer.submit(attacks(range(3)))
+        detection_writer.flush()
+        assert len(calls) == 2
+        assert incident_aggregator.opened - opened == 1
+        assert Incident.query.one().count == 3
+
+
+def test_attacks_without_a_source_address_extend_their_incident_after_a_restart(make_app):
+    app = make_app()
+    with app.app_context():
+        detection_writer.submit(attacks(range(3), ip_address=None))
+        incident_aggregator.forget()
+        detection_writer.submit(attacks(range(10, 12), ip_address=None))
+        assert Incident.query.one().count == 5
@@ -0,0 +1,4 @@
+def test_metrics_rejects_a_non_ascii_token(make_app):
+    client = make_app(METRICS_TOKEN='scrape-secret').test_client()
+    assert client.get('/metrics', headers={'Authorization': 'Bearer töken'}).status_code == 401
+    assert client.get('/metrics', headers={'Authorization': 'Bearer scrape-secret'}).status_code == 200
@@ -0,0 +1,41 @@
+from datetime import datetime, timedelta
+
+from app.services.detection_writer import detection_writer
+from app.services.incidents import incident_aggregator
+from app.services.rollups import get_counts, get_series, get_summary, rebuild_rollups
+
+START = datetime(2024, 1, 1)
+
+
+def burst(seconds, prediction='neptune', ip_address='203.0.113.7'):
+    return [{'user_id': 1, 'prediction': prediction, 'confidence': 0.9, 'timestamp': START + timedelta(seconds=second),
+             'ip_address': ip_address, 'protocol': 'tcp', 'src_bytes': 10, 'dst_bytes': 20} for second in seconds]
+
+
+def test_rebuild_counts_attacks_kept_only_as_incidents(make_app):
+    app = make_app(INCIDENT_STORE_RAW_ATTACKS=False)
+    with app.app_context():
+        detection_writer.submit(burst(range(0, 150, 10)) + burst(range(5), prediction='normal'))
+        detection_writer.submit(burst(range(30, 90, 20), prediction='portsweep', ip_address='10.0.0.9'))
+        before = get_summary(), get_summary(1), get_counts()
+        assert before[0] == {'total_detections': 23, 'normal_count': 5, 'attack_count': 18}
+
+        assert rebuild_rollups() == 23
+        assert (get_summary(), get_summary(1), get_counts()) == before
+        series = get_series('minute')
+        assert [entry['bucket_start'] for entry in series] == [
+            '2024-01-01T00:00:00', '2024-01-01T00:01:00', '2024-01-01T00:02:00']
+        assert sum(entry['counts'].get('neptune', 0) for entry in series) == 15
+
+
+def test_rebuild_counts_raw_attacks_stored_before_the_switch_once(make_app):
+    app = make_app(INCIDENT_STORE_RAW_ATTACKS=True)
+    with app.app_context():
+        detection_writer.submit(burst(range(5)))
+        incident_aggregator.store_raw_attacks = False
+        detection_writer.submit(burst(range(10, 20)))
+        before = get_counts()
+        assert before == {'neptune': 15}
+
+        rebuild_rollups()
+        assert get_counts() == before